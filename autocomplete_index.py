@@ -0,0 +1,229 @@
+## autocomplete_index.py
+
+import heapq
+import random
+import sqlite3
+import struct
+import logging
+import time
+import sys
+import os
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# File layout: header, then four sections whose byte lengths the header gives
+#   words        sorted completions, UTF-8, newline separated
+#   frequencies  uint64 per word
+#   head keys    every prefix up to AUTOCOMPLETE_HEAD_LENGTH characters, newline separated
+#   head ranks   for each head key a count (uint8) followed by that many word indexes (uint32)
+MAGIC = b'DICTACP\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIIIQQQQ')
+
+# Sorts after every character a word can contain, so prefix + this bounds the prefix range
+_PREFIX_END = '\U0010ffff'
+
+def normalize_prefix(text: str) -> str:
+    """Typed text as stored in the index: lowercased, whitespace collapsed"""
+    return ' '.join(text.lower().split())
+
+def top_ranked(indexes, frequencies, k: int) -> List[int]:
+    """The k most frequent word indexes; ties keep alphabetical order"""
+    return heapq.nlargest(k, indexes, key=frequencies.__getitem__)
+
+def load_completions(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Every lemma and inflected form with the frequency it is ranked by"""
+    completions = {}
+    for word, frequency in conn.execute("SELECT lemma, lemma_frequency FROM lemmas"):
+        word = normalize_prefix(str(word))
+        if word:
+            completions[word] = max(completions.get(word, 0), frequency or 0)
+    for word, frequency in conn.execute("""
+        SELECT form, SUM(form_frequency) FROM inflected_forms GROUP BY form
+    """):
+        word = normalize_prefix(str(word))
+        if word:
+            completions[word] = max(completions.get(word, 0), frequency or 0)
+    return completions
+
+def build_autocomplete_index(db_path: str = DATABASE_FILE, output_path: str = AUTOCOMPLETE_FILE,
+                             head_length: int = AUTOCOMPLETE_HEAD_LENGTH,
+                             max_results: int = AUTOCOMPLETE_MAX_RESULTS) -> str:
+    """Build the prefix index from the lemmas and inflected forms of a database"""
+    start_time = time.time()
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        completions = load_completions(conn)
+    finally:
+        conn.close()
+
+    words = sorted(completions)
+    frequencies = array('Q', (completions[word] for word in words))
+
+    # Short prefixes match thousands of words, so their top results are ranked now
+    head_candidates: Dict[str, List[int]] = {}
+    for index, word in enumerate(words):
+        for length in range(1, min(head_length, len(word)) + 1):
+            head_candidates.setdefault(word[:length], []).append(index)
+    head_keys = sorted(head_candidates)
+    head_ranks = array('I')
+    head_counts = array('B')
+    for prefix in head_keys:
+        ranked = top_ranked(head_candidates[prefix], frequencies, max_results)
+        head_counts.append(len(ranked))
+        head_ranks.extend(ranked)
+
+    sections = [
+        '\n'.join(words).encode('utf-8'),
+        frequencies.tobytes(),
+        '\n'.join(head_keys).encode('utf-8'),
+        head_counts.tobytes() + head_ranks.tobytes(),
+    ]
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(words), len(head_keys), max_results,
+                            *(len(section) for section in sections)))
+        for section in sections:
+            f.write(section)
+    os.replace(temp_path, output_path)
+
+    logger.info(f"Built autocomplete index with {len(words)} words and {len(head_keys)} ranked "
+                f"prefixes ({Path(output_path).stat().st_size / 1024 / 1024:.1f} MB) "
+                f"in {time.time() - start_time:.2f}s")
+    return output_path
+
+class AutocompleteIndex:
+    """Top-k completions of a typed prefix, ranked by frequency.
+
+    The words are kept sorted, so the completions of a prefix form one
+    contiguous range found by binary search. Prefixes of up to
+    AUTOCOMPLETE_HEAD_LENGTH characters, whose ranges are large, have their
+    top results stored in the file; longer prefixes rank their (small) range
+    when queried.
+    """
+
+    def __init__(self, path: str = AUTOCOMPLETE_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, word_count, head_count, self.max_results, *section_sizes = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not an autocomplete index (version {FORMAT_VERSION}): {path}")
+
+        sections = []
+        offset = HEADER.size
+        for size in section_sizes:
+            sections.append(data[offset:offset + size])
+            offset += size
+        words_blob, frequencies_blob, head_keys_blob, head_ranks_blob = sections
+
+        self.words = words_blob.decode('utf-8').split('\n') if word_count else []
+        self.frequencies = array('Q')
+        self.frequencies.frombytes(frequencies_blob)
+
+        head_keys = head_keys_blob.decode('utf-8').split('\n') if head_count else []
+        head_counts = head_ranks_blob[:head_count]
+        head_ranks = array('I')
+        head_ranks.frombytes(head_ranks_blob[head_count:])
+        self.head = {}
+        position = 0
+        for prefix, count in zip(head_keys, head_counts):
+            self.head[prefix] = head_ranks[position:position + count].tolist()
+            position += count
+        self.head_length = max((len(prefix) for prefix in head_keys), default=0)
+
+    def __len__(self):
+        return len(self.words)
+
+    def complete(self, prefix: str, k: int = AUTOCOMPLETE_MAX_RESULTS) -> List[Tuple[str, int]]:
+        """Return up to k (word, frequency) completions of prefix, most frequent first"""
+        prefix = normalize_prefix(prefix)
+        if not prefix or k <= 0:
+            return []
+
+        if len(prefix) <= self.head_length and k <= self.max_results:
+            ranked = self.head.get(prefix, [])[:k]
+        else:
+            low = bisect_left(self.words, prefix)
+            high = bisect_left(self.words, prefix + _PREFIX_END, low)
+            ranked = top_ranked(range(low, high), self.frequencies, k)
+
+        return [(self.words[index], self.frequencies[index]) for index in ranked]
+
+def benchmark_prefixes(index: AutocompleteIndex, count: int = AUTOCOMPLETE_BENCHMARK_PREFIXES,
+                       seed: int = 0) -> List[str]:
+    """Prefixes as typed: every prefix of words drawn in proportion to their frequency"""
+    if not index.words:
+        return []
+    rng = random.Random(seed)
+    cumulative = list(accumulate(index.frequencies)) if any(index.frequencies) else None
+    prefixes = []
+    while len(prefixes) < count:
+        for word in rng.choices(index.words, cum_weights=cumulative, k=count):
+            prefixes.extend(word[:length] for length in range(1, len(word) + 1))
+    return prefixes[:count]
+
+def run_benchmark(index: AutocompleteIndex, db_path: str = DATABASE_FILE):
+    """Time index completions against an equivalent LIKE query over lemmas"""
+    prefixes = benchmark_prefixes(index)
+    if not prefixes:
+        logger.error("Autocomplete index is empty")
+        return
+
+    timings = []
+    for prefix in prefixes:
+        query_start = time.perf_counter()
+        index.complete(prefix)
+        timings.append((time.perf_counter() - query_start) * 1000)
+    timings.sort()
+    logger.info(f"Index: {len(prefixes)} prefixes, mean {sum(timings) / len(timings):.4f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.4f} ms, max {timings[-1]:.4f} ms")
+
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        like_prefixes = prefixes[:AUTOCOMPLETE_BENCHMARK_LIKE_PREFIXES]
+        like_start = time.perf_counter()
+        for prefix in like_prefixes:
+            conn.execute("""
+                SELECT lemma FROM lemmas WHERE lemma LIKE ? ESCAPE '\\'
+                ORDER BY lemma_frequency DESC LIMIT ?
+            """, (prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',
+                  AUTOCOMPLETE_MAX_RESULTS)).fetchall()
+        like_mean = (time.perf_counter() - like_start) * 1000 / len(like_prefixes)
+        logger.info(f"LIKE over lemmas: {len(like_prefixes)} prefixes, mean {like_mean:.4f} ms")
+    finally:
+        conn.close()
+
+def main():
+    if len(sys.argv) > 1:
+        index = AutocompleteIndex()
+        for word, frequency in index.complete(' '.join(sys.argv[1:])):
+            print(f"{word}\t{frequency}")
+        return
+
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    build_autocomplete_index()
+    load_start = time.time()
+    index = AutocompleteIndex()
+    logger.info(f"Loaded autocomplete index in {(time.time() - load_start) * 1000:.1f} ms")
+    run_benchmark(index)
+
+if __name__ == "__main__":
+    main()
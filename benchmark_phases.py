@@ -0,0 +1,165 @@
+## benchmark_phases.py
+
+import json
+import logging
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from synthetic_data import generate_sources
+from build_metrics import metrics, peak_rss_mb
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+PHASES = ['phase1', 'phase2', 'phase3']
+# Settings that change what the phases do, recorded with every report
+REPORT_SETTINGS = ['SOURCE_FORMAT', 'BULK_BUILD', 'XML_STREAMING', 'JSON_FORMAT', 'PHASE2_WORKERS',
+                   'HYPERNYM_MAX_DEPTH', 'PHASE3_BATCHED_INSERTS', 'PHASE3_FULL_TEXT', 'PHASE3_COMPRESS_TEXT',
+                   'LINK_INFLECTED_FORMS', 'MATERIALIZE_ENTRIES', 'SYNTHETIC_LEMMAS', 'SYNTHETIC_SEED']
+
+def run_phase(phase: str, work_dir: str, source_format: str) -> Dict:
+    """Run one phase on the sources in work_dir and time it, with the metrics of
+    its steps. Meant for a fresh process, so the peak RSS is the phase's own."""
+    import phase1_excel_to_db
+    from phase2_xml_to_json import create_json_from_xml
+    from phase3_json_to_db import DefinitionsLoader
+
+    db_path = os.path.join(work_dir, os.path.basename(DATABASE_FILE))
+    json_path = os.path.join(work_dir, os.path.basename(JSON_FILE))
+    # SAMPLE_ROWS would cut the synthetic sources down to a handful of rows
+    phase1_excel_to_db.SAMPLE_ROWS = None
+
+    metrics.reset()
+    start_time = time.perf_counter()
+    with metrics.step(phase):
+        if phase == 'phase1':
+            tsv_files = {source: os.path.join(work_dir, os.path.basename(path)) for source, path in TSV_FILES.items()}
+            phase1_excel_to_db.DictionaryDatabaseBuilder(
+                os.path.join(work_dir, os.path.basename(EXCEL_FILE)), db_path,
+                source_format=source_format, tsv_files=tsv_files
+            ).build_database()
+        elif phase == 'phase2':
+            create_json_from_xml(os.path.join(work_dir, os.path.basename(XML_FILE)), json_path)
+            if not Path(json_path).exists():
+                raise RuntimeError(f"Phase 2 wrote no output: {json_path}")
+        else:
+            DefinitionsLoader(db_path).process_definitions_file(json_path)
+    seconds = time.perf_counter() - start_time
+
+    result = {'seconds': seconds, 'peak_rss_mb': peak_rss_mb(), 'steps': metrics.snapshot(BENCHMARK_PATH)['steps']}
+    if phase == 'phase3':
+        conn = sqlite3.connect(db_path)
+        try:
+            result['rows'] = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                                 for table in ('definitions', 'word_references', 'synonyms'))
+        finally:
+            conn.close()
+    return result
+
+def phase_rows(phase: str, stats: Dict[str, int]) -> int:
+    """Rows a phase reads: source rows for phase 1, entries and synsets for phase 2"""
+    if phase == 'phase1':
+        return stats['lemmas_rows'] + stats['subgenres_rows'] + stats['wordforms_rows']
+    return stats['lexical_entries'] + stats['synsets']
+
+def benchmark_scale(scale: float, source_format: str = SOURCE_FORMAT,
+                    seed: int = SYNTHETIC_SEED) -> Tuple[Dict[str, int], List[Dict]]:
+    """Generate sources at one scale and time the three phases on them, each in
+    its own process; returns the sources' row counts and one result per phase"""
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Linux carries the peak RSS of a parent over to its children, so
+        # generating the sources in this process would inflate every phase's
+        # peak RSS; generation gets a process of its own too
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            stats = executor.submit(generate_sources, work_dir, scale, source_format, seed).result()
+        for phase in PHASES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_phase, phase, work_dir, source_format).result()
+            rows = result.pop('rows') if phase == 'phase3' else phase_rows(phase, stats)
+            result.update({'scale': scale, 'phase': phase, 'rows': rows,
+                           'rows_per_sec': rows / result['seconds'] if result['seconds'] else None})
+            logger.info(f"Scale {scale:g} {phase}: {result['seconds']:.2f}s, {rows} rows "
+                        f"({result['rows_per_sec']:.0f} rows/s), peak RSS "
+                        f"{result['peak_rss_mb'] or 0:.0f} MB")
+            results.append(result)
+    return stats, results
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(scales: List[float] = SYNTHETIC_SCALES, source_format: str = SOURCE_FORMAT,
+                  report_path: Optional[str] = None) -> str:
+    """Benchmark every scale and write a JSON report, by default named after the commit"""
+    commit = current_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {name: globals()[name] for name in REPORT_SETTINGS},
+        'sources': {},
+        'results': []
+    }
+    report['settings']['SOURCE_FORMAT'] = source_format
+    for scale in scales:
+        stats, results = benchmark_scale(scale, source_format)
+        report['sources'][f"{scale:g}"] = stats
+        report['results'].extend(results)
+
+    report_path = report_path or os.path.join(BENCHMARK_PATH, f"phases_{commit or 'unknown'}.json")
+    Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote benchmark report to {report_path}")
+    return report_path
+
+def compare_reports(base_path: str, new_path: str):
+    """Log the change in time, throughput and peak RSS per scale and phase"""
+    reports = []
+    for path in (base_path, new_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+    base = {(result['scale'], result['phase']): result for result in reports[0]['results']}
+
+    logger.info(f"{reports[0]['commit']} -> {reports[1]['commit']}")
+    for result in reports[1]['results']:
+        old = base.get((result['scale'], result['phase']))
+        if old is None:
+            continue
+        rss = (f", peak RSS {old['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB"
+               if old['peak_rss_mb'] and result['peak_rss_mb'] else '')
+        logger.info(f"  scale {result['scale']:g} {result['phase']}: {old['seconds']:.2f}s -> "
+                    f"{result['seconds']:.2f}s ({old['seconds'] / result['seconds']:.2f}x){rss}")
+
+def main():
+    if sys.argv[1:2] == ['--compare']:
+        if len(sys.argv) != 4:
+            logger.error("Usage: benchmark_phases.py --compare <base report> <new report>")
+            return
+        compare_reports(sys.argv[2], sys.argv[3])
+        return
+
+    scales = [float(argument) for argument in sys.argv[1:] if argument != '--tsv'] or SYNTHETIC_SCALES
+    run_benchmark(scales, 'tsv' if '--tsv' in sys.argv else SOURCE_FORMAT)
+
+if __name__ == "__main__":
+    main()
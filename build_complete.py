@@ -6,6 +6,7 @@ import os
 import logging
 from pathlib import Path
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
 # Add parent directory to path for config import
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -13,24 +14,70 @@ from config import *
 from phase1_excel_to_db import DictionaryDatabaseBuilder
 from phase2_xml_to_json import create_json_from_xml
 from phase3_json_to_db import DefinitionsLoader
+from build_manifest import BuildManifest
+from entry_store import materialize_entries
+from compiled_lookup import compile_lookup
+from autocomplete_index import build_autocomplete_index
+from fuzzy_index import build_fuzzy_index
+from context_matrix import build_context_matrix
+from subset_export import export_tiers, tier_file
+from build_metrics import metrics, write_build_report
 
 # Set up logging
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def build_lemma_database(fresh: bool = False):
+    """Phase 1; a fresh build removes the old file instead of adding to it"""
+    if fresh and Path(DATABASE_FILE).exists():
+        os.remove(DATABASE_FILE)
+    DictionaryDatabaseBuilder().build_database()
+
+def load_definitions():
+    """Phase 3"""
+    DefinitionsLoader().process_definitions_file(clear_existing=True)
+
+def entries_unchanged(stats) -> bool:
+    """materialize_entries found every entry and key up to date"""
+    return not any(stats[count] for count in ('written', 'deleted', 'keys_written', 'keys_deleted'))
+
+def run_phase(phase_num: int, phase_name: str, phase_function, args=()):
+    """Run a single phase, in a worker process or inline, and return its start and
+    end time, what the phase function returned and the metrics of its steps"""
+    logger.info(f"\n{'='*60}")
+    logger.info(f"PHASE {phase_num}: {phase_name}")
+    logger.info(f"{'='*60}")
+    
+    # Worker processes are reused, so each phase starts from empty metrics
+    metrics.reset()
+    phase_start = time.time()
+    with metrics.step(phase_name):
+        result = phase_function(*args)
+    phase_end = time.time()
+    logger.info(f"✓ Phase {phase_num} completed in {phase_end - phase_start:.2f} seconds")
+    return phase_start, phase_end, result, metrics.snapshot()
+
 class CompletePipelineBuilder:
-    def __init__(self):
+    def __init__(self, incremental: bool = INCREMENTAL_BUILD):
         self.start_time = None
         self.phase_times = {}
+        self.phase_spans = {}
+        self.phase_metrics = {}
+        self.incremental = incremental
+        self.manifest = BuildManifest() if incremental else None
+        self.reused_phases = []
         
     def check_prerequisites(self):
         """Check if all required files exist"""
         logger.info("Checking prerequisites...")
         
-        required_files = {
-            "Excel file": EXCEL_FILE,
-            "XML file": XML_FILE
-        }
+        if SOURCE_FORMAT == 'tsv':
+            required_files = {f"TSV {source} file": path for source, path in TSV_FILES.items()}
+        else:
+            required_files = {"Excel file": EXCEL_FILE}
+        required_files["XML file"] = XML_FILE
         
         all_present = True
         for file_desc, file_path in required_files.items():
@@ -42,23 +89,300 @@ class CompletePipelineBuilder:
         
         return all_present
     
-    def run_phase(self, phase_num: int, phase_name: str, phase_function):
-        """Run a single phase with timing and error handling"""
-        logger.info(f"\n{'='*60}")
-        logger.info(f"PHASE {phase_num}: {phase_name}")
-        logger.info(f"{'='*60}")
+    def source_files(self):
+        """Phase 1 input files for the configured source format"""
+        if SOURCE_FORMAT == 'tsv':
+            return list(TSV_FILES.values())
+        return [EXCEL_FILE]
+    
+    def code_files(self, *modules):
+        """Phase scripts, so a code change also invalidates what they built"""
+        return [os.path.join(SCRIPT_DIR, module) for module in modules]
+    
+    def phase_definitions(self):
+        """Each phase with the files and config parameters its output depends on"""
+        phases = [
+            {
+                'number': 1,
+                'name': "Excel to Database",
+                'function': build_lemma_database,
+                'args': (self.incremental,),
+                'inputs': self.source_files() + self.code_files('phase1_excel_to_db.py'),
+                'params': {
+                    'SOURCE_FORMAT': SOURCE_FORMAT,
+                    'SHEETS': SHEETS,
+                    'SAMPLE_ROWS': SAMPLE_ROWS,
+                    'TSV_ENCODING': TSV_ENCODING,
+                    'TSV_TEXT_COLUMNS': TSV_TEXT_COLUMNS,
+                },
+                'outputs': [DATABASE_FILE],
+                'depends_on': [],
+            },
+            {
+                'number': 2,
+                'name': "XML to JSON",
+                'function': create_json_from_xml,
+                'args': (),
+                'inputs': [XML_FILE] + self.code_files('phase2_xml_to_json.py', 'hypernym_closure.py'),
+                'params': {
+                    'JSON_FORMAT': JSON_FORMAT,
+                    'HYPERNYM_MAX_DEPTH': HYPERNYM_MAX_DEPTH,
+                },
+                'outputs': [JSON_FILE],
+                'depends_on': [],
+            },
+            {
+                'number': 3,
+                'name': "JSON to Database (Definitions)",
+                'function': load_definitions,
+                'args': (),
+                'inputs': [JSON_FILE] + self.code_files('phase3_json_to_db.py', 'reference_matcher.py',
+                                                        'text_compression.py'),
+                'params': {
+                    'JSON_FORMAT': JSON_FORMAT,
+                    'MIN_WORD_LENGTH': MIN_WORD_LENGTH,
+                    'LINK_INFLECTED_FORMS': LINK_INFLECTED_FORMS,
+                    'PHASE3_FULL_TEXT': PHASE3_FULL_TEXT,
+                    'MATERIALIZE_ENTRIES': MATERIALIZE_ENTRIES,
+                    'PHASE3_COMPRESS_TEXT': PHASE3_COMPRESS_TEXT,
+                    'ZDICT_SIZE': ZDICT_SIZE,
+                    'ZDICT_SAMPLE_LEMMAS': ZDICT_SAMPLE_LEMMAS,
+                    'ZDICT_LEVEL': ZDICT_LEVEL,
+                },
+                'outputs': [DATABASE_FILE],
+                'depends_on': ["Excel to Database", "XML to JSON"],
+            },
+        ]
         
-        phase_start = time.time()
+        # The side files below read the finished database, entries included
+        database_phase = "JSON to Database (Definitions)"
+        if MATERIALIZE_ENTRIES:
+            phases.append({
+                'number': 4,
+                'name': "Materialize Entries",
+                'function': materialize_entries,
+                'args': (),
+                'inputs': self.code_files('entry_store.py', 'dictionary_reader.py'),
+                'params': {},
+                'outputs': [DATABASE_FILE],
+                'depends_on': ["JSON to Database (Definitions)"],
+                'unchanged': entries_unchanged,
+            })
+            database_phase = "Materialize Entries"
         
+        if COMPILE_LOOKUP:
+            phases.append({
+                'number': 5,
+                'name': "Compile Lookup File",
+                'function': compile_lookup,
+                'args': (),
+                'inputs': [DATABASE_FILE] + self.code_files('compiled_lookup.py', 'dictionary_reader.py'),
+                'params': {},
+                'outputs': [COMPILED_LOOKUP_FILE],
+                'depends_on': [database_phase],
+            })
+        
+        if BUILD_AUTOCOMPLETE:
+            phases.append({
+                'number': 6,
+                'name': "Build Autocomplete Index",
+                'function': build_autocomplete_index,
+                'args': (),
+                'inputs': [DATABASE_FILE] + self.code_files('autocomplete_index.py'),
+                'params': {
+                    'AUTOCOMPLETE_MAX_RESULTS': AUTOCOMPLETE_MAX_RESULTS,
+                    'AUTOCOMPLETE_HEAD_LENGTH': AUTOCOMPLETE_HEAD_LENGTH,
+                },
+                'outputs': [AUTOCOMPLETE_FILE],
+                'depends_on': [database_phase],
+            })
+        
+        if BUILD_FUZZY_INDEX:
+            phases.append({
+                'number': 7,
+                'name': "Build Fuzzy Index",
+                'function': build_fuzzy_index,
+                'args': (),
+                'inputs': [DATABASE_FILE] + self.code_files('fuzzy_index.py'),
+                'params': {
+                    'FUZZY_MAX_DISTANCE': FUZZY_MAX_DISTANCE,
+                    'FUZZY_PREFIX_LENGTH': FUZZY_PREFIX_LENGTH,
+                },
+                'outputs': [FUZZY_INDEX_FILE],
+                'depends_on': [database_phase],
+            })
+        
+        if BUILD_CONTEXT_MATRIX:
+            phases.append({
+                'number': 8,
+                'name': "Build Context Matrix",
+                'function': build_context_matrix,
+                'args': (),
+                'inputs': [DATABASE_FILE] + self.code_files('context_matrix.py'),
+                'params': {},
+                'outputs': [CONTEXT_MATRIX_FILE],
+                'depends_on': [database_phase],
+            })
+        
+        if EXPORT_SUBSETS:
+            phases.append({
+                'number': 9,
+                'name': "Export Subsets",
+                'function': export_tiers,
+                'args': (),
+                'inputs': [DATABASE_FILE] + self.code_files('subset_export.py'),
+                'params': {'SUBSET_TIERS': SUBSET_TIERS},
+                'outputs': [tier_file(top_n) for top_n in sorted(set(SUBSET_TIERS))],
+                'depends_on': [database_phase],
+            })
+        
+        return phases
+    
+    def can_reuse(self, phase, fingerprint, rebuilt):
+        """Check the manifest to see whether a phase's last build is still valid.
+        
+        Dependencies that hand over a file are covered by its content hash, so a
+        rebuilt phase 2 with an identical JSON file does not force phase 3. A
+        rebuilt dependency that writes the same output (phase 1 recreating the
+        database) always does.
+        """
+        if not self.incremental:
+            return False
+        
+        reasons = [f"{name} was rebuilt" for name in phase['depends_on']
+                   if name in rebuilt and set(rebuilt[name]) & set(phase['outputs'])]
+        if not reasons:
+            reasons = self.manifest.changes(phase['name'], fingerprint, phase['outputs'])
+        
+        if reasons:
+            logger.info(f"Phase {phase['number']} must run: {'; '.join(reasons)}")
+            return False
+        return True
+    
+    def start_phase(self, executor, phase) -> Future:
+        """Submit a phase to the worker pool, or run it right away without one"""
+        args = (phase['number'], phase['name'], phase['function'], phase['args'])
+        if executor is not None:
+            return executor.submit(run_phase, *args)
+        
+        future = Future()
         try:
-            phase_function()
-            phase_time = time.time() - phase_start
-            self.phase_times[phase_name] = phase_time
-            logger.info(f"✓ Phase {phase_num} completed in {phase_time:.2f} seconds")
-            return True
+            future.set_result(run_phase(*args))
         except Exception as e:
-            logger.error(f"✗ Phase {phase_num} failed: {e}")
-            return False
+            future.set_exception(e)
+        return future
+    
+    def schedule_phases(self, phases) -> bool:
+        """Run each phase as soon as the phases it depends on are done.
+        
+        Phases without a dependency between them (Excel to Database and XML to
+        JSON) run at the same time in separate processes; the manifest is only
+        checked and updated here in the parent.
+        """
+        pending = {phase['name']: phase for phase in phases}
+        running = {}
+        done = set()
+        rebuilt = {}
+        failed = False
+        executor = ProcessPoolExecutor(max_workers=PIPELINE_WORKERS) if PIPELINE_WORKERS > 1 else None
+        
+        try:
+            while running or (pending and not failed):
+                progressed = False
+                for name, phase in list(pending.items()):
+                    if failed or not all(dependency in done for dependency in phase['depends_on']):
+                        continue
+                    del pending[name]
+                    progressed = True
+                    
+                    fingerprint = (self.manifest.fingerprint(phase['inputs'], phase['params'])
+                                   if self.incremental else None)
+                    if self.can_reuse(phase, fingerprint, rebuilt):
+                        logger.info(f"↺ Phase {phase['number']} ({name}) reused, inputs unchanged")
+                        self.reused_phases.append(name)
+                        done.add(name)
+                        continue
+                    
+                    if self.incremental:
+                        self.manifest.invalidate(name)
+                    running[self.start_phase(executor, phase)] = (phase, fingerprint)
+                
+                if not running:
+                    if progressed:
+                        continue
+                    logger.error(f"✗ Phases with unmet dependencies: {', '.join(pending)}")
+                    return False
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    phase, fingerprint = running.pop(future)
+                    try:
+                        phase_start, phase_end, result, phase_metrics = future.result()
+                    except Exception as e:
+                        logger.error(f"✗ Phase {phase['number']} failed: {e}")
+                        failed = True
+                        continue
+                    
+                    self.phase_spans[phase['name']] = (phase_start, phase_end)
+                    self.phase_times[phase['name']] = phase_end - phase_start
+                    self.phase_metrics[phase['name']] = phase_metrics
+                    # A phase that reports it changed nothing does not force its dependents
+                    if 'unchanged' in phase and phase['unchanged'](result):
+                        logger.info(f"Phase {phase['number']} ({phase['name']}) changed nothing")
+                    else:
+                        rebuilt[phase['name']] = phase['outputs']
+                    done.add(phase['name'])
+                    if self.incremental:
+                        self.manifest.record(phase['name'], fingerprint, phase['outputs'])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        return not failed
+    
+    def log_critical_path(self, phases):
+        """Log the chain of dependent phases that bounds the build time.
+        
+        Each phase's earliest finish is its own time plus the latest earliest
+        finish among the phases it depends on; phases off the path show how much
+        longer they could take before they would delay the build.
+        """
+        if not self.phase_times:
+            return
+        
+        earliest_finish = {}
+        critical_dependency = {}
+        for phase in phases:
+            finished = [dependency for dependency in phase['depends_on'] if dependency in earliest_finish]
+            previous = max(finished, key=earliest_finish.get) if finished else None
+            critical_dependency[phase['name']] = previous
+            earliest_finish[phase['name']] = (self.phase_times.get(phase['name'], 0.0) +
+                                              (earliest_finish[previous] if previous else 0.0))
+        
+        path = []
+        name = max(earliest_finish, key=earliest_finish.get)
+        while name is not None:
+            path.append(name)
+            name = critical_dependency[name]
+        path.reverse()
+        
+        logger.info("Critical path:")
+        for name in path:
+            if name in self.phase_times:
+                logger.info(f"  {name}: {self.phase_times[name]:.2f}s")
+        logger.info(f"  Critical path total: {earliest_finish[path[-1]]:.2f}s "
+                    f"(phases ran for {sum(self.phase_times.values()):.2f}s in all)")
+        
+        for phase in phases:
+            if phase['name'] in path or phase['name'] not in self.phase_times:
+                continue
+            dependents = [other['name'] for other in phases if phase['name'] in other['depends_on']]
+            if dependents:
+                slack = min(earliest_finish[other] - self.phase_times.get(other, 0.0) for other in dependents)
+                slack -= earliest_finish[phase['name']]
+                logger.info(f"  Off the critical path: {phase['name']}, {slack:.2f}s of slack")
+            else:
+                logger.info(f"  Off the critical path: {phase['name']}")
     
     def build_complete_database(self):
         """Run the complete pipeline"""
@@ -73,28 +397,8 @@ class CompletePipelineBuilder:
             logger.error("Prerequisites check failed. Exiting.")
             return False
         
-        # Phase 1: Excel to Database
-        if not self.run_phase(
-            1, 
-            "Excel to Database",
-            lambda: DictionaryDatabaseBuilder().build_database()
-        ):
-            return False
-        
-        # Phase 2: XML to JSON
-        if not self.run_phase(
-            2,
-            "XML to JSON",
-            lambda: create_json_from_xml()
-        ):
-            return False
-        
-        # Phase 3: JSON to Database
-        if not self.run_phase(
-            3,
-            "JSON to Database (Definitions)",
-            lambda: DefinitionsLoader().process_definitions_file(clear_existing=True)
-        ):
+        phases = self.phase_definitions()
+        if not self.schedule_phases(phases):
             return False
         
         # Summary
@@ -103,13 +407,56 @@ class CompletePipelineBuilder:
         logger.info("PIPELINE COMPLETED SUCCESSFULLY")
         logger.info(f"{'='*60}")
         logger.info("Time Summary:")
-        for phase, phase_time in self.phase_times.items():
-            logger.info(f"  {phase}: {phase_time:.2f}s")
+        for phase in phases:
+            if phase['name'] in self.phase_times:
+                logger.info(f"  {phase['name']}: {self.phase_times[phase['name']]:.2f}s")
         logger.info(f"  Total: {total_time:.2f}s")
+        self.log_critical_path(phases)
+        if self.reused_phases:
+            logger.info("Reused from the previous build:")
+            for phase in self.reused_phases:
+                logger.info(f"  {phase}")
+        if BUILD_METRICS:
+            self.log_slowest_steps()
+            self.write_report(phases, total_time)
         logger.info(f"\nDatabase created at: {DATABASE_FILE}")
         
         return True
     
+    def log_slowest_steps(self, count: int = 10):
+        """Log the steps that took longest across all phases, phases themselves left out"""
+        steps = [step for phase_metrics in self.phase_metrics.values()
+                 for step in phase_metrics['steps'] if '/' in step['step']]
+        if not steps:
+            return
+        
+        logger.info("Slowest steps:")
+        for step in sorted(steps, key=lambda step: step['seconds'], reverse=True)[:count]:
+            rows = f", {step['rows']} rows" if step['rows'] else ''
+            logger.info(f"  {step['step']}: {step['seconds']:.2f}s in {step['calls']} calls{rows}")
+    
+    def write_report(self, phases, total_time: float):
+        """Write the per-phase and per-step metrics of this build to BUILD_REPORT_FILE"""
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.start_time)),
+            'database': DATABASE_FILE,
+            'database_size_mb': Path(DATABASE_FILE).stat().st_size / 1024 / 1024,
+            'total_seconds': total_time,
+            'profile_steps': BUILD_PROFILE_STEPS,
+            'phases': []
+        }
+        for phase in phases:
+            phase_metrics = self.phase_metrics.get(phase['name'], {})
+            report['phases'].append({
+                'number': phase['number'],
+                'name': phase['name'],
+                'reused': phase['name'] in self.reused_phases,
+                'seconds': self.phase_times.get(phase['name']),
+                'steps': phase_metrics.get('steps', []),
+                'profiles': phase_metrics.get('profiles', {}),
+            })
+        write_build_report(report)
+    
     def validate_output(self):
         """Validate the final database"""
         logger.info("\nValidating final database...")
@@ -0,0 +1,110 @@
+## build_manifest.py
+
+import hashlib
+import json
+import logging
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+class BuildManifest:
+    """Record of what the last successful build of each phase was made from.
+
+    A phase's fingerprint is the SHA-256 of every input file plus the config
+    parameters that affect its output. Output files are hashed after every
+    phase that writes them, so a phase is only reused when its fingerprint is
+    unchanged and its outputs still hold exactly what the last build left.
+    """
+
+    def __init__(self, manifest_path: str = BUILD_MANIFEST_FILE):
+        self.manifest_path = manifest_path
+        self.hash_cache: Dict[str, Tuple[int, int, str]] = {}
+        self.data = self.load()
+
+    def load(self) -> Dict:
+        """Load the manifest, starting empty if it is missing or unreadable"""
+        empty = {'phases': {}, 'outputs': {}}
+        if not Path(self.manifest_path).exists():
+            return empty
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {'phases': data.get('phases', {}), 'outputs': data.get('outputs', {})}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable build manifest {self.manifest_path}: {e}")
+            return empty
+
+    def save(self):
+        """Write the manifest atomically"""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 of a file's content, cached while its size and mtime are unchanged"""
+        stat = os.stat(path)
+        cached = self.hash_cache.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(MANIFEST_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        self.hash_cache[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def fingerprint(self, inputs: List[str], params: Dict) -> Dict:
+        """Hash the input files and normalize the parameters of a phase"""
+        return {
+            'inputs': {path: self.file_hash(path) for path in inputs},
+            # Round-trip through JSON so sets and tuples compare like the stored copy
+            'params': json.loads(json.dumps(params, sort_keys=True, default=sorted)),
+        }
+
+    def outputs_unchanged(self, outputs: List[str]) -> bool:
+        """Check that every output exists with the content recorded after the last build"""
+        for path in outputs:
+            recorded = self.data['outputs'].get(path)
+            if recorded is None or not Path(path).exists() or self.file_hash(path) != recorded:
+                return False
+        return True
+
+    def changes(self, phase_name: str, fingerprint: Dict, outputs: List[str]) -> List[str]:
+        """Describe why a phase must run again; an empty list means it can be reused"""
+        previous = self.data['phases'].get(phase_name)
+        if previous is None:
+            return ["no previous build"]
+
+        reasons = []
+        for path, file_hash in fingerprint['inputs'].items():
+            if previous['inputs'].get(path) != file_hash:
+                reasons.append(f"input changed: {Path(path).name}")
+        for name, value in fingerprint['params'].items():
+            if name not in previous['params'] or previous['params'][name] != value:
+                reasons.append(f"parameter changed: {name}")
+        if not self.outputs_unchanged(outputs):
+            reasons.append("output missing or modified")
+        return reasons
+
+    def invalidate(self, phase_name: str):
+        """Forget a phase before it runs, so a failed run is never reused"""
+        if self.data['phases'].pop(phase_name, None) is not None:
+            self.save()
+
+    def record(self, phase_name: str, fingerprint: Dict, outputs: List[str]):
+        """Store a phase's fingerprint and the hashes of the outputs it wrote"""
+        self.data['phases'][phase_name] = fingerprint
+        for path in outputs:
+            self.data['outputs'][path] = self.file_hash(path)
+        self.save()
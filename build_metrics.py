@@ -0,0 +1,164 @@
+## build_metrics.py
+
+import cProfile
+import functools
+import json
+import logging
+import pstats
+import re
+import time
+import sys
+import os
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Returned by step() while metrics are off, so instrumented code costs one call
+NO_STEP = nullcontext()
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process or any of its finished children"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+class StepTimer:
+    """One call of a step: adds its time to the step's record and samples peak RSS.
+
+    Steps called once per row sample RSS on calls 1, 2, 4, 8, ... only; the
+    step around them samples it again when it finishes.
+    """
+    __slots__ = ('metrics', 'name', 'record', 'profile', 'start')
+
+    def __init__(self, metrics: 'BuildMetrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> Dict:
+        metrics = self.metrics
+        path = f"{metrics.stack[-1]['step']}/{self.name}" if metrics.stack else self.name
+        record = metrics.steps.get(path)
+        if record is None:
+            record = metrics.steps[path] = {'step': path, 'calls': 0, 'seconds': 0.0, 'rows': 0,
+                                            'peak_rss_mb': None}
+        metrics.stack.append(record)
+        self.record = record
+
+        # Only one profiler can be active, so steps inside a profiled step are not profiled again
+        self.profile = None
+        if self.name in metrics.profile_steps and not metrics.profiling:
+            self.profile = metrics.profiles.setdefault(path, cProfile.Profile())
+            metrics.profiling = True
+            self.profile.enable()
+        self.start = time.perf_counter()
+        return record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+            self.metrics.profiling = False
+        record = self.record
+        record['calls'] += 1
+        record['seconds'] += seconds
+        if record['calls'] & (record['calls'] - 1) == 0:
+            record['peak_rss_mb'] = peak_rss_mb()
+        self.metrics.stack.pop()
+        return False
+
+class BuildMetrics:
+    """Per-step timings, row counts and peak RSS of the build phases.
+
+    Steps nest: a step started while another runs is recorded under the
+    other's path ("XML to JSON/hypernym_closure"), and repeated calls of a
+    step add up in one record. Steps named in profile_steps also run under
+    cProfile. Peak RSS is the high-water mark of the process when the step
+    last finished, so it includes whatever ran before it in that process.
+    """
+
+    def __init__(self, enabled: bool = BUILD_METRICS, profile_steps: Iterable[str] = BUILD_PROFILE_STEPS):
+        self.enabled = enabled
+        self.profile_steps = set(profile_steps)
+        self.reset()
+
+    def reset(self):
+        self.steps: Dict[str, Dict] = {}
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.stack: List[Dict] = []
+        self.profiling = False
+
+    def step(self, name: str):
+        """Context manager timing one call of a step"""
+        if not self.enabled:
+            return NO_STEP
+        return StepTimer(self, name)
+
+    def count(self, rows: int):
+        """Add rows processed to the running step"""
+        if self.stack:
+            self.stack[-1]['rows'] += rows
+
+    def profile_stats(self, path: str, output_dir: str) -> Dict:
+        """Dump a step's profile next to the report and list its most expensive functions"""
+        stats = pstats.Stats(self.profiles[path])
+        profile_file = os.path.join(output_dir, f"profile_{re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')}.prof")
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(profile_file)
+
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            'file': profile_file,
+            'functions': [{'function': f"{file_name}:{line}({function})", 'calls': calls,
+                           'own_seconds': own_seconds, 'cumulative_seconds': cumulative_seconds}
+                          for (file_name, line, function), (_, calls, own_seconds, cumulative_seconds, _)
+                          in functions[:BUILD_PROFILE_TOP]]
+        }
+
+    def snapshot(self, output_dir: str = DATABASE_PATH) -> Dict:
+        """Picklable copy of the recorded steps and profiles, to hand back from a worker process"""
+        return {
+            'steps': [dict(record) for record in self.steps.values()],
+            'profiles': {path: self.profile_stats(path, output_dir) for path in self.profiles}
+        }
+
+# Shared by every module of a build; each process has its own
+metrics = BuildMetrics()
+
+def timed_step(function):
+    """Record every call of a function as a step named after it"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with metrics.step(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+def row_step(function):
+    """timed_step for functions called once per row or lemma. Timing thousands of
+    calls would slow the loop it is meant to measure, so they are only recorded
+    when named in BUILD_PROFILE_STEPS; otherwise the function is left as it is"""
+    if not metrics.enabled or function.__name__ not in metrics.profile_steps:
+        return function
+    return timed_step(function)
+
+def write_build_report(report: Dict, report_path: str = BUILD_REPORT_FILE):
+    temp_path = report_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp_path, report_path)
+    logger.info(f"Wrote build report to {report_path}")
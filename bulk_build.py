@@ -0,0 +1,108 @@
+## bulk_build.py
+
+import sqlite3
+import shutil
+import logging
+import time
+import sys
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+class BulkBuild:
+    """Fast-build session shared by the database phases.
+
+    The database is built in a separate file next to the target with
+    journaling and syncing turned off and a large page cache; the target is
+    only replaced once the build succeeded, so a crash never leaves a
+    half-written dictionary.db behind. Indexes are created after loading and
+    the file is finished with ANALYZE and VACUUM.
+    """
+
+    def __init__(self, db_path: str, copy_existing: bool = False):
+        self.db_path = db_path
+        self.build_path = db_path + BULK_BUILD_SUFFIX
+        self.copy_existing = copy_existing
+        self.timings: Dict[str, float] = {}
+
+    def connect(self) -> sqlite3.Connection:
+        """Create the build file and open it with bulk-load pragmas"""
+        if os.path.exists(self.build_path):
+            os.remove(self.build_path)
+        if self.copy_existing:
+            shutil.copyfile(self.db_path, self.build_path)
+
+        conn = sqlite3.connect(self.build_path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"PRAGMA cache_size = {-BULK_CACHE_SIZE_MB * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        logger.info(f"Bulk build into: {self.build_path}")
+        return conn
+
+    @contextmanager
+    def step(self, name: str):
+        """Time one step of the build"""
+        step_start = time.time()
+        yield
+        self.timings[name] = time.time() - step_start
+        logger.info(f"Bulk build step '{name}' took {self.timings[name]:.2f}s")
+
+    def drop_indexes(self, conn: sqlite3.Connection, tables: List[str]) -> List[Tuple[str, str]]:
+        """Drop the explicit indexes of the given tables, returning their SQL for re-creation"""
+        placeholders = ', '.join('?' for _ in tables)
+        indexes = conn.execute(f"""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+        """, tables).fetchall()
+
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.commit()
+        logger.info(f"Deferred {len(indexes)} indexes until after loading")
+        return indexes
+
+    def restore_indexes(self, conn: sqlite3.Connection, indexes: List[Tuple[str, str]]):
+        """Re-create indexes dropped by drop_indexes"""
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+
+    def finalize(self, conn: sqlite3.Connection):
+        """Update planner statistics and compact the build file"""
+        with self.step("analyze"):
+            conn.execute("ANALYZE")
+            conn.commit()
+
+        size_before = Path(self.build_path).stat().st_size
+        with self.step("vacuum"):
+            conn.execute("VACUUM")
+        size_after = Path(self.build_path).stat().st_size
+        logger.info(f"Database size before VACUUM: {size_before / 1024 / 1024:.1f} MB, "
+                    f"after: {size_after / 1024 / 1024:.1f} MB")
+
+    def commit_file(self):
+        """Replace the target database with the finished build file"""
+        os.replace(self.build_path, self.db_path)
+        logger.info(f"Bulk build moved into place: {self.db_path}")
+
+    def discard_file(self):
+        """Remove the build file after a failed build"""
+        if os.path.exists(self.build_path):
+            os.remove(self.build_path)
+
+    def log_timings(self):
+        logger.info("Bulk build timings:")
+        for name, seconds in self.timings.items():
+            logger.info(f"  {name}: {seconds:.2f}s")
+        logger.info(f"  total: {sum(self.timings.values()):.2f}s")
@@ -0,0 +1,174 @@
+## compiled_lookup.py
+
+import json
+import mmap
+import struct
+import logging
+import time
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from dictionary_reader import DictionaryReader, lookup_keys, resolve_all
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# File layout (little endian):
+#   header      magic, version, key count, entry count, entry index offset, key index offset
+#   entries     one compact UTF-8 JSON record per lemma, back to back
+#   entry index entry count + 1 file offsets (uint64), entry i spans [offset i, offset i+1)
+#   key records key length (uint16), key bytes, entry count (uint16), entry numbers (uint32 each)
+#   key index   file offset (uint64) of every key record, sorted by key bytes
+MAGIC = b'DICTLKP\x00'
+# Version 2 keys lemmas and forms as written instead of lowercased
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sIIIxxxxQQ')
+OFFSET = struct.Struct('<Q')
+ENTRY_SPAN = struct.Struct('<QQ')
+LENGTH = struct.Struct('<H')
+ENTRY_NUMBER = struct.Struct('<I')
+
+def compile_lookup(db_path: str = DATABASE_FILE, output_path: str = COMPILED_LOOKUP_FILE) -> str:
+    """Compile the database into the read-only lookup file and return its path"""
+    start_time = time.time()
+    temp_path = output_path + '.tmp'
+
+    with DictionaryReader(db_path, cache_size=0) as reader:
+        lemma_ids = [row['id'] for row in reader.conn.execute("SELECT id FROM lemmas ORDER BY id")]
+        entry_numbers = {lemma_id: number for number, lemma_id in enumerate(lemma_ids)}
+
+        # Every lemma and form as written, with the lemmas DictionaryReader.resolve returns for it
+        keys: Dict[bytes, List[int]] = {
+            text.encode('utf-8'): [entry_numbers[lemma_id] for lemma_id in resolved]
+            for text, resolved in resolve_all(reader.conn).items()
+        }
+
+        with open(temp_path, 'wb') as f:
+            f.write(b'\0' * HEADER.size)
+
+            entry_offsets = []
+            for lemma_id in lemma_ids:
+                entry_offsets.append(f.tell())
+                entry = reader.get_entry(lemma_id)
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            entry_offsets.append(f.tell())
+
+            entry_index_offset = f.tell()
+            for offset in entry_offsets:
+                f.write(OFFSET.pack(offset))
+
+            key_offsets = []
+            for key in sorted(keys):
+                numbers = keys[key]
+                key_offsets.append(f.tell())
+                f.write(LENGTH.pack(len(key)) + key + LENGTH.pack(len(numbers)))
+                f.write(b''.join(ENTRY_NUMBER.pack(number) for number in numbers))
+
+            key_index_offset = f.tell()
+            for offset in key_offsets:
+                f.write(OFFSET.pack(offset))
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(key_offsets), len(lemma_ids),
+                                entry_index_offset, key_index_offset))
+
+    os.replace(temp_path, output_path)
+    size_mb = Path(output_path).stat().st_size / 1024 / 1024
+    logger.info(f"Compiled {len(lemma_ids)} entries and {len(keys)} keys into {output_path} "
+                f"({size_mb:.1f} MB) in {time.time() - start_time:.2f}s")
+    return output_path
+
+class CompiledLookup:
+    """Lookups straight from the memory-mapped file written by compile_lookup.
+
+    Opening the file only maps it and reads the header. A lookup binary
+    searches the sorted key index and decodes just the entries the key points
+    to, so memory use grows only with the pages that lookups touch.
+    """
+
+    def __init__(self, path: str = COMPILED_LOOKUP_FILE):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.key_count, self.entry_count, self.entry_index_offset, \
+            self.key_index_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Not a compiled lookup file (version {FORMAT_VERSION}): {path}")
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def find_key(self, key: bytes) -> Optional[int]:
+        """Binary search the key index, returning the offset of the key's entry numbers"""
+        mm = self.mm
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            record_offset = OFFSET.unpack_from(mm, self.key_index_offset + middle * OFFSET.size)[0]
+            key_length = LENGTH.unpack_from(mm, record_offset)[0]
+            key_start = record_offset + LENGTH.size
+            candidate = mm[key_start:key_start + key_length]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return key_start + key_length
+        return None
+
+    def entry(self, number: int) -> Dict:
+        """Decode one packed entry record"""
+        start, end = ENTRY_SPAN.unpack_from(self.mm, self.entry_index_offset + number * OFFSET.size)
+        return json.loads(self.mm[start:end])
+
+    def lookup(self, word: str) -> List[Dict]:
+        """Return the entries of every lemma a word resolves to, most likely first"""
+        # A word stored as written has the reader's full resolution; any other
+        # word can only match through its lowercased key
+        for key in lookup_keys(word or ''):
+            numbers_offset = self.find_key(key.encode('utf-8'))
+            if numbers_offset is not None:
+                break
+        else:
+            return []
+
+        count = LENGTH.unpack_from(self.mm, numbers_offset)[0]
+        first = numbers_offset + LENGTH.size
+        return [self.entry(ENTRY_NUMBER.unpack_from(self.mm, first + i * ENTRY_NUMBER.size)[0])
+                for i in range(count)]
+
+def main():
+    if len(sys.argv) > 1:
+        with CompiledLookup() as lookup:
+            for entry in lookup.lookup(' '.join(sys.argv[1:])):
+                print(json.dumps(entry, indent=2, ensure_ascii=False))
+        return
+
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    compile_lookup()
+
+if __name__ == "__main__":
+    main()
@@ -14,14 +14,116 @@ Path(DATABASE_PATH).mkdir(parents=True, exist_ok=True)
 EXCEL_FILE = os.path.join(SOURCE_PATH, "wordFrequency.xlsx")
 XML_FILE = os.path.join(SOURCE_PATH, "wn.xml")
 
+# Phase 1 source: "excel" (EXCEL_FILE) or "tsv" (the full wordfrequency.info text files)
+SOURCE_FORMAT = "excel"
+TSV_FILES = {
+    'lemmas': os.path.join(SOURCE_PATH, "lemmas_60k.txt"),
+    'subgenres': os.path.join(SOURCE_PATH, "lemmas_60k_subgenres.txt"),
+    'wordforms': os.path.join(SOURCE_PATH, "lemmas_60k_words.txt")
+}
+
 # Output files
 DATABASE_FILE = os.path.join(DATABASE_PATH, "dictionary.db")
-JSON_FILE = os.path.join(DATABASE_PATH, "wordnet_processed.json")
+JSON_FORMAT = "json"  # Phase 2 -> 3 hand-off: "json" (single document) or "ndjson" (one lemma per line)
+JSON_FILE = os.path.join(DATABASE_PATH, "wordnet_processed.ndjson" if JSON_FORMAT == "ndjson"
+                         else "wordnet_processed.json")
+COMPILED_LOOKUP_FILE = os.path.join(DATABASE_PATH, "dictionary.lookup")  # mmap artifact for the popup client
+AUTOCOMPLETE_FILE = os.path.join(DATABASE_PATH, "autocomplete.idx")  # Prefix index for type-ahead
+FUZZY_INDEX_FILE = os.path.join(DATABASE_PATH, "fuzzy.idx")  # Spelling suggestions for misspelled lookups
+CONTEXT_MATRIX_FILE = os.path.join(DATABASE_PATH, "context_matrix.npz")  # Lemma/POS x genre counts for NumPy
+SUBSET_PATH = os.path.join(DATABASE_PATH, "subsets")  # Top-N tier databases for client caches
+SYNTHETIC_PATH = os.path.join(DATABASE_PATH, "synthetic")  # Generated benchmark sources, one folder per scale
+BENCHMARK_PATH = os.path.join(DATABASE_PATH, "benchmarks")  # Phase benchmark reports, one per commit
+BUILD_REPORT_FILE = os.path.join(DATABASE_PATH, "build_report.json")  # Per-step metrics of the last build
 
 # Processing parameters
 BATCH_SIZE = 1000
 MIN_WORD_LENGTH = 2
+LINK_INFLECTED_FORMS = True  # Also link inflected forms ("mice", "went") to their lemma in phase3
 SAMPLE_ROWS = 5  # For testing, set to None for full processing
+XML_STREAMING = False  # Use iterparse in phase2 to keep memory bounded on the full WordNet
+HYPERNYM_MAX_DEPTH = None  # Limit hypernym chains to this many levels, None for all ancestors
+PHASE2_WORKERS = 1  # Processes for phase2 entry extraction: 1 runs serially, None uses all CPUs
+PHASE2_SHARD_SIZE = 500  # LexicalEntries per parallel work unit
+PHASE3_BATCHED_INSERTS = False  # Buffer phase3 rows with pre-assigned definition ids
+PHASE3_BATCH_SIZE = 5000  # Definitions buffered before each executemany flush
+PHASE3_FULL_TEXT = False  # Build the definitions_fts FTS5 index over definitions and examples
+PHASE3_COMPRESS_TEXT = False  # Store definition, example and hypernym text as zlib BLOBs (not with PHASE3_FULL_TEXT)
+ZDICT_SIZE = 32 * 1024  # Shared zlib dictionary size; deflate cannot look further back than 32 KB
+ZDICT_SAMPLE_LEMMAS = 2000  # Lemmas whose text the dictionary is trained on
+ZDICT_LEVEL = 9  # zlib compression level
+
+# Bulk build: fresh file, journaling/sync off, indexes after loading, ANALYZE + VACUUM
+BULK_BUILD = False
+BULK_CACHE_SIZE_MB = 256
+BULK_BUILD_SUFFIX = ".building"
+
+# Pipeline runner: phases run side by side when they do not depend on each other
+PIPELINE_WORKERS = 2  # Processes for independent phases in build_complete, 1 runs them in order
+
+# Incremental builds: skip phases whose input hashes and parameters match the last build
+INCREMENTAL_BUILD = True
+BUILD_MANIFEST_FILE = os.path.join(DATABASE_PATH, "build_manifest.json")
+MANIFEST_HASH_BLOCK_SIZE = 1024 * 1024  # Bytes read at a time when hashing files
+
+# Dictionary reader
+READER_CACHE_SIZE = 10000  # Lookups kept in DictionaryReader's LRU cache
+READER_CACHED_STATEMENTS = 64  # Prepared statements kept per reader connection
+READER_BENCHMARK_WORDS = 1000  # Most frequent lemmas and forms timed by dictionary_reader.py
+READER_BATCH_SIZE = 500  # Words per IN (...) query when resolving a whole document
+READER_DOCUMENT_BLOCK = 10000  # Tokens resolved together before their results are yielded
+READER_BENCHMARK_DOCUMENT_TOKENS = 100000  # Length of the document timed by dictionary_reader.py
+FULL_TEXT_SEARCH_LIMIT = 20  # Results returned by DictionaryReader.search
+FULL_TEXT_DEFINITION_WEIGHT = 1.0  # bm25 weight of definition text
+FULL_TEXT_EXAMPLE_WEIGHT = 0.5  # bm25 weight of example sentences
+FULL_TEXT_FREQUENCY_WEIGHT = 0.1  # Score multiplier per factor of ten in lemma_frequency
+COMPILE_LOOKUP = True  # Compile COMPILED_LOOKUP_FILE as the last step of build_complete
+
+# Materialized entries
+MATERIALIZE_ENTRIES = False  # Store one serialized entry per lemma in the entries table after phase 3
+ENTRIES_BATCH_SIZE = 2000  # Changed entries buffered before each executemany flush
+
+# Autocomplete
+BUILD_AUTOCOMPLETE = True  # Build AUTOCOMPLETE_FILE in build_complete
+AUTOCOMPLETE_MAX_RESULTS = 10  # Completions stored per short prefix (at most 255)
+AUTOCOMPLETE_HEAD_LENGTH = 3  # Prefixes up to this length get their top completions precomputed
+AUTOCOMPLETE_BENCHMARK_PREFIXES = 20000  # Typed prefixes timed by autocomplete_index.py
+AUTOCOMPLETE_BENCHMARK_LIKE_PREFIXES = 500  # Of those, timed as a LIKE query for comparison
+
+# Fuzzy suggestions
+BUILD_FUZZY_INDEX = True  # Build FUZZY_INDEX_FILE in build_complete
+FUZZY_MAX_DISTANCE = 2  # Largest edit distance the index can answer
+FUZZY_PREFIX_LENGTH = 7  # Only this many leading characters get deletion variants (keeps the index small)
+FUZZY_MAX_RESULTS = 10
+FUZZY_BENCHMARK_QUERIES = 2000  # Misspelled words timed by fuzzy_index.py
+
+# Context matrix
+BUILD_CONTEXT_MATRIX = True  # Build CONTEXT_MATRIX_FILE from context_frequencies in build_complete
+
+# Offline subsets
+EXPORT_SUBSETS = False  # Export SUBSET_TIERS from build_complete
+SUBSET_TIERS = [1000, 10000, 30000]  # Lemmas per tier, by lemma_rank
+
+# Sense ranking
+SENSE_CONTEXT_WINDOW = 50  # Words around the target word used as its context
+SENSE_REFERENCE_WEIGHT = 1.0  # Context word referenced by the definition or its example
+SENSE_SYNONYM_WEIGHT = 1.0  # Context word is a synonym of the lemma for the definition's POS
+SENSE_HYPERNYM_WEIGHT = 0.5  # Context word is one of the definition's hypernyms
+SENSE_BENCHMARK_QUERIES = 2000  # Queries timed by sense_ranker.py
+
+# Build metrics
+BUILD_METRICS = True  # Time, count rows and sample peak RSS per phase step; written to BUILD_REPORT_FILE
+BUILD_PROFILE_STEPS = []  # Step names run under cProfile, e.g. ["insert_word_references", "hypernym_closure"]; per-row steps are only timed when listed
+BUILD_PROFILE_TOP = 20  # Functions per profiled step listed in the report (the .prof file has all)
+
+# Synthetic benchmark data
+SYNTHETIC_LEMMAS = 60000  # Frequency list rows at scale 1.0 (the size of the real list)
+SYNTHETIC_SCALES = [0.1, 0.5, 1.0]  # Scale factors generated and timed by benchmark_phases.py
+SYNTHETIC_SEED = 42
+SYNTHETIC_WORDNET_EXTRA = 1.5  # WordNet-only words per frequency list row
+SYNTHETIC_POLYSEMY_EXPONENT = 2.5  # Zipf exponent of senses per entry (lower: more polysemy)
+SYNTHETIC_FANOUT_EXPONENT = 2.2  # Zipf exponent of lemmas per synset (lower: more synonyms)
+SYNTHETIC_MAX_HYPERNYM_DEPTH = 18  # Deepest hypernym chain of the generated noun and verb trees
 
 # Excel sheet names
 SHEETS = {
@@ -30,6 +132,11 @@ SHEETS = {
     'wordforms': '3 wordForms'
 }
 
+# TSV reading
+TSV_CHUNK_SIZE = 50000  # Rows per chunk when streaming TSV files
+TSV_ENCODING = "utf-8"
+TSV_TEXT_COLUMNS = {'lemma', 'PoS', 'word'}  # All other TSV columns are read as numbers
+
 # Logging
 LOG_LEVEL = "INFO"
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -0,0 +1,71 @@
+## conftest.py
+
+import sqlite3
+
+import pytest
+
+from phase1_excel_to_db import DictionaryDatabaseBuilder
+
+# lemma: frequency, [(form, pos, form frequency)], [(pos, definition, example)]
+# Mixed-case lemmas ("Zorbo"/"zorbo", "Quux") and a form shared by two lemmas
+# ("left") exercise every step of DictionaryReader.resolve
+LEMMAS = {
+    'mouse': (500, [('mouse', 'n', 300), ('mice', 'n', 200)],
+              [('n', 'a small rodent', 'the mice ran away'), ('n', 'a hand-held pointing device', None)]),
+    'rodent': (200, [('rodent', 'n', 150), ('rodents', 'n', 50)],
+               [('n', 'a gnawing mammal', 'rats are rodents')]),
+    'leave': (900, [('leave', 'v', 400), ('left', 'v', 350), ('leaves', 'v', 150)],
+              [('v', 'go away from a place', 'she left early')]),
+    'left': (300, [('left', 'j', 300)], [('j', 'on the west side', None)]),
+    'Zorbo': (50, [('Zorbo', 'n', 30), ('Zorbos', 'n', 20)], [('n', 'a proper name', None)]),
+    'zorbo': (80, [('zorbo', 'v', 60), ('zorboed', 'v', 20)], [('v', 'to move like a mouse', None)]),
+    'Quux': (10, [('Quux', 'n', 10)], [('n', 'a placeholder', 'Quux is a metasyntactic word')]),
+    'ice cream': (120, [('ice cream', 'n', 100), ('ice creams', 'n', 20)], [('n', 'a frozen dessert', None)]),
+}
+SYNONYMS = [('mouse', 'rodent', 'n'), ('rodent', 'mouse', 'n'), ('Zorbo', 'zorbo', 'n')]
+REFERENCES = [('zorbo', 'mouse', 5, 'mouse')]
+
+@pytest.fixture
+def dictionary_db(tmp_path) -> str:
+    """A small dictionary.db with the phase 1 schema and phase 3 style definitions"""
+    db_path = str(tmp_path / 'dictionary.db')
+    builder = DictionaryDatabaseBuilder(db_path=db_path)
+    builder.conn = sqlite3.connect(db_path)
+    try:
+        builder.create_database_schema()
+        builder.create_indexes()
+        language_id = builder.insert_default_language()
+
+        conn = builder.conn
+        lemma_ids, definition_ids = {}, {}
+        for rank, (lemma, (frequency, forms, definitions)) in enumerate(LEMMAS.items(), 1):
+            lemma_ids[lemma] = conn.execute(
+                "INSERT INTO lemmas (lemma, language_id, lemma_frequency, lemma_rank) VALUES (?, ?, ?, ?)",
+                (lemma, language_id, frequency, rank)).lastrowid
+            conn.executemany("INSERT INTO inflected_forms (lemma_id, form, pos, form_frequency) VALUES (?, ?, ?, ?)",
+                             [(lemma_ids[lemma], form, pos, form_frequency) for form, pos, form_frequency in forms])
+            for order, (pos, definition, example) in enumerate(definitions, 1):
+                definition_ids.setdefault(lemma, conn.execute(
+                    "INSERT INTO definitions (lemma_id, pos, definition_text, definition_order, example_sentence, "
+                    "hypernyms) VALUES (?, ?, ?, ?, ?, ?)",
+                    (lemma_ids[lemma], pos, definition, order, example, '["thing"]')).lastrowid)
+        conn.executemany("INSERT INTO synonyms (lemma_id, synonym_lemma_id, pos_specific) VALUES (?, ?, ?)",
+                         [(lemma_ids[lemma], lemma_ids[synonym], pos) for lemma, synonym, pos in SYNONYMS])
+        conn.executemany("INSERT INTO word_references (source_definition_id, referenced_lemma_id, word_position, "
+                         "word_text) VALUES (?, ?, ?, ?)",
+                         [(definition_ids[lemma], lemma_ids[referenced], position, word)
+                          for lemma, referenced, position, word in REFERENCES])
+        conn.commit()
+    finally:
+        builder.conn.close()
+    return db_path
+
+@pytest.fixture
+def lookup_words() -> list:
+    """Every lemma and form as written, in other cases and spacings, and unknown words"""
+    texts = set(LEMMAS) | {form for _, forms, _ in LEMMAS.values() for form, _, _ in forms}
+    words = set()
+    for text in texts:
+        words.update({text, text.lower(), text.upper(), text.title(), f"  {text.replace(' ', '  ')} "})
+    words.update({'', '   ', 'unknown', 'QUUX', 'quux', 'zorbos'})
+    return sorted(words)
@@ -0,0 +1,167 @@
+## context_matrix.py
+
+import sqlite3
+import logging
+import time
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# File layout: an uncompressed .npz with the arrays
+#   matrix         counts, one row per (lemma, POS), one column per context
+#   lemma_ids      lemma id of each row
+#   lemmas         lemma text of each row
+#   pos            POS of each row
+#   context_types  'broad_domain' or 'subgenre' of each column
+#   context_names  context name of each column ('fic', 'ficPM', 'x101', ...)
+FORMAT_VERSION = 1
+
+def build_context_matrix(db_path: str = DATABASE_FILE, output_path: str = CONTEXT_MATRIX_FILE) -> str:
+    """Pivot context_frequencies into the (lemma, POS) x context count matrix"""
+    start_time = time.time()
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        contexts = pd.read_sql_query("""
+            SELECT DISTINCT context_type, context_name
+            FROM context_frequencies
+            ORDER BY context_type, context_name
+        """, conn)
+        counts = pd.read_sql_query("""
+            SELECT lemma_id, pos, context_type, context_name, frequency
+            FROM context_frequencies
+        """, conn)
+        lemma_text = pd.read_sql_query("SELECT id, lemma FROM lemmas", conn).set_index('id')['lemma']
+    finally:
+        conn.close()
+
+    columns = pd.MultiIndex.from_frame(contexts).get_indexer(
+        pd.MultiIndex.from_frame(counts[['context_type', 'context_name']]))
+    rows, row_keys = pd.factorize(pd.MultiIndex.from_frame(counts[['lemma_id', 'pos']]), sort=True)
+
+    # int32 halves the size and covers any realistic corpus count
+    frequencies = counts['frequency'].fillna(0).to_numpy(dtype=np.int64)
+    fits_int32 = not len(frequencies) or (frequencies.min() >= np.iinfo(np.int32).min and
+                                          frequencies.max() <= np.iinfo(np.int32).max)
+    matrix = np.zeros((len(row_keys), len(contexts)), dtype=np.int32 if fits_int32 else np.int64)
+    np.add.at(matrix, (rows, columns), frequencies)
+
+    lemma_ids = np.asarray(row_keys.get_level_values(0), dtype=np.int64)
+    temp_path = output_path + '.tmp.npz'
+    np.savez(temp_path,
+             version=np.array(FORMAT_VERSION),
+             matrix=matrix,
+             lemma_ids=lemma_ids,
+             lemmas=lemma_text.reindex(lemma_ids).fillna('').astype(str).to_numpy(dtype=str),
+             pos=np.asarray(row_keys.get_level_values(1), dtype=str),
+             context_types=contexts['context_type'].to_numpy(dtype=str),
+             context_names=contexts['context_name'].to_numpy(dtype=str))
+    os.replace(temp_path, output_path)
+
+    logger.info(f"Built {matrix.shape[0]} x {matrix.shape[1]} context matrix from {len(counts)} rows "
+                f"({Path(output_path).stat().st_size / 1024 / 1024:.1f} MB) in {time.time() - start_time:.2f}s")
+    return output_path
+
+class ContextMatrix:
+    """Genre and subgenre counts of every (lemma, POS) as one NumPy array.
+
+    matrix[row, column] is the frequency of the row's lemma/POS in the
+    column's context, so questions like "top words in fiction" or "genre
+    profile of a word" become a column or row slice instead of a scan over
+    context_frequencies.
+    """
+
+    def __init__(self, path: str = CONTEXT_MATRIX_FILE):
+        self.path = path
+        with np.load(path) as data:
+            if 'version' not in data or int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"Not a context matrix (version {FORMAT_VERSION}): {path}")
+            self.matrix = data['matrix']
+            self.lemma_ids = data['lemma_ids']
+            self.lemmas = data['lemmas']
+            self.pos = data['pos']
+            self.context_types = data['context_types']
+            self.context_names = data['context_names']
+
+        self.columns = {name: column for column, name in enumerate(self.context_names.tolist())}
+        self.rows_by_lemma: Dict[str, List[int]] = {}
+        for row, lemma in enumerate(self.lemmas.tolist()):
+            self.rows_by_lemma.setdefault(lemma.lower(), []).append(row)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def context_columns(self, context_type: Optional[str] = None) -> np.ndarray:
+        """Column indexes of one context type, or of all contexts"""
+        if context_type is None:
+            return np.arange(len(self.context_names))
+        return np.flatnonzero(self.context_types == context_type)
+
+    def column(self, context: str) -> int:
+        if context not in self.columns:
+            raise KeyError(f"Unknown context: {context}")
+        return self.columns[context]
+
+    def rows(self, lemma: str, pos: Optional[str] = None) -> List[int]:
+        """Matrix rows of a lemma, optionally limited to one POS"""
+        rows = self.rows_by_lemma.get(' '.join(lemma.split()).lower(), [])
+        if pos is not None:
+            rows = [row for row in rows if self.pos[row] == pos]
+        return rows
+
+    def top_words(self, context: str, k: int = 20, pos: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        """The k (lemma, POS, frequency) rows most frequent in a context"""
+        counts = self.matrix[:, self.column(context)]
+        candidates = np.flatnonzero(self.pos == pos) if pos is not None else np.arange(len(counts))
+        if k <= 0 or not len(candidates):
+            return []
+
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-counts[candidates], k - 1)[:k]]
+        ranked = candidates[np.lexsort((candidates, -counts[candidates]))]
+        return [(str(self.lemmas[row]), str(self.pos[row]), int(counts[row])) for row in ranked]
+
+    def profile(self, lemma: str, pos: Optional[str] = None,
+                context_type: Optional[str] = None) -> Dict[str, int]:
+        """Frequency of a lemma (summed over its POS unless one is given) in each context"""
+        columns = self.context_columns(context_type)
+        counts = self.matrix[np.ix_(self.rows(lemma, pos), columns)].sum(axis=0)
+        return {str(self.context_names[column]): int(count) for column, count in zip(columns, counts)}
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--top':
+        matrix = ContextMatrix()
+        for lemma, pos, frequency in matrix.top_words(sys.argv[2]):
+            print(f"{lemma}\t{pos}\t{frequency}")
+        return
+
+    if len(sys.argv) > 1:
+        matrix = ContextMatrix()
+        for context, frequency in matrix.profile(' '.join(sys.argv[1:])).items():
+            print(f"{context}\t{frequency}")
+        return
+
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    build_context_matrix()
+    load_start = time.time()
+    matrix = ContextMatrix()
+    logger.info(f"Loaded {matrix.matrix.shape[0]} x {matrix.matrix.shape[1]} context matrix "
+                f"in {(time.time() - load_start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+## dictionary_reader.py
+
+import json
+import math
+import random
+import re
+import sqlite3
+import logging
+import time
+import sys
+import os
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from text_compression import TextCodec, decode_text, load_codec
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# The statements are kept as constants so sqlite3's statement cache prepares each one once
+LEMMA_BY_TEXT_SQL = "SELECT id FROM lemmas WHERE lemma = ?"
+LEMMA_BY_FORM_SQL = """
+    SELECT lemma_id, SUM(form_frequency) AS frequency
+    FROM inflected_forms
+    WHERE form = ?
+    GROUP BY lemma_id
+    ORDER BY frequency DESC, lemma_id
+"""
+LEMMA_SQL = """
+    SELECT id, lemma, lemma_frequency, lemma_rank, dispersion_score
+    FROM lemmas WHERE id = ?
+"""
+FORMS_SQL = """
+    SELECT form, pos, form_frequency
+    FROM inflected_forms WHERE lemma_id = ?
+    ORDER BY form_frequency DESC, form
+"""
+DEFINITIONS_SQL = """
+    SELECT id, pos, definition_text, definition_order, example_sentence, hypernyms
+    FROM definitions WHERE lemma_id = ?
+    ORDER BY pos, definition_order, id
+"""
+SYNONYMS_SQL = """
+    SELECT s.pos_specific, l.lemma
+    FROM synonyms s JOIN lemmas l ON l.id = s.synonym_lemma_id
+    WHERE s.lemma_id = ?
+    ORDER BY s.pos_specific, s.id
+"""
+REFERENCES_SQL = """
+    SELECT r.source_definition_id, r.referenced_lemma_id, r.word_position, r.word_text,
+           r.reference_type, l.lemma
+    FROM definitions d
+    JOIN word_references r ON r.source_definition_id = d.id
+    JOIN lemmas l ON l.id = r.referenced_lemma_id
+    WHERE d.lemma_id = ?
+    ORDER BY r.source_definition_id, r.reference_type, r.word_position
+"""
+
+# Batch statements for whole documents; {} is filled with one ? per word
+LEMMAS_BY_TEXT_BATCH_SQL = "SELECT lemma, id FROM lemmas WHERE lemma IN ({}) ORDER BY id"
+LEMMAS_BY_FORM_BATCH_SQL = """
+    SELECT form, lemma_id, SUM(form_frequency) AS frequency
+    FROM inflected_forms
+    WHERE form IN ({})
+    GROUP BY form, lemma_id
+"""
+LEMMA_TEXT_BATCH_SQL = "SELECT id, lemma FROM lemmas WHERE id IN ({})"
+DOCUMENT_TOKEN_PATTERN = re.compile(r"\w+(?:['-]\w+)*")
+
+SEARCH_SQL = """
+    SELECT definitions_fts.rowid AS definition_id, l.id AS lemma_id, l.lemma, d.pos,
+           d.definition_text, d.example_sentence, l.lemma_frequency,
+           bm25(definitions_fts, ?, ?) * frequency_weight(l.lemma_frequency) AS score
+    FROM definitions_fts
+    JOIN definitions d ON d.id = definitions_fts.rowid
+    JOIN lemmas l ON l.id = d.lemma_id
+    WHERE definitions_fts MATCH ?
+    ORDER BY score
+    LIMIT ?
+"""
+SEARCH_FIELDS = {'definition': 'definition_text', 'example': 'example_sentence'}
+SEARCH_TERM_PATTERN = re.compile(r'\w+')
+
+def chunked(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def frequency_weight(lemma_frequency: Optional[int]) -> float:
+    """Multiplier for bm25 (negative, lower is better) that favours frequent lemmas"""
+    return 1.0 + FULL_TEXT_FREQUENCY_WEIGHT * math.log10(1 + max(lemma_frequency or 0, 0))
+
+def full_text_query(text: str, field: Optional[str] = None, match_all: bool = False) -> Optional[str]:
+    """Turn free text into an FTS5 query of quoted terms, so punctuation can't break it"""
+    terms = [f'"{term}"' for term in SEARCH_TERM_PATTERN.findall(text.lower())]
+    if not terms:
+        return None
+
+    expression = (' AND ' if match_all else ' OR ').join(terms)
+    if field is not None:
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field: {field} (use one of {', '.join(SEARCH_FIELDS)})")
+        expression = f"{SEARCH_FIELDS[field]} : ({expression})"
+    return expression
+
+def lookup_keys(word: str) -> List[str]:
+    """Texts a word is matched against, in resolve order: as written with
+    whitespace collapsed, then lowercased"""
+    word = ' '.join(word.split())
+    return list(dict.fromkeys((word, word.lower()))) if word else []
+
+def resolve_keys(keys: List[str], lemmas_by_text: Dict[str, List[int]],
+                 lemmas_by_form: Dict[str, List[int]]) -> List[int]:
+    """Lemma ids for the lookup keys of a word: lemmas whose text is one of the
+    keys, then lemmas with a form that is, each form's most frequent first.
+
+    Shared by DictionaryReader and the stores built from it (entry_keys,
+    dictionary.lookup), so every API resolves a word to the same lemmas.
+    """
+    lemma_ids = []
+    for matches in (lemmas_by_text, lemmas_by_form):
+        for key in keys:
+            for lemma_id in matches.get(key, ()):
+                if lemma_id not in lemma_ids:
+                    lemma_ids.append(lemma_id)
+    return lemma_ids
+
+def resolve_all(conn: sqlite3.Connection) -> Dict[str, List[int]]:
+    """Every lemma and form text with the lemmas resolve() returns for it.
+
+    A word that is neither a lemma nor a form only matches through its
+    lowercased key, so a store keyed by these texts answers any word with
+    the first of its lookup_keys that it holds. Texts with stray whitespace
+    can never be looked up and are skipped; forms of lemma ids missing from
+    lemmas are left out, as lookup() drops them too.
+    """
+    lemmas_by_text: Dict[str, List[int]] = {}
+    for lemma_id, lemma in conn.execute("SELECT id, lemma FROM lemmas ORDER BY id"):
+        lemmas_by_text.setdefault(str(lemma), []).append(lemma_id)
+    lemmas_by_form: Dict[str, List[int]] = {}
+    for form, lemma_id in conn.execute("""
+        SELECT f.form, f.lemma_id
+        FROM inflected_forms f JOIN lemmas l ON l.id = f.lemma_id
+        GROUP BY f.form, f.lemma_id
+        ORDER BY SUM(f.form_frequency) DESC, f.lemma_id
+    """):
+        lemmas_by_form.setdefault(str(form), []).append(lemma_id)
+
+    texts = dict.fromkeys(list(lemmas_by_text) + list(lemmas_by_form))
+    return {text: resolve_keys(lookup_keys(text), lemmas_by_text, lemmas_by_form)
+            for text in texts if lookup_keys(text)[:1] == [text]}
+
+def make_entry(lemma_row, form_rows, definition_rows, synonym_rows, reference_rows,
+               definition_ids: bool = True, codec: Optional[TextCodec] = None) -> Dict:
+    """Assemble an entry from the rows of LEMMA_SQL, FORMS_SQL, DEFINITIONS_SQL,
+    SYNONYMS_SQL and REFERENCES_SQL (or rows in the same order); codec decodes
+    definitions stored with PHASE3_COMPRESS_TEXT"""
+    references = {}
+    for row in reference_rows:
+        references.setdefault(row['source_definition_id'], []).append({
+            'word': row['word_text'],
+            'position': row['word_position'],
+            'lemma_id': row['referenced_lemma_id'],
+            'lemma': row['lemma'],
+            'type': row['reference_type'],
+        })
+
+    definitions = {}
+    for row in definition_rows:
+        definition = {'id': row['id']} if definition_ids else {}
+        hypernyms = decode_text(row['hypernyms'], codec)
+        definition.update({
+            'definition': decode_text(row['definition_text'], codec),
+            'example': decode_text(row['example_sentence'], codec),
+            'hypernyms': json.loads(hypernyms) if hypernyms else [],
+            'references': references.get(row['id'], []),
+        })
+        definitions.setdefault(row['pos'], []).append(definition)
+
+    synonyms = {}
+    for row in synonym_rows:
+        synonyms.setdefault(row['pos_specific'], []).append(row['lemma'])
+
+    forms = [{'form': row['form'], 'pos': row['pos'], 'frequency': row['form_frequency']}
+             for row in form_rows]
+
+    return {
+        'lemma_id': lemma_row['id'],
+        'lemma': lemma_row['lemma'],
+        'frequency': lemma_row['lemma_frequency'],
+        'rank': lemma_row['lemma_rank'],
+        'dispersion': lemma_row['dispersion_score'],
+        'forms': forms,
+        'definitions': definitions,
+        'synonyms': synonyms,
+    }
+
+class DictionaryReader:
+    """Read-only lookup API over the finished dictionary.db.
+
+    Any surface form ("mice", "Went", "ice cream") is resolved to its lemma(s)
+    through lemmas and inflected_forms, and each lemma comes back as one entry
+    with its definitions grouped by POS, synonyms, hypernyms, word references
+    and frequency rank. Complete lookups are kept in a bounded LRU cache;
+    cached entries are shared, so callers must not modify them.
+    """
+
+    def __init__(self, db_path: str = DATABASE_FILE, cache_size: int = READER_CACHE_SIZE):
+        self.db_path = db_path
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"Database not found: {db_path}")
+
+        self.conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                    check_same_thread=False, cached_statements=READER_CACHED_STATEMENTS)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA query_only = ON")
+        self.conn.create_function('frequency_weight', 1, frequency_weight, deterministic=True)
+        self.codec = load_codec(self.conn)
+        self.full_text = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'definitions_fts'").fetchone() is not None
+        self._cached_lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def normalize(self, word: str) -> str:
+        """Collapse whitespace so "ice  cream" and " ice cream" share a cache slot"""
+        return ' '.join(word.split())
+
+    def resolve(self, word: str) -> List[int]:
+        """Return the lemma ids a surface form belongs to, the lemma itself first"""
+        keys = lookup_keys(word)
+        lemmas_by_text = {key: [row['id'] for row in self.conn.execute(LEMMA_BY_TEXT_SQL, (key,))]
+                          for key in keys}
+        lemmas_by_form = {key: [row['lemma_id'] for row in self.conn.execute(LEMMA_BY_FORM_SQL, (key,))]
+                          for key in keys}
+        return resolve_keys(keys, lemmas_by_text, lemmas_by_form)
+
+    def resolve_many(self, words: Iterable[str]) -> Dict[str, List[int]]:
+        """resolve() for many words at once, with one IN query per READER_BATCH_SIZE words"""
+        words = list(dict.fromkeys(self.normalize(word) for word in words))
+        candidates = list(dict.fromkeys(key for word in words for key in lookup_keys(word)))
+
+        lemmas_by_text: Dict[str, List[int]] = {}
+        lemmas_by_form: Dict[str, List] = {}
+        for chunk in chunked(candidates, READER_BATCH_SIZE):
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(LEMMAS_BY_TEXT_BATCH_SQL.format(placeholders), chunk):
+                lemmas_by_text.setdefault(str(row['lemma']), []).append(row['id'])
+            for row in self.conn.execute(LEMMAS_BY_FORM_BATCH_SQL.format(placeholders), chunk):
+                lemmas_by_form.setdefault(str(row['form']), []).append((row['frequency'], row['lemma_id']))
+
+        # Same order as LEMMA_BY_FORM_SQL: frequency descending with NULLs last, then lemma_id
+        form_lemma_ids = {form: [lemma_id for _, lemma_id in
+                                 sorted(form_lemmas, key=lambda item: (item[0] is None, -(item[0] or 0), item[1]))]
+                          for form, form_lemmas in lemmas_by_form.items()}
+
+        return {word: resolve_keys(lookup_keys(word), lemmas_by_text, form_lemma_ids) for word in words}
+
+    def lemma_names(self, lemma_ids: Iterable[int]) -> Dict[int, str]:
+        """Lemma text of many lemma ids"""
+        names = {}
+        for chunk in chunked(list(dict.fromkeys(lemma_ids)), READER_BATCH_SIZE):
+            for row in self.conn.execute(LEMMA_TEXT_BATCH_SQL.format(','.join('?' * len(chunk))), chunk):
+                names[row['id']] = str(row['lemma'])
+        return names
+
+    def resolve_document(self, text: str, block: int = READER_DOCUMENT_BLOCK) -> Iterator[Dict]:
+        """Yield every word token of a document with its offsets and lemmas.
+
+        The text is tokenized once and consumed a block of tokens at a time:
+        each word not seen earlier in the document is resolved with
+        resolve_many, then the block's tokens are yielded in order, so
+        results start arriving before a long document is finished.
+        """
+        resolved: Dict[str, List[int]] = {}
+        names: Dict[int, str] = {}
+        matches = DOCUMENT_TOKEN_PATTERN.finditer(text)
+        while True:
+            block_matches = list(islice(matches, block))
+            if not block_matches:
+                return
+
+            new_words = {match.group() for match in block_matches}.difference(resolved)
+            resolved.update(self.resolve_many(new_words))
+            names.update(self.lemma_names(lemma_id for word in new_words for lemma_id in resolved[word]
+                                          if lemma_id not in names))
+
+            for match in block_matches:
+                lemma_ids = resolved[match.group()]
+                yield {
+                    'token': match.group(),
+                    'start': match.start(),
+                    'end': match.end(),
+                    'lemma_ids': lemma_ids,
+                    'lemmas': [names[lemma_id] for lemma_id in lemma_ids],
+                }
+
+    def get_entry(self, lemma_id: int) -> Optional[Dict]:
+        """Return the full entry of one lemma"""
+        lemma_row = self.conn.execute(LEMMA_SQL, (lemma_id,)).fetchone()
+        if lemma_row is None:
+            return None
+
+        return make_entry(lemma_row,
+                          self.conn.execute(FORMS_SQL, (lemma_id,)),
+                          self.conn.execute(DEFINITIONS_SQL, (lemma_id,)),
+                          self.conn.execute(SYNONYMS_SQL, (lemma_id,)),
+                          self.conn.execute(REFERENCES_SQL, (lemma_id,)),
+                          codec=self.codec)
+
+    def _lookup(self, word: str) -> List[Dict]:
+        entries = (self.get_entry(lemma_id) for lemma_id in self.resolve(word))
+        return [entry for entry in entries if entry is not None]
+
+    def lookup(self, word: str) -> List[Dict]:
+        """Return the entries of every lemma a word resolves to, most likely first"""
+        if not word or not word.strip():
+            return []
+        return self._cached_lookup(self.normalize(word))
+
+    def search(self, text: str, field: Optional[str] = None, match_all: bool = False,
+               limit: int = FULL_TEXT_SEARCH_LIMIT) -> List[Dict]:
+        """Full-text search over definitions and examples ("fear of heights").
+        
+        Matches are ranked by bm25, with definition text weighted above
+        examples, and scaled up for frequent lemmas. field limits the search to
+        'definition' or 'example'; by default any term may match, match_all
+        requires all of them. Needs a database built with PHASE3_FULL_TEXT.
+        """
+        if not self.full_text:
+            raise ValueError(f"No full-text index in {self.db_path} (build with PHASE3_FULL_TEXT)")
+        query = full_text_query(text, field, match_all)
+        if query is None:
+            return []
+
+        rows = self.conn.execute(SEARCH_SQL, (FULL_TEXT_DEFINITION_WEIGHT, FULL_TEXT_EXAMPLE_WEIGHT,
+                                              query, limit))
+        return [{
+            'definition_id': row['definition_id'],
+            'lemma_id': row['lemma_id'],
+            'lemma': row['lemma'],
+            'pos': row['pos'],
+            'definition': row['definition_text'],
+            'example': row['example_sentence'],
+            'frequency': row['lemma_frequency'],
+            'score': row['score'],
+        } for row in rows]
+
+    def cache_info(self):
+        return self._cached_lookup.cache_info()
+
+    def clear_cache(self):
+        self._cached_lookup.cache_clear()
+
+def measure_lookups(reader: DictionaryReader, words: List[str]) -> Dict[str, float]:
+    """Time each lookup in milliseconds, returning mean and p95"""
+    timings = []
+    for word in words:
+        lookup_start = time.perf_counter()
+        reader.lookup(word)
+        timings.append((time.perf_counter() - lookup_start) * 1000)
+
+    timings.sort()
+    return {
+        'mean_ms': sum(timings) / len(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max_ms': timings[-1],
+    }
+
+def benchmark_document(words: List[str], tokens: int = READER_BENCHMARK_DOCUMENT_TOKENS,
+                       seed: int = 0) -> str:
+    """A long document of words drawn from the given ones, with capitals and punctuation"""
+    rng = random.Random(seed)
+    parts = []
+    for index, word in enumerate(rng.choices(words, k=tokens)):
+        parts.append(word.capitalize() if index % 12 == 0 else word)
+        parts.append('. ' if index % 12 == 11 else ', ' if index % 5 == 4 else ' ')
+    return ''.join(parts)
+
+def measure_document(reader: DictionaryReader, text: str):
+    """Compare resolving a document token by token with resolve_document"""
+    tokens = [match.group() for match in DOCUMENT_TOKEN_PATTERN.finditer(text)]
+    if not tokens:
+        return
+
+    single_start = time.perf_counter()
+    for token in tokens:
+        reader.resolve(token)
+    single_seconds = time.perf_counter() - single_start
+
+    batch_start = time.perf_counter()
+    resolved = sum(1 for token in reader.resolve_document(text) if token['lemma_ids'])
+    batch_seconds = time.perf_counter() - batch_start
+
+    logger.info(f"Document of {len(tokens)} tokens ({len(set(tokens))} distinct), {resolved} resolved: "
+                f"{len(tokens) / single_seconds:,.0f} tokens/s one by one, "
+                f"{len(tokens) / batch_seconds:,.0f} tokens/s with resolve_document")
+
+def main():
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    with DictionaryReader() as reader:
+        if len(sys.argv) > 2 and sys.argv[1] == '--document':
+            with open(sys.argv[2], encoding='utf-8') as f:
+                text = f.read()
+            document_start = time.perf_counter()
+            count = 0
+            for token in reader.resolve_document(text):
+                print(f"{token['start']}\t{token['end']}\t{token['token']}\t{', '.join(token['lemmas'])}")
+                count += 1
+            seconds = time.perf_counter() - document_start
+            logger.info(f"Resolved {count} tokens in {seconds:.2f}s ({count / max(seconds, 1e-9):,.0f} tokens/s)")
+            return
+
+        if len(sys.argv) > 2 and sys.argv[1] == '--search':
+            if not reader.full_text:
+                logger.error(f"No full-text index in {reader.db_path} (build with PHASE3_FULL_TEXT)")
+                return
+            for result in reader.search(' '.join(sys.argv[2:])):
+                print(f"{result['score']:.3f}\t{result['lemma']} ({result['pos']})\t{result['definition']}")
+            return
+
+        if len(sys.argv) > 1:
+            for entry in reader.lookup(' '.join(sys.argv[1:])):
+                print(json.dumps(entry, indent=2, ensure_ascii=False))
+            return
+
+        # Without a word, time lookups of the most frequent lemmas and their forms
+        words = [row[0] for row in reader.conn.execute("""
+            SELECT lemma FROM lemmas ORDER BY lemma_frequency DESC LIMIT ?
+        """, (READER_BENCHMARK_WORDS,))]
+        words += [row[0] for row in reader.conn.execute("""
+            SELECT form FROM inflected_forms ORDER BY form_frequency DESC LIMIT ?
+        """, (READER_BENCHMARK_WORDS,))]
+        if not words:
+            logger.error("Database has no lemmas")
+            return
+
+        for label in ("Cold", "Cached"):
+            stats = measure_lookups(reader, words)
+            logger.info(f"{label} lookups of {len(words)} words: mean {stats['mean_ms']:.3f} ms, "
+                        f"p95 {stats['p95_ms']:.3f} ms, max {stats['max_ms']:.3f} ms")
+        logger.info(f"Cache: {reader.cache_info()}")
+        measure_document(reader, benchmark_document(words))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+## entry_store.py
+
+import hashlib
+import json
+import sqlite3
+import logging
+import time
+import sys
+import os
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from dictionary_reader import lookup_keys, make_entry, resolve_all
+from text_compression import load_codec
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+ENTRY_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS entries (
+        lemma_id INTEGER PRIMARY KEY,
+        content_hash INTEGER NOT NULL,
+        entry BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS entry_keys (
+        key TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        lemma_id INTEGER NOT NULL,
+        PRIMARY KEY (key, position)
+    ) WITHOUT ROWID;
+"""
+
+# The reader's per-lemma statements as whole-table scans, each ordered by lemma
+# first so they can be walked side by side
+LEMMAS_SCAN_SQL = """
+    SELECT id, lemma, lemma_frequency, lemma_rank, dispersion_score
+    FROM lemmas ORDER BY id
+"""
+FORMS_SCAN_SQL = """
+    SELECT lemma_id, form, pos, form_frequency
+    FROM inflected_forms
+    ORDER BY lemma_id, form_frequency DESC, form
+"""
+DEFINITIONS_SCAN_SQL = """
+    SELECT lemma_id, id, pos, definition_text, definition_order, example_sentence, hypernyms
+    FROM definitions
+    ORDER BY lemma_id, pos, definition_order, id
+"""
+SYNONYMS_SCAN_SQL = """
+    SELECT s.lemma_id, s.pos_specific, l.lemma
+    FROM synonyms s JOIN lemmas l ON l.id = s.synonym_lemma_id
+    ORDER BY s.lemma_id, s.pos_specific, s.id
+"""
+REFERENCES_SCAN_SQL = """
+    SELECT d.lemma_id, r.source_definition_id, r.referenced_lemma_id, r.word_position,
+           r.word_text, r.reference_type, l.lemma
+    FROM definitions d
+    JOIN word_references r ON r.source_definition_id = d.id
+    JOIN lemmas l ON l.id = r.referenced_lemma_id
+    ORDER BY d.lemma_id, r.source_definition_id, r.reference_type, r.word_position
+"""
+INSERT_ENTRY_SQL = "INSERT OR REPLACE INTO entries (lemma_id, content_hash, entry) VALUES (?, ?, ?)"
+LOOKUP_SQL = """
+    SELECT e.entry
+    FROM entry_keys k JOIN entries e ON e.lemma_id = k.lemma_id
+    WHERE k.key = ?
+    ORDER BY k.position
+"""
+
+def content_hash(blob: bytes) -> int:
+    """64-bit hash of a serialized entry, signed so it fits an SQLite INTEGER"""
+    return int.from_bytes(hashlib.blake2b(blob, digest_size=8).digest(), 'little', signed=True)
+
+def rows_by_lemma(conn: sqlite3.Connection, sql: str) -> Iterator[Tuple[int, List[sqlite3.Row]]]:
+    return ((lemma_id, list(rows)) for lemma_id, rows in groupby(conn.execute(sql), key=lambda row: row[0]))
+
+def iter_entries(conn: sqlite3.Connection) -> Iterator[Tuple[int, Dict]]:
+    """Every lemma's entry, built from one ordered scan per table.
+
+    Definition ids are left out: phase 3 assigns new ones on every run, and
+    an entry should only change when its content does.
+    """
+    scans = [rows_by_lemma(conn, sql) for sql in
+             (FORMS_SCAN_SQL, DEFINITIONS_SCAN_SQL, SYNONYMS_SCAN_SQL, REFERENCES_SCAN_SQL)]
+    pending: List[Optional[Tuple[int, List]]] = [next(scan, None) for scan in scans]
+    codec = load_codec(conn)
+
+    for lemma_row in conn.execute(LEMMAS_SCAN_SQL):
+        lemma_id = lemma_row['id']
+        groups = []
+        for index, scan in enumerate(scans):
+            # Skip rows of lemma ids missing from lemmas
+            while pending[index] is not None and pending[index][0] < lemma_id:
+                pending[index] = next(scan, None)
+            if pending[index] is not None and pending[index][0] == lemma_id:
+                groups.append(pending[index][1])
+                pending[index] = next(scan, None)
+            else:
+                groups.append([])
+        yield lemma_id, make_entry(lemma_row, *groups, definition_ids=False, codec=codec)
+
+def load_entry_keys(conn: sqlite3.Connection) -> Dict[str, Tuple[int, ...]]:
+    """Every lemma and form, as written, with the lemmas DictionaryReader.resolve returns for it"""
+    return {key: tuple(lemma_ids) for key, lemma_ids in resolve_all(conn).items()}
+
+def materialize_entries(db_path: str = DATABASE_FILE) -> Dict[str, int]:
+    """Write one serialized entry per lemma into the entries table.
+
+    Existing rows are compared by content hash, so a rebuild only writes the
+    entries and keys that changed and deletes those of vanished lemmas.
+    """
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.executescript(ENTRY_TABLES_SQL)
+        stored = dict(conn.execute("SELECT lemma_id, content_hash FROM entries").fetchall())
+
+        stats = {'entries': 0, 'written': 0, 'deleted': 0, 'keys': 0, 'keys_written': 0, 'keys_deleted': 0}
+        seen = set()
+        changed = []
+        for lemma_id, entry in iter_entries(conn):
+            blob = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            entry_hash = content_hash(blob)
+            seen.add(lemma_id)
+            if stored.get(lemma_id) != entry_hash:
+                changed.append((lemma_id, entry_hash, blob))
+            if len(changed) >= ENTRIES_BATCH_SIZE:
+                conn.executemany(INSERT_ENTRY_SQL, changed)
+                stats['written'] += len(changed)
+                changed = []
+        conn.executemany(INSERT_ENTRY_SQL, changed)
+        stats['written'] += len(changed)
+        stats['entries'] = len(seen)
+
+        removed = [(lemma_id,) for lemma_id in stored if lemma_id not in seen]
+        conn.executemany("DELETE FROM entries WHERE lemma_id = ?", removed)
+        stats['deleted'] = len(removed)
+
+        keys = load_entry_keys(conn)
+        stored_keys: Dict[str, List[int]] = {}
+        for row in conn.execute("SELECT key, lemma_id FROM entry_keys ORDER BY key, position"):
+            stored_keys.setdefault(row['key'], []).append(row['lemma_id'])
+        changed_keys = [key for key, lemma_ids in keys.items() if tuple(stored_keys.get(key, ())) != lemma_ids]
+        removed_keys = [key for key in stored_keys if key not in keys]
+        conn.executemany("DELETE FROM entry_keys WHERE key = ?", [(key,) for key in changed_keys + removed_keys])
+        conn.executemany("INSERT INTO entry_keys (key, position, lemma_id) VALUES (?, ?, ?)",
+                         [(key, position, lemma_id) for key in changed_keys
+                          for position, lemma_id in enumerate(keys[key])])
+        stats['keys'] = len(keys)
+        stats['keys_written'] = len(changed_keys)
+        stats['keys_deleted'] = len(removed_keys)
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.info(f"Materialized {stats['entries']} entries ({stats['written']} written, "
+                f"{stats['deleted']} deleted) and {stats['keys']} keys ({stats['keys_written']} written) "
+                f"in {time.time() - start_time:.2f}s")
+    return stats
+
+class EntryStore:
+    """Lookups from the entries table: one indexed read returns finished entries.
+
+    Entries have the same shape as DictionaryReader.get_entry, without
+    definition ids.
+    """
+
+    def __init__(self, db_path: str = DATABASE_FILE):
+        self.db_path = db_path
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"Database not found: {db_path}")
+
+        self.conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA query_only = ON")
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'entry_keys'").fetchone() is None:
+            self.close()
+            raise ValueError(f"No materialized entries in {db_path} (build with MATERIALIZE_ENTRIES)")
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def entry(self, lemma_id: int) -> Optional[Dict]:
+        row = self.conn.execute("SELECT entry FROM entries WHERE lemma_id = ?", (lemma_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lookup(self, word: str) -> List[Dict]:
+        """Return the entries of every lemma a word resolves to, most likely first"""
+        # A word stored as written has the reader's full resolution; any other
+        # word can only match through its lowercased key
+        for key in lookup_keys(word or ''):
+            rows = self.conn.execute(LOOKUP_SQL, (key,)).fetchall()
+            if rows:
+                return [json.loads(row[0]) for row in rows]
+        return []
+
+def main():
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    if len(sys.argv) > 1:
+        with EntryStore() as store:
+            for entry in store.lookup(' '.join(sys.argv[1:])):
+                print(json.dumps(entry, indent=2, ensure_ascii=False))
+        return
+
+    materialize_entries()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+## fuzzy_index.py
+
+import random
+import sqlite3
+import struct
+import logging
+import time
+import zlib
+import sys
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# File layout: header, then five sections whose byte lengths the header gives
+#   words        every lemma and inflected form, UTF-8, newline separated
+#   lemmas       index (uint32) of the lemma each word belongs to
+#   frequencies  lemma_frequency (uint64) of that lemma, used for ranking
+#   hashes       CRC32 (uint32) of every deletion variant, sorted
+#   postings     index (uint32) of the word each hash entry came from
+MAGIC = b'DICTFZY\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIIIIQQQQQ')
+
+def normalize_word(word: str) -> str:
+    return ' '.join(word.lower().split())
+
+def delete_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8'))
+
+def deletion_variants(word: str, max_distance: int, prefix_length: int) -> Set[str]:
+    """The word's prefix with up to max_distance characters deleted, including none"""
+    word = word[:prefix_length]
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+def distance_from(source: str) -> Callable[[str], int]:
+    """Return a function giving the optimal string alignment distance (adjacent
+    swaps count once) from source to any target.
+
+    Uses Hyyrö's bit-parallel algorithm: the character masks of source are
+    built once, and each target then costs a few integer operations per
+    character instead of a full dynamic programming table.
+    """
+    length = len(source)
+    masks = {}
+    bit = 1
+    for character in source:
+        masks[character] = masks.get(character, 0) | bit
+        bit <<= 1
+    full = (1 << length) - 1
+    last = 1 << (length - 1) if length else 0
+
+    def distance_to(target: str) -> int:
+        if not length:
+            return len(target)
+        vp, vn, d0, previous_mask = full, 0, 0, 0
+        distance = length
+        for character in target:
+            mask = masks.get(character, 0)
+            transposed = (((~d0) & mask) << 1) & previous_mask
+            d0 = ((((mask & vp) + vp) ^ vp) | mask | vn | transposed) & full
+            hp = vn | (~(d0 | vp) & full)
+            hn = d0 & vp
+            if hp & last:
+                distance += 1
+            elif hn & last:
+                distance -= 1
+            hp = ((hp << 1) | 1) & full
+            hn = (hn << 1) & full
+            vp = hn | (~(d0 | hp) & full)
+            vn = hp & d0
+            previous_mask = mask
+        return distance
+
+    return distance_to
+
+def load_words(conn: sqlite3.Connection) -> Tuple[List[str], Dict[str, str], Dict[str, int]]:
+    """All lemmas and forms, the lemma each belongs to and each lemma's frequency"""
+    lemma_by_id = {}
+    lemma_frequency = {}
+    lemma_of = {}
+    for lemma_id, lemma, frequency in conn.execute("SELECT id, lemma, lemma_frequency FROM lemmas"):
+        lemma = normalize_word(str(lemma))
+        if not lemma:
+            continue
+        lemma_by_id[lemma_id] = lemma
+        lemma_frequency[lemma] = max(lemma_frequency.get(lemma, 0), frequency or 0)
+        lemma_of[lemma] = lemma
+
+    # Like DictionaryReader.resolve: a lemma keeps its own spelling, a form goes to
+    # the lemma it is most frequent for
+    for form, lemma_id, _ in conn.execute("""
+        SELECT form, lemma_id, SUM(form_frequency) AS frequency
+        FROM inflected_forms
+        GROUP BY form, lemma_id
+        ORDER BY frequency DESC, lemma_id
+    """):
+        form = normalize_word(str(form))
+        if form and form not in lemma_of and lemma_id in lemma_by_id:
+            lemma_of[form] = lemma_by_id[lemma_id]
+
+    return sorted(lemma_of), lemma_of, lemma_frequency
+
+def build_fuzzy_index(db_path: str = DATABASE_FILE, output_path: str = FUZZY_INDEX_FILE,
+                      max_distance: int = FUZZY_MAX_DISTANCE,
+                      prefix_length: int = FUZZY_PREFIX_LENGTH) -> str:
+    """Build the deletion-neighbourhood index from the lemmas and inflected forms of a database"""
+    start_time = time.time()
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        words, lemma_of, lemma_frequency = load_words(conn)
+    finally:
+        conn.close()
+
+    word_index = {word: index for index, word in enumerate(words)}
+    lemmas = array('I', (word_index[lemma_of[word]] for word in words))
+    frequencies = array('Q', (lemma_frequency[lemma_of[word]] for word in words))
+
+    # Hash and word index packed into one integer so a single sort orders both
+    entries = sorted(delete_hash(variant) << 32 | index
+                     for index, word in enumerate(words)
+                     for variant in deletion_variants(word, max_distance, prefix_length))
+    hashes = array('I', (entry >> 32 for entry in entries))
+    postings = array('I', (entry & 0xFFFFFFFF for entry in entries))
+
+    sections = [
+        '\n'.join(words).encode('utf-8'),
+        lemmas.tobytes(),
+        frequencies.tobytes(),
+        hashes.tobytes(),
+        postings.tobytes(),
+    ]
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, max_distance, prefix_length, len(words), len(entries),
+                            *(len(section) for section in sections)))
+        for section in sections:
+            f.write(section)
+    os.replace(temp_path, output_path)
+
+    logger.info(f"Built fuzzy index with {len(words)} words and {len(entries)} deletion variants "
+                f"({Path(output_path).stat().st_size / 1024 / 1024:.1f} MB) "
+                f"in {time.time() - start_time:.2f}s")
+    return output_path
+
+class FuzzyIndex:
+    """Spelling suggestions for misspelled or OCR-mangled words (symmetric delete).
+
+    Every word's prefix is stored with all its variants of up to
+    FUZZY_MAX_DISTANCE deleted characters. Two words within that edit
+    distance share a variant, so a query only hashes its own variants, looks
+    them up in the sorted hash array and checks the few words they point to
+    with a bit-parallel edit distance.
+    """
+
+    def __init__(self, path: str = FUZZY_INDEX_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, self.max_distance, self.prefix_length, word_count, _, *section_sizes = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a fuzzy index (version {FORMAT_VERSION}): {path}")
+
+        sections = []
+        offset = HEADER.size
+        for size in section_sizes:
+            sections.append(data[offset:offset + size])
+            offset += size
+        words_blob, lemmas_blob, frequencies_blob, hashes_blob, postings_blob = sections
+
+        self.words = words_blob.decode('utf-8').split('\n') if word_count else []
+        self.lemmas = array('I')
+        self.lemmas.frombytes(lemmas_blob)
+        self.frequencies = array('Q')
+        self.frequencies.frombytes(frequencies_blob)
+        self.hashes = array('I')
+        self.hashes.frombytes(hashes_blob)
+        self.postings = array('I')
+        self.postings.frombytes(postings_blob)
+
+    def __len__(self):
+        return len(self.words)
+
+    def candidates(self, word: str, max_distance: int) -> Set[int]:
+        """Indexes of words sharing a deletion variant with word"""
+        found = set()
+        for variant in deletion_variants(word, max_distance, self.prefix_length):
+            hash_value = delete_hash(variant)
+            low = bisect_left(self.hashes, hash_value)
+            high = bisect_right(self.hashes, hash_value, low)
+            found.update(self.postings[low:high])
+        return found
+
+    def suggest(self, word: str, max_distance: Optional[int] = None,
+                limit: int = FUZZY_MAX_RESULTS) -> List[Dict]:
+        """Return dictionary words within max_distance edits of word.
+
+        Closer words come first; words at the same distance are ranked by the
+        lemma_frequency of the lemma they belong to.
+        """
+        word = normalize_word(word)
+        if not word:
+            return []
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        distance_to = distance_from(word)
+        words = self.words
+        suggestions = []
+        for index in self.candidates(word, max_distance):
+            candidate = words[index]
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = distance_to(candidate)
+            if distance <= max_distance:
+                suggestions.append((distance, -self.frequencies[index], candidate, index))
+        suggestions.sort()
+
+        return [{
+            'word': candidate,
+            'lemma': self.words[self.lemmas[index]],
+            'distance': distance,
+            'frequency': -negative_frequency,
+        } for distance, negative_frequency, candidate, index in suggestions[:limit]]
+
+def misspell(word: str, edits: int, rng: random.Random) -> str:
+    """Apply random deletions, insertions, substitutions or swaps to a word"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    for _ in range(edits):
+        position = rng.randrange(len(word) + 1)
+        operation = rng.choice(('delete', 'insert', 'substitute', 'swap')) if len(word) > 1 else 'insert'
+        if operation == 'delete' and position < len(word):
+            word = word[:position] + word[position + 1:]
+        elif operation == 'substitute' and position < len(word):
+            word = word[:position] + rng.choice(letters) + word[position + 1:]
+        elif operation == 'swap' and position < len(word) - 1:
+            word = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+        else:
+            word = word[:position] + rng.choice(letters) + word[position:]
+    return word
+
+def run_benchmark(index: FuzzyIndex, queries: int = FUZZY_BENCHMARK_QUERIES, seed: int = 0):
+    """Time suggestions for frequency-weighted words with one or two random edits"""
+    if not index.words:
+        logger.error("Fuzzy index is empty")
+        return
+
+    rng = random.Random(seed)
+    cumulative = list(accumulate(index.frequencies)) if any(index.frequencies) else None
+    originals = rng.choices(index.words, cum_weights=cumulative, k=queries)
+    typos = [misspell(word, rng.randint(1, 2), rng) for word in originals]
+
+    timings = []
+    found = 0
+    for original, typo in zip(originals, typos):
+        query_start = time.perf_counter()
+        suggestions = index.suggest(typo)
+        timings.append((time.perf_counter() - query_start) * 1000)
+        found += any(suggestion['word'] == original for suggestion in suggestions)
+
+    timings.sort()
+    logger.info(f"Fuzzy: {queries} misspelled words, mean {sum(timings) / len(timings):.3f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms, max {timings[-1]:.3f} ms, "
+                f"intended word suggested for {found / queries:.1%}")
+
+def main():
+    if len(sys.argv) > 1:
+        index = FuzzyIndex()
+        for suggestion in index.suggest(' '.join(sys.argv[1:])):
+            print(f"{suggestion['word']}\t{suggestion['lemma']}\t"
+                  f"{suggestion['distance']}\t{suggestion['frequency']}")
+        return
+
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    build_fuzzy_index()
+    load_start = time.time()
+    index = FuzzyIndex()
+    logger.info(f"Loaded fuzzy index in {(time.time() - load_start) * 1000:.1f} ms")
+    run_benchmark(index)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+## hypernym_closure.py
+
+import logging
+import sys
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+class HypernymClosure:
+    """Transitive closure of the synset hypernym graph, computed once.
+
+    Every synset's ancestors are derived from its direct hypernyms' already
+    computed ancestor maps, visiting the graph in depth-first post-order so
+    each edge is followed a single time. Synsets that close a cycle fall back
+    to a breadth-first walk, which keeps the result exact without recursion.
+    """
+
+    def __init__(self, adjacency: Mapping[str, Iterable[str]],
+                 synset_to_lemmas: Optional[Mapping[str, List[str]]] = None,
+                 max_depth: Optional[int] = None):
+        self.adjacency = {synset_id: tuple(dict.fromkeys(targets))
+                          for synset_id, targets in adjacency.items()}
+        self.synset_to_lemmas = synset_to_lemmas if synset_to_lemmas is not None else {}
+        self.max_depth = max_depth
+        self._closure: Dict[str, Dict[str, int]] = {}
+        self._compute_all()
+
+        total_links = sum(len(ancestors) for ancestors in self._closure.values())
+        logger.info(f"Computed hypernym closure for {len(self._closure)} synsets "
+                    f"({total_links} ancestor links)")
+
+    def _within_depth(self, distance: int) -> bool:
+        return self.max_depth is None or distance <= self.max_depth
+
+    def _compute_all(self):
+        """Fill the closure of every synset in a single iterative DFS pass"""
+        in_progress, done = 1, 2
+        state = {}
+
+        for start in self.adjacency:
+            if start in state:
+                continue
+
+            state[start] = in_progress
+            stack = [(start, iter(self.adjacency[start]))]
+            closes_cycle = set()
+
+            while stack:
+                synset_id, targets = stack[-1]
+                descended = False
+                for target_id in targets:
+                    target_state = state.get(target_id)
+                    if target_state is None:
+                        state[target_id] = in_progress
+                        stack.append((target_id, iter(self.adjacency.get(target_id, ()))))
+                        descended = True
+                        break
+                    if target_state == in_progress:
+                        closes_cycle.add(synset_id)
+                if descended:
+                    continue
+
+                stack.pop()
+                state[synset_id] = done
+                if synset_id in closes_cycle:
+                    self._closure[synset_id] = self._walk(synset_id)
+                else:
+                    self._closure[synset_id] = self._merge_targets(synset_id)
+
+    def _merge_targets(self, synset_id: str) -> Dict[str, int]:
+        """Build a synset's ancestors from its direct hypernyms' finished closures"""
+        ancestors = {}
+        if not self._within_depth(1):
+            return ancestors
+
+        for target_id in self.adjacency.get(synset_id, ()):
+            ancestors[target_id] = 1
+
+        for target_id in self.adjacency.get(synset_id, ()):
+            for ancestor_id, distance in self._closure.get(target_id, {}).items():
+                distance += 1
+                if self._within_depth(distance) and distance < ancestors.get(ancestor_id, distance + 1):
+                    ancestors[ancestor_id] = distance
+
+        return ancestors
+
+    def _walk(self, synset_id: str) -> Dict[str, int]:
+        """Breadth-first ancestor search, used for synsets on a hypernym cycle"""
+        ancestors = {}
+        queue = deque((target_id, 1) for target_id in self.adjacency.get(synset_id, ()))
+
+        while queue:
+            current_id, distance = queue.popleft()
+            if current_id in ancestors or not self._within_depth(distance):
+                continue
+            ancestors[current_id] = distance
+            for target_id in self.adjacency.get(current_id, ()):
+                if target_id not in ancestors:
+                    queue.append((target_id, distance + 1))
+
+        return ancestors
+
+    def ancestors(self, synset_id: str) -> Dict[str, int]:
+        """Return all ancestor synset IDs of a synset mapped to their shortest distance"""
+        return self._closure.get(synset_id, {})
+
+    def hypernym_lemmas(self, synset_id: str) -> List[str]:
+        """Return the lemmas of every ancestor synset, nearest ancestors first"""
+        ancestors = self.ancestors(synset_id)
+        lemmas = []
+        for ancestor_id in sorted(ancestors, key=ancestors.get):
+            lemmas.extend(self.synset_to_lemmas.get(ancestor_id, []))
+        return lemmas
@@ -4,28 +4,41 @@
 
 import pandas as pd
 import sqlite3
+import csv
 import json
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 import re
 import sys
 import os
+from contextlib import nullcontext
 
 # Add parent directory to path for config import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import *
+from bulk_build import BulkBuild
+from build_metrics import metrics, timed_step
 
 # Set up logging
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 class DictionaryDatabaseBuilder:
-    def __init__(self, excel_file_path: str = EXCEL_FILE, db_path: str = DATABASE_FILE):
+    def __init__(self, excel_file_path: str = EXCEL_FILE, db_path: str = DATABASE_FILE,
+                 source_format: str = SOURCE_FORMAT, tsv_files: Dict[str, str] = TSV_FILES,
+                 bulk_build: bool = BULK_BUILD):
         self.excel_file_path = excel_file_path
         self.db_path = db_path
+        self.bulk_build = bulk_build
+        self.source_format = source_format
+        self.tsv_files = tsv_files
         self.conn = None
+        # Lemmas whose frequency/rank were already set, so later chunks keep the first value
+        self.ranked_lemmas = set()
+        self.lemma_ids = None
         
+    @timed_step
     def create_database_schema(self):
         """Create all database tables with proper schema"""
         schema_sql = """
@@ -126,6 +139,7 @@ class DictionaryDatabaseBuilder:
         self.conn.commit()
         logger.info("Database schema created successfully")
     
+    @timed_step
     def create_indexes(self):
         """Create performance indexes"""
         indexes_sql = """
@@ -159,6 +173,7 @@ class DictionaryDatabaseBuilder:
         cursor.execute("SELECT id FROM languages WHERE code = 'en'")
         return cursor.fetchone()[0]
     
+    @timed_step
     def load_excel_data(self) -> Dict[str, pd.DataFrame]:
         """Load all tabs from Excel file"""
         logger.info(f"Loading Excel file: {self.excel_file_path}")
@@ -171,6 +186,7 @@ class DictionaryDatabaseBuilder:
             excel_data['lemmas'] = pd.read_excel(self.excel_file_path, sheet_name=SHEETS['lemmas'], nrows=nrows)
             excel_data['subgenres'] = pd.read_excel(self.excel_file_path, sheet_name=SHEETS['subgenres'], nrows=nrows)
             
+            metrics.count(sum(len(sheet) for sheet in excel_data.values()))
             logger.info(f"Loaded {len(excel_data['wordforms'])} word forms")
             logger.info(f"Loaded {len(excel_data['lemmas'])} lemma entries")
             logger.info(f"Loaded {len(excel_data['subgenres'])} subgenre entries")
@@ -180,23 +196,150 @@ class DictionaryDatabaseBuilder:
             logger.error(f"Error loading Excel file: {e}")
             raise
     
+    def find_tsv_header_line(self, tsv_file_path: str) -> int:
+        """Return the index of the header line, skipping the wordfrequency.info preamble"""
+        with open(tsv_file_path, 'r', encoding=TSV_ENCODING, errors='replace') as f:
+            for line_number, line in enumerate(f):
+                if '\t' in line:
+                    return line_number
+        raise ValueError(f"No tab-separated header found in {tsv_file_path}")
+    
+    def iter_tsv_chunks(self, source: str) -> Iterator[pd.DataFrame]:
+        """Stream one wordfrequency.info TSV file in chunks with fixed column dtypes"""
+        tsv_file_path = self.tsv_files[source]
+        header_line = self.find_tsv_header_line(tsv_file_path)
+        
+        with open(tsv_file_path, 'r', encoding=TSV_ENCODING, errors='replace') as f:
+            for _ in range(header_line):
+                f.readline()
+            columns = [col for col in f.readline().rstrip('\r\n').split('\t') if col]
+        
+        # Text columns stay strings (so words like "null" or "nan" survive), counts are floats
+        dtypes = {col: str if col in TSV_TEXT_COLUMNS else 'float64' for col in columns}
+        
+        logger.info(f"Streaming {source} from TSV file: {tsv_file_path}")
+        reader = pd.read_csv(
+            tsv_file_path,
+            sep='\t',
+            skiprows=header_line,
+            usecols=columns,
+            index_col=False,
+            dtype=dtypes,
+            chunksize=TSV_CHUNK_SIZE,
+            nrows=SAMPLE_ROWS if SAMPLE_ROWS else None,
+            quoting=csv.QUOTE_NONE,
+            keep_default_na=False,
+            na_values=[''],
+            encoding=TSV_ENCODING,
+            encoding_errors='replace'
+        )
+        
+        total_rows = 0
+        with reader:
+            chunks = iter(reader)
+            while True:
+                # Timed apart from the processing of each chunk, which runs between the yields
+                with metrics.step(f"read_{source}"):
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        chunk = chunk.dropna(subset=['lemma'])
+                        metrics.count(len(chunk))
+                if chunk is None:
+                    break
+                total_rows += len(chunk)
+                yield chunk
+        
+        logger.info(f"Streamed {total_rows} {source} rows")
+    
+    def process_tsv_sources(self, language_id: int):
+        """Load lemmas, word forms and subgenres from the TSV files chunk by chunk"""
+        for lemmas_chunk in self.iter_tsv_chunks('lemmas'):
+            self.process_lemmas_data(lemmas_chunk, language_id)
+            self.process_broad_domains(lemmas_chunk)
+        
+        for wordforms_chunk in self.iter_tsv_chunks('wordforms'):
+            self.process_wordforms_data(wordforms_chunk)
+        
+        for subgenres_chunk in self.iter_tsv_chunks('subgenres'):
+            self.process_subgenres(subgenres_chunk)
+    
+    def get_lemma_ids(self) -> pd.DataFrame:
+        """Read all lemma ids in one query, re-reading only after new lemmas were inserted"""
+        if self.lemma_ids is None:
+            self.lemma_ids = pd.read_sql_query(
+                "SELECT id AS lemma_id, lemma AS lemma_key FROM lemmas", self.conn
+            )
+        return self.lemma_ids
+    
+    def attach_lemma_ids(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Merge lemma ids onto rows by their 'lemma' column, dropping unknown lemmas"""
+        # SQLite stores non-text lemmas (e.g. numbers read from Excel) as their text form
+        lemma_keys = df['lemma'].map(lambda value: value if isinstance(value, str) or pd.isna(value) else str(value))
+        keyed = pd.concat([df, lemma_keys.rename('lemma_key')], axis=1)
+        return keyed.merge(self.get_lemma_ids(), on='lemma_key', how='inner')
+    
+    @timed_step
+    def melt_context_columns(self, df: pd.DataFrame, context_columns: List) -> pd.DataFrame:
+        """Reshape per-context frequency columns into (lemma_id, PoS, context_name, frequency) rows"""
+        wide = self.attach_lemma_ids(df)[['lemma_id', 'PoS'] + context_columns]
+        wide.insert(0, 'row_order', range(len(wide)))
+        
+        long = wide.melt(
+            id_vars=['row_order', 'lemma_id', 'PoS'],
+            value_vars=context_columns,
+            var_name='context_name',
+            value_name='frequency'
+        )
+        long['frequency'] = pd.to_numeric(long['frequency'], errors='coerce')
+        long = long[long['frequency'] > 0]
+        
+        metrics.count(len(long))
+        # Row-major order, as if walking each row's columns left to right
+        return long.sort_values('row_order', kind='stable')
+    
+    @timed_step
+    def insert_context_frequencies(self, context_df: pd.DataFrame, context_type: str) -> int:
+        """Bulk insert melted context frequencies"""
+        context_data = list(zip(
+            context_df['lemma_id'].tolist(),
+            context_df['PoS'].tolist(),
+            [context_type] * len(context_df),
+            context_df['context_name'].tolist(),
+            context_df['frequency'].astype('int64').tolist(),
+            [None] * len(context_df)
+        ))
+        
+        cursor = self.conn.cursor()
+        for i in range(0, len(context_data), BATCH_SIZE):
+            batch = context_data[i:i + BATCH_SIZE]
+            cursor.executemany("""
+                INSERT INTO context_frequencies 
+                (lemma_id, pos, context_type, context_name, frequency, context_metadata)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+        
+        self.conn.commit()
+        metrics.count(len(context_data))
+        return len(context_data)
+    
+    @timed_step
     def process_lemmas_data(self, lemmas_df: pd.DataFrame, language_id: int):
         """Process and insert lemma data with dispersion scores"""
         logger.info("Processing lemmas data...")
+        metrics.count(len(lemmas_df))
         
         unique_lemmas = lemmas_df.groupby('lemma').agg({
             'disp': 'first',
         }).reset_index()
         
-        lemma_data = []
-        for _, row in unique_lemmas.iterrows():
-            lemma_data.append((
-                row['lemma'],
-                language_id,
-                0,
-                0,
-                float(row['disp']) if pd.notna(row['disp']) else 0.0
-            ))
+        dispersion = pd.to_numeric(unique_lemmas['disp'], errors='coerce').fillna(0.0)
+        lemma_data = list(zip(
+            unique_lemmas['lemma'].tolist(),
+            [language_id] * len(unique_lemmas),
+            [0] * len(unique_lemmas),
+            [0] * len(unique_lemmas),
+            dispersion.astype(float).tolist()
+        ))
         
         cursor = self.conn.cursor()
         cursor.executemany("""
@@ -205,45 +348,44 @@ class DictionaryDatabaseBuilder:
         """, lemma_data)
         
         self.conn.commit()
+        self.lemma_ids = None
         logger.info(f"Inserted {len(lemma_data)} unique lemmas")
     
+    @timed_step
     def process_wordforms_data(self, wordforms_df: pd.DataFrame):
         """Process and insert word forms data"""
         logger.info("Processing word forms data...")
+        metrics.count(len(wordforms_df))
         
         lemma_updates = wordforms_df.groupby('lemma').agg({
             'lemFreq': 'first',
             'lemRank': 'first'
         }).reset_index()
+        lemma_updates = lemma_updates[~lemma_updates['lemma'].isin(self.ranked_lemmas)]
+        self.ranked_lemmas.update(lemma_updates['lemma'])
+        lemma_updates = self.attach_lemma_ids(lemma_updates)
         
         cursor = self.conn.cursor()
-        
-        for _, row in lemma_updates.iterrows():
-            cursor.execute("""
-                UPDATE lemmas 
-                SET lemma_frequency = ?, lemma_rank = ?
-                WHERE lemma = ?
-            """, (
-                int(row['lemFreq']) if pd.notna(row['lemFreq']) else 0,
-                int(row['lemRank']) if pd.notna(row['lemRank']) else 0,
-                row['lemma']
-            ))
-        
-        inflected_forms_data = []
-        for _, row in wordforms_df.iterrows():
-            cursor.execute("SELECT id FROM lemmas WHERE lemma = ?", (row['lemma'],))
-            lemma_result = cursor.fetchone()
-            if lemma_result:
-                lemma_id = lemma_result[0]
-                inflected_forms_data.append((
-                    lemma_id,
-                    row['word'],
-                    row['PoS'],
-                    int(row['wordFreq']) if pd.notna(row['wordFreq']) else 0,
-                    0,
-                    None,
-                    None
-                ))
+        cursor.executemany("""
+            UPDATE lemmas 
+            SET lemma_frequency = ?, lemma_rank = ?
+            WHERE id = ?
+        """, zip(
+            lemma_updates['lemFreq'].fillna(0).astype('int64').tolist(),
+            lemma_updates['lemRank'].fillna(0).astype('int64').tolist(),
+            lemma_updates['lemma_id'].tolist()
+        ))
+        
+        forms = self.attach_lemma_ids(wordforms_df)
+        inflected_forms_data = list(zip(
+            forms['lemma_id'].tolist(),
+            forms['word'].tolist(),
+            forms['PoS'].tolist(),
+            forms['wordFreq'].fillna(0).astype('int64').tolist(),
+            [0] * len(forms),
+            [None] * len(forms),
+            [None] * len(forms)
+        ))
         
         # Batch insert
         for i in range(0, len(inflected_forms_data), BATCH_SIZE):
@@ -257,9 +399,11 @@ class DictionaryDatabaseBuilder:
         self.conn.commit()
         logger.info(f"Inserted {len(inflected_forms_data)} inflected forms")
     
+    @timed_step
     def process_broad_domains(self, lemmas_df: pd.DataFrame):
         """Process broad domain frequencies"""
         logger.info("Processing broad domain frequencies...")
+        metrics.count(len(lemmas_df))
         
         domain_columns = []
         for col in lemmas_df.columns:
@@ -273,43 +417,16 @@ class DictionaryDatabaseBuilder:
         
         logger.info(f"Found {len(domain_columns)} broad domain columns: {domain_columns}")
         
-        cursor = self.conn.cursor()
-        context_data = []
-        
-        for _, row in lemmas_df.iterrows():
-            cursor.execute("SELECT id FROM lemmas WHERE lemma = ?", (row['lemma'],))
-            lemma_result = cursor.fetchone()
-            if lemma_result:
-                lemma_id = lemma_result[0]
-                pos = row['PoS']
-                
-                for domain_col in domain_columns:
-                    frequency = row[domain_col]
-                    if pd.notna(frequency) and frequency > 0:
-                        context_data.append((
-                            lemma_id,
-                            pos,
-                            'broad_domain',
-                            domain_col,
-                            int(frequency),
-                            None
-                        ))
-        
-        if context_data:
-            for i in range(0, len(context_data), BATCH_SIZE):
-                batch = context_data[i:i + BATCH_SIZE]
-                cursor.executemany("""
-                    INSERT INTO context_frequencies 
-                    (lemma_id, pos, context_type, context_name, frequency, context_metadata)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, batch)
-            
-            self.conn.commit()
-            logger.info(f"Inserted {len(context_data)} broad domain frequency records")
+        context_df = self.melt_context_columns(lemmas_df, domain_columns)
+        if len(context_df):
+            inserted = self.insert_context_frequencies(context_df, 'broad_domain')
+            logger.info(f"Inserted {inserted} broad domain frequency records")
     
+    @timed_step
     def process_subgenres(self, subgenres_df: pd.DataFrame):
         """Process subgenre frequencies"""
         logger.info("Processing subgenre frequencies...")
+        metrics.count(len(subgenres_df))
         
         subgenre_columns = []
         for col in subgenres_df.columns:
@@ -324,64 +441,53 @@ class DictionaryDatabaseBuilder:
         
         logger.info(f"Found {len(subgenre_columns)} subgenre columns")
         
-        cursor = self.conn.cursor()
-        context_data = []
-        
-        for _, row in subgenres_df.iterrows():
-            cursor.execute("SELECT id FROM lemmas WHERE lemma = ?", (row['lemma'],))
-            lemma_result = cursor.fetchone()
-            if lemma_result:
-                lemma_id = lemma_result[0]
-                pos = row['PoS']
-                
-                for subgenre_col in subgenre_columns:
-                    frequency = row[subgenre_col]
-                    if pd.notna(frequency) and frequency > 0:
-                        context_data.append((
-                            lemma_id,
-                            pos,
-                            'subgenre',
-                            subgenre_col,
-                            int(frequency),
-                            None
-                        ))
-        
-        if context_data:
-            for i in range(0, len(context_data), BATCH_SIZE):
-                batch = context_data[i:i + BATCH_SIZE]
-                cursor.executemany("""
-                    INSERT INTO context_frequencies 
-                    (lemma_id, pos, context_type, context_name, frequency, context_metadata)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, batch)
-            
-            self.conn.commit()
-            logger.info(f"Inserted {len(context_data)} subgenre frequency records")
+        context_df = self.melt_context_columns(subgenres_df, subgenre_columns)
+        if len(context_df):
+            inserted = self.insert_context_frequencies(context_df, 'subgenre')
+            logger.info(f"Inserted {inserted} subgenre frequency records")
     
     def build_database(self):
         """Main method to build the complete database"""
         logger.info("Starting database build process...")
-        logger.info(f"Excel file: {self.excel_file_path}")
+        if self.source_format == 'tsv':
+            logger.info(f"TSV files: {list(self.tsv_files.values())}")
+        else:
+            logger.info(f"Excel file: {self.excel_file_path}")
         logger.info(f"Database output: {self.db_path}")
         
+        # Bulk mode builds a fresh file and creates the indexes after loading
+        bulk = BulkBuild(self.db_path) if self.bulk_build else None
+        succeeded = False
+        
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = bulk.connect() if bulk else sqlite3.connect(self.db_path)
             
             self.create_database_schema()
-            self.create_indexes()
+            if not bulk:
+                self.create_indexes()
             
             language_id = self.insert_default_language()
             
-            excel_data = self.load_excel_data()
+            with bulk.step("load") if bulk else nullcontext(), metrics.step("load"):
+                if self.source_format == 'tsv':
+                    self.process_tsv_sources(language_id)
+                else:
+                    excel_data = self.load_excel_data()
+                    
+                    self.process_lemmas_data(excel_data['lemmas'], language_id)
+                    self.process_wordforms_data(excel_data['wordforms'])
+                    self.process_broad_domains(excel_data['lemmas'])
+                    self.process_subgenres(excel_data['subgenres'])
             
-            self.process_lemmas_data(excel_data['lemmas'], language_id)
-            self.process_wordforms_data(excel_data['wordforms'])
-            self.process_broad_domains(excel_data['lemmas'])
-            self.process_subgenres(excel_data['subgenres'])
+            if bulk:
+                with bulk.step("indexes"):
+                    self.create_indexes()
+                bulk.finalize(self.conn)
             
             self.generate_statistics()
             
             logger.info("Database build completed successfully!")
+            succeeded = True
             
         except Exception as e:
             logger.error(f"Error building database: {e}")
@@ -389,7 +495,14 @@ class DictionaryDatabaseBuilder:
         finally:
             if self.conn:
                 self.conn.close()
+            if bulk:
+                if succeeded:
+                    bulk.commit_file()
+                    bulk.log_timings()
+                else:
+                    bulk.discard_file()
     
+    @timed_step
     def generate_statistics(self):
         """Generate and display database statistics"""
         cursor = self.conn.cursor()
@@ -418,9 +531,11 @@ class DictionaryDatabaseBuilder:
             logger.info(f"  {key}: {value:,}")
 
 def main():
-    if not Path(EXCEL_FILE).exists():
-        logger.error(f"Excel file not found: {EXCEL_FILE}")
-        return
+    source_files = TSV_FILES.values() if SOURCE_FORMAT == 'tsv' else [EXCEL_FILE]
+    for source_file in source_files:
+        if not Path(source_file).exists():
+            logger.error(f"Source file not found: {source_file}")
+            return
     
     builder = DictionaryDatabaseBuilder()
     builder.build_database()
@@ -6,142 +6,334 @@ import xml.etree.ElementTree as ET
 import json
 import sys
 import os
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 import logging
 
 # Add parent directory to path for config import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import *
+from hypernym_closure import HypernymClosure
+from build_metrics import metrics, timed_step
 
 # Set up logging
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
-def get_all_hypernyms(synset_id, synset_map, synset_to_lemmas, visited_synsets=None):
-    """Recursively collects all hypernyms for a given synset ID."""
-    if visited_synsets is None:
-        visited_synsets = set()
+def collect_synset_info(synset_element):
+    """Extracts the definition, examples and hypernym targets of a Synset element."""
+    definition = synset_element.find('Definition')
+    return {
+        "definition": definition.text if definition is not None else None,
+        "examples": [example.text for example in synset_element.findall('Example')],
+        "hypernyms": [relation.get('target')
+                      for relation in synset_element.findall("SynsetRelation[@relType='hypernym']")]
+    }
 
-    if synset_id in visited_synsets:
-        return []
+def add_lemma_senses(synset_to_lemmas, entry):
+    """Registers the lemma of a LexicalEntry under each synset it has a sense in."""
+    lemma_form = entry.find('Lemma').get('writtenForm')
+    for sense in entry.findall('Sense'):
+        synset_id = sense.get('synset')
+        if lemma_form not in synset_to_lemmas[synset_id]:
+            synset_to_lemmas[synset_id].append(lemma_form)
 
-    visited_synsets.add(synset_id)
+def iter_lexicon_elements(xml_file_path, tags):
+    """Streams the given element tags from the XML, discarding each one after use.
+
+    Elements are yielded on their end event; once the consumer is done with an
+    element, every completed element is detached from the tree so memory stays
+    bounded by a single entry rather than the whole document.
+    """
+    stack = []
+    for event, element in ET.iterparse(xml_file_path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            continue
+
+        stack.pop()
+        if element.tag in tags:
+            yield element
+        if stack and len(stack) <= 2:
+            # Direct children of LexicalResource/Lexicon are fully processed
+            stack[-1].clear()
+
+@timed_step
+def scan_synsets_streaming(xml_file_path):
+    """First streaming pass: collects synset metadata and synset-to-lemma membership."""
+    synset_info = {}
+    synset_to_lemmas = defaultdict(list)
+    entries_per_lemma = Counter()
+
+    for element in iter_lexicon_elements(xml_file_path, {'LexicalEntry', 'Synset'}):
+        if element.tag == 'Synset':
+            synset_info[element.get('id')] = collect_synset_info(element)
+        else:
+            add_lemma_senses(synset_to_lemmas, element)
+            entries_per_lemma[element.find('Lemma').get('writtenForm')] += 1
+
+    metrics.count(len(synset_info) + sum(entries_per_lemma.values()))
+    return synset_info, synset_to_lemmas, entries_per_lemma
+
+def entry_record(entry):
+    """Reduces a LexicalEntry element to a picklable (lemma, pos, senses) tuple.
+
+    senses is a list of (synset_id, sense example texts) pairs.
+    """
+    lemma_element = entry.find('Lemma')
+    senses = [(sense.get('synset'), [example.text for example in sense.findall('Example')])
+              for sense in entry.findall('Sense')]
+    return lemma_element.get('writtenForm'), lemma_element.get('partOfSpeech'), senses
+
+def process_lexical_entry(record, output_data, synset_info, synset_to_lemmas, closure):
+    """Adds definitions, examples, synonyms and hypernyms of one entry record to output_data.
+
+    Returns the lemma the entry belongs to.
+    """
+    lemma, pos, senses = record
+
+    if pos not in output_data[lemma]:
+        output_data[lemma][pos] = {
+            "definitions": [],
+            "hypernyms": [],
+            "synonyms": [],
+            "examples": []
+        }
     
-    hypernyms = []
-    synset_element = synset_map.get(synset_id)
-    if synset_element is None:
-        return []
-
-    for relation in synset_element.findall("SynsetRelation[@relType='hypernym']"):
-        target_id = relation.get('target')
-        target_lemmas = synset_to_lemmas.get(target_id, [])
-        hypernyms.extend(target_lemmas)
-        hypernyms.extend(get_all_hypernyms(target_id, synset_map, synset_to_lemmas, visited_synsets))
+    for synset_id, sense_examples in senses:
+        info = synset_info.get(synset_id)
+
+        for example_text in sense_examples:
+            if example_text:
+                output_data[lemma][pos]["examples"].append(example_text.strip())
+
+        if info is not None:
+            if info["definition"]:
+                output_data[lemma][pos]["definitions"].append(info["definition"].strip())
+
+            for example_text in info["examples"]:
+                if example_text:
+                    output_data[lemma][pos]["examples"].append(example_text.strip())
+
+            synonyms = synset_to_lemmas.get(synset_id, [])
+            output_data[lemma][pos]["synonyms"].extend(s for s in synonyms if s != lemma)
+            
+            hypernyms = closure.hypernym_lemmas(synset_id)
+            output_data[lemma][pos]["hypernyms"].extend(hypernyms)
+
+    return lemma
+
+def finalize_lemma(pos_data):
+    """Removes duplicates and sorts every list of one lemma's collected data."""
+    lemma_entries = []
+    for pos, data in pos_data.items():
+        unique_definitions = sorted(list(set(data["definitions"])))
+        unique_hypernyms = sorted(list(set(data["hypernyms"])))
+        unique_synonyms = sorted(list(set(data["synonyms"])))
+        unique_examples = sorted(list(set(data["examples"])))
         
-    return hypernyms
+        lemma_entries.append({
+            "pos": pos,
+            "definitions": unique_definitions,
+            "hypernyms": unique_hypernyms,
+            "synonyms": unique_synonyms,
+            "examples": unique_examples
+        })
+    return lemma_entries
+
+@timed_step
+def finalize_output(output_data):
+    """Finalizes the collected data of every lemma, keeping first-seen lemma order."""
+    metrics.count(len(output_data))
+    return {lemma: finalize_lemma(pos_data) for lemma, pos_data in output_data.items()}
+
+def write_ndjson_record(f, lemma, lemma_entries):
+    """Writes one lemma as a single line of line-delimited JSON."""
+    f.write(json.dumps({"lemma": lemma, "entries": lemma_entries}, ensure_ascii=False) + "\n")
+
+# Read-only maps shared by parallel extraction workers, set once per process
+_worker_maps = None
+
+def _init_worker(synset_info, synset_to_lemmas, closure):
+    global _worker_maps
+    _worker_maps = (synset_info, synset_to_lemmas, closure)
+
+def _extract_shard(records):
+    """Worker task: processes a shard of entry records into a partial output_data."""
+    synset_info, synset_to_lemmas, closure = _worker_maps
+    output_data = defaultdict(dict)
+    for record in records:
+        process_lexical_entry(record, output_data, synset_info, synset_to_lemmas, closure)
+    return dict(output_data)
+
+def merge_output(output_data, partial_output):
+    """Appends a shard's partial per-lemma data to output_data, keeping first-seen order."""
+    for lemma, pos_data in partial_output.items():
+        for pos, data in pos_data.items():
+            if pos not in output_data[lemma]:
+                output_data[lemma][pos] = data
+            else:
+                for key, values in data.items():
+                    output_data[lemma][pos][key].extend(values)
+
+def extract_shards_parallel(entries, synset_info, synset_to_lemmas, closure, workers,
+                            shard_size=PHASE2_SHARD_SIZE):
+    """Yields (shard lemmas, partial output_data) for contiguous entry shards, in order.
+
+    Shards are processed by a ProcessPoolExecutor whose workers receive the
+    synset maps once at start-up; at most two shards per worker are in flight
+    so streamed entries are not all buffered at once.
+    """
+    records = map(entry_record, entries)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(synset_info, synset_to_lemmas, closure)) as executor:
+        while True:
+            shard = list(islice(records, shard_size))
+            if shard:
+                pending.append(([lemma for lemma, _, _ in shard], executor.submit(_extract_shard, shard)))
+            if pending and (not shard or len(pending) >= workers * 2):
+                shard_lemmas, future = pending.popleft()
+                yield shard_lemmas, future.result()
+            elif not shard:
+                break
+
+@timed_step
+def extract_entries(entries, synset_info, synset_to_lemmas, closure, entries_per_lemma,
+                    on_lemma_complete=None, workers=1):
+    """Processes all LexicalEntries and returns the collected per-lemma data.
+
+    When on_lemma_complete is given, each lemma is finalized and handed to it as
+    soon as its last LexicalEntry has been processed, then dropped from memory.
+
+    With workers > 1 entries are extracted in parallel shards and merged back in
+    document order, so the result is identical to the serial path.
+    """
+    total_entries = sum(entries_per_lemma.values())
+    remaining_entries = Counter(entries_per_lemma)
+    output_data = defaultdict(dict)
+    processed = 0
+
+    def entry_done(lemma):
+        nonlocal processed
+        if on_lemma_complete is not None:
+            remaining_entries[lemma] -= 1
+            if remaining_entries[lemma] == 0:
+                on_lemma_complete(lemma, finalize_lemma(output_data.pop(lemma)))
+
+        processed += 1
+        if processed % 1000 == 0:
+            logger.info(f"Processed {processed}/{total_entries} entries")
+
+    if workers > 1:
+        logger.info(f"Extracting entries with {workers} worker processes...")
+        for shard_lemmas, partial_output in extract_shards_parallel(
+                entries, synset_info, synset_to_lemmas, closure, workers):
+            merge_output(output_data, partial_output)
+            for lemma in shard_lemmas:
+                entry_done(lemma)
+    else:
+        for entry in entries:
+            entry_done(process_lexical_entry(entry_record(entry), output_data,
+                                             synset_info, synset_to_lemmas, closure))
+
+    metrics.count(processed)
+    return output_data
+
+def create_json_from_xml(xml_file_path=XML_FILE, json_file_path=JSON_FILE, streaming=XML_STREAMING,
+                         output_format=JSON_FORMAT, workers=PHASE2_WORKERS):
+    """Parses a WordNet XML file and creates a structured JSON file.
 
-def create_json_from_xml(xml_file_path=XML_FILE, json_file_path=JSON_FILE):
-    """Parses a WordNet XML file and creates a structured JSON file."""
+    With streaming=True the XML is read twice with iterparse instead of being
+    loaded as a whole tree: a first pass keeps only compact synset metadata,
+    the second pass processes LexicalEntries one at a time.
+
+    With output_format="ndjson" one {"lemma", "entries"} record is written per
+    line as soon as a lemma is complete, instead of one indented JSON document.
+
+    workers > 1 shards entry extraction across that many processes; None uses
+    every CPU.
+    """
     logger.info(f"Starting XML to JSON conversion")
     logger.info(f"Input XML: {xml_file_path}")
     logger.info(f"Output JSON: {json_file_path}")
     
-    logger.info("Parsing XML file...")
     try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
+        if streaming:
+            logger.info("Scanning XML file for synsets and lemmas (streaming)...")
+            synset_info, synset_to_lemmas, entries_per_lemma = scan_synsets_streaming(xml_file_path)
+            entries = iter_lexicon_elements(xml_file_path, {'LexicalEntry'})
+        else:
+            logger.info("Parsing XML file...")
+            with metrics.step("parse_xml"):
+                root = ET.parse(xml_file_path).getroot()
+
+            logger.info("Building lookup maps for synsets and lemmas...")
+            with metrics.step("build_lookup_maps"):
+                synset_info = {s.get('id'): collect_synset_info(s) for s in root.findall(".//Synset")}
+                synset_to_lemmas = defaultdict(list)
+                entries = root.findall('.//LexicalEntry')
+                for entry in entries:
+                    add_lemma_senses(synset_to_lemmas, entry)
+                entries_per_lemma = Counter(entry.find('Lemma').get('writtenForm') for entry in entries)
+                metrics.count(len(synset_info) + len(entries))
     except ET.ParseError as e:
         logger.error(f"Error parsing XML file: {e}")
-        return
+        raise
     except FileNotFoundError:
         logger.error(f"Error: XML file not found at '{xml_file_path}'")
-        return
+        raise
 
-    logger.info("Building lookup maps for synsets and lemmas...")
-    synset_map = {s.get('id'): s for s in root.findall(".//Synset")}
-    synset_to_lemmas = defaultdict(list)
-    
-    for entry in root.findall('.//LexicalEntry'):
-        lemma_form = entry.find('Lemma').get('writtenForm')
-        for sense in entry.findall('Sense'):
-            synset_id = sense.get('synset')
-            if lemma_form not in synset_to_lemmas[synset_id]:
-                synset_to_lemmas[synset_id].append(lemma_form)
-
-    logger.info(f"Found {len(synset_map)} synsets")
+    logger.info(f"Found {len(synset_info)} synsets")
+
+    logger.info("Computing hypernym closure...")
+    with metrics.step("hypernym_closure"):
+        closure = HypernymClosure(
+            {synset_id: info["hypernyms"] for synset_id, info in synset_info.items()},
+            synset_to_lemmas,
+            max_depth=HYPERNYM_MAX_DEPTH
+        )
+        metrics.count(len(synset_info))
     
+    workers = workers or os.cpu_count() or 1
+
     logger.info("Extracting and structuring data...")
-    output_data = defaultdict(dict)
-    
-    total_entries = len(root.findall('.//LexicalEntry'))
-    processed = 0
+    try:
+        if output_format == "ndjson":
+            logger.info(f"Writing NDJSON records to {json_file_path} as lemmas complete...")
+            with open(json_file_path, 'w', encoding='utf-8') as f:
+                extract_entries(
+                    entries, synset_info, synset_to_lemmas, closure, entries_per_lemma,
+                    on_lemma_complete=lambda lemma, lemma_entries: write_ndjson_record(f, lemma, lemma_entries),
+                    workers=workers
+                )
+            logger.info(f"Successfully created NDJSON file with {len(entries_per_lemma)} lemmas")
+            return
 
-    for entry in root.findall('.//LexicalEntry'):
-        lemma_element = entry.find('Lemma')
-        lemma = lemma_element.get('writtenForm')
-        pos = lemma_element.get('partOfSpeech')
-
-        if pos not in output_data[lemma]:
-            output_data[lemma][pos] = {
-                "definitions": [],
-                "hypernyms": [],
-                "synonyms": [],
-                "examples": []
-            }
-        
-        for sense in entry.findall('Sense'):
-            synset_id = sense.get('synset')
-            synset_element = synset_map.get(synset_id)
-
-            for example in sense.findall('Example'):
-                if example.text:
-                    output_data[lemma][pos]["examples"].append(example.text.strip())
-
-            if synset_element is not None:
-                definition = synset_element.find('Definition')
-                if definition is not None and definition.text:
-                    output_data[lemma][pos]["definitions"].append(definition.text.strip())
-
-                for example in synset_element.findall('Example'):
-                    if example.text:
-                        output_data[lemma][pos]["examples"].append(example.text.strip())
-
-                synonyms = synset_to_lemmas.get(synset_id, [])
-                output_data[lemma][pos]["synonyms"].extend(s for s in synonyms if s != lemma)
-                
-                hypernyms = get_all_hypernyms(synset_id, synset_map, synset_to_lemmas)
-                output_data[lemma][pos]["hypernyms"].extend(hypernyms)
-        
-        processed += 1
-        if processed % 1000 == 0:
-            logger.info(f"Processed {processed}/{total_entries} entries")
+        output_data = extract_entries(entries, synset_info, synset_to_lemmas, closure, entries_per_lemma,
+                                      workers=workers)
+    except ET.ParseError as e:
+        logger.error(f"Error parsing XML file: {e}")
+        raise
+    except IOError as e:
+        logger.error(f"Error writing to file: {e}")
+        raise
 
     logger.info("Finalizing JSON structure and removing duplicates...")
-    final_json = {}
-    for lemma, pos_data in output_data.items():
-        final_json[lemma] = []
-        for pos, data in pos_data.items():
-            unique_definitions = sorted(list(set(data["definitions"])))
-            unique_hypernyms = sorted(list(set(data["hypernyms"])))
-            unique_synonyms = sorted(list(set(data["synonyms"])))
-            unique_examples = sorted(list(set(data["examples"])))
-            
-            final_json[lemma].append({
-                "pos": pos,
-                "definitions": unique_definitions,
-                "hypernyms": unique_hypernyms,
-                "synonyms": unique_synonyms,
-                "examples": unique_examples
-            })
+    final_json = finalize_output(output_data)
 
     logger.info(f"Writing output to {json_file_path}...")
     try:
-        with open(json_file_path, 'w', encoding='utf-8') as f:
+        with open(json_file_path, 'w', encoding='utf-8') as f, metrics.step("write_json"):
             json.dump(final_json, f, ensure_ascii=False, indent=4)
+            metrics.count(len(final_json))
         logger.info(f"Successfully created JSON file with {len(final_json)} lemmas")
     except IOError as e:
         logger.error(f"Error writing to file: {e}")
+        raise
 
 def main():
     if not Path(XML_FILE).exists():
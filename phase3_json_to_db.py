@@ -10,37 +10,101 @@ import sys
 import os
 from typing import Dict, List, Set, Tuple, Optional
 from pathlib import Path
+from contextlib import nullcontext
+from itertools import islice
 
 # Add parent directory to path for config import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import *
+from bulk_build import BulkBuild
+from build_metrics import metrics, row_step, timed_step
+from reference_matcher import ReferenceMatcher
+from text_compression import TextCodec, load_codec, store_dictionary, train_dictionary
 
 # Set up logging
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 class DefinitionsLoader:
-    def __init__(self, db_path: str = DATABASE_FILE):
+    def __init__(self, db_path: str = DATABASE_FILE, bulk_build: bool = BULK_BUILD,
+                 batched: bool = PHASE3_BATCHED_INSERTS, link_forms: bool = LINK_INFLECTED_FORMS,
+                 full_text: bool = PHASE3_FULL_TEXT, keep_entries: bool = MATERIALIZE_ENTRIES,
+                 compress_text: bool = PHASE3_COMPRESS_TEXT):
         self.db_path = db_path
+        self.full_text = full_text
+        self.keep_entries = keep_entries
+        
+        # The full-text index reads definitions through a view, so it needs plain text
+        if compress_text and full_text:
+            logger.warning("PHASE3_COMPRESS_TEXT is ignored while PHASE3_FULL_TEXT is on")
+            compress_text = False
+        self.compress_text = compress_text
+        self.codec = None
+        self.bulk_build = bulk_build
         self.conn = None
         self.lemma_id_cache = {}
-        
-    def connect_database(self):
-        """Connect to the existing database"""
+        self.form_id_cache = {}
+        self.link_forms = link_forms
+        self.reference_matcher = None
+        
+        # Batched load path: definition ids are assigned here and rows buffered
+        self.batched = batched
+        self.next_definition_id = None
+        self.definition_buffer = []
+        self.reference_buffer = []
+        self.synonym_buffer = []
+        
+    def connect_database(self, bulk: Optional[BulkBuild] = None):
+        """Connect to the existing database (or to a bulk-build copy of it)"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = bulk.connect() if bulk else sqlite3.connect(self.db_path)
             self.conn.row_factory = sqlite3.Row
             logger.info(f"Connected to database: {self.db_path}")
         except Exception as e:
             logger.error(f"Failed to connect to database: {e}")
             raise
     
+    @timed_step
     def load_lemma_cache(self):
         """Load all lemmas into memory for fast lookups"""
         cursor = self.conn.cursor()
         cursor.execute("SELECT id, lemma FROM lemmas")
         self.lemma_id_cache = {row['lemma'].lower(): row['id'] for row in cursor.fetchall()}
+        metrics.count(len(self.lemma_id_cache))
         logger.info(f"Loaded {len(self.lemma_id_cache)} lemmas into cache")
+        
+        if self.link_forms:
+            self.load_form_cache()
+        self.reference_matcher = ReferenceMatcher(self.lemma_id_cache, self.form_id_cache)
+    
+    @timed_step
+    def load_form_cache(self):
+        """Load inflected forms into memory, mapping each form to its most frequent lemma"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT form, lemma_id, SUM(form_frequency) AS frequency
+            FROM inflected_forms
+            GROUP BY form, lemma_id
+        """)
+        
+        best_frequency = {}
+        self.form_id_cache = {}
+        for row in cursor.fetchall():
+            form = str(row['form']).lower()
+            if form in self.lemma_id_cache:
+                continue
+            
+            # A form shared by several lemmas ("saw", "left") goes to the lemma it is
+            # most frequent for across all its POS, the lower id on a tie
+            frequency = row['frequency'] or 0
+            current = best_frequency.get(form)
+            if (current is None or frequency > current or
+                    (frequency == current and row['lemma_id'] < self.form_id_cache[form])):
+                best_frequency[form] = frequency
+                self.form_id_cache[form] = row['lemma_id']
+        
+        metrics.count(len(self.form_id_cache))
+        logger.info(f"Loaded {len(self.form_id_cache)} inflected forms into cache")
     
     def clean_text(self, text: str) -> str:
         """Clean text for processing"""
@@ -50,35 +114,126 @@ class DefinitionsLoader:
         return text
     
     def extract_words_from_text(self, text: str) -> List[Tuple[int, str]]:
-        """Extract words with their positions from text"""
+        """Extract words, inflected forms and multi-word lemmas with their positions from text"""
         if not text:
             return []
         
-        words = []
-        word_pattern = re.compile(r'\b[a-zA-Z]+\b')
-        for match in word_pattern.finditer(text):
-            word = match.group().lower()
-            position = match.start()
-            if len(word) > MIN_WORD_LENGTH and word in self.lemma_id_cache:
-                words.append((position, word))
+        if self.reference_matcher is None:
+            self.reference_matcher = ReferenceMatcher(self.lemma_id_cache, self.form_id_cache)
+        
+        return self.reference_matcher.find_references(text)
+    
+    def init_definition_ids(self):
+        """Continue definition ids where AUTOINCREMENT would, for the batched path"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM definitions")
+        max_id = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'definitions'")
+        sequence_row = cursor.fetchone()
+        last_used_id = max(max_id, sequence_row[0] if sequence_row else 0)
+        self.next_definition_id = last_used_id + 1
+    
+    def sample_texts(self, entries) -> List[str]:
+        """Definition, example and hypernym values of some lemmas, as they would be stored"""
+        texts = []
+        for _, lemma_data in entries:
+            for pos_data in lemma_data:
+                texts.extend(self.clean_text(text) for text in pos_data.get('definitions', []))
+                texts.extend(self.clean_text(text) for text in pos_data.get('examples', []) if text)
+                if pos_data.get('hypernyms'):
+                    texts.append(json.dumps(pos_data['hypernyms']))
+        return texts
+    
+    @timed_step
+    def prepare_text_codec(self, json_file_path: str, input_format: str, definitions_data: Optional[Dict]):
+        """Train the shared zlib dictionary on a sample of lemmas, or reuse the stored one
+        when adding to definitions that were compressed with it"""
+        self.codec = load_codec(self.conn)
+        if self.codec is not None:
+            logger.info("Reusing the stored text compression dictionary")
+            return
+        
+        if input_format == "ndjson":
+            entries = list(islice(self.iter_ndjson_definitions(json_file_path), ZDICT_SAMPLE_LEMMAS))
+        else:
+            items = list(definitions_data.items())
+            entries = items[::max(1, len(items) // ZDICT_SAMPLE_LEMMAS)]
         
-        return words
+        dictionary = train_dictionary(self.sample_texts(entries))
+        store_dictionary(self.conn, dictionary)
+        self.conn.commit()
+        self.codec = TextCodec(dictionary)
+        logger.info(f"Trained a {len(dictionary)} byte text compression dictionary on {len(entries)} lemmas")
     
+    def encode_text(self, text: Optional[str]):
+        return self.codec.encode(text) if self.codec else text
+    
+    @row_step
     def insert_definition(self, lemma_id: int, pos: str, definition_text: str, 
                          order: int, example: str = None, hypernyms: List[str] = None) -> int:
         """Insert a definition and return its ID"""
-        cursor = self.conn.cursor()
-        
         hypernyms_json = json.dumps(hypernyms) if hypernyms else None
+        values = (lemma_id, pos, self.encode_text(self.clean_text(definition_text)), order, 
+                  self.encode_text(self.clean_text(example)) if example else None,
+                  self.encode_text(hypernyms_json))
+        
+        if self.batched:
+            definition_id = self.next_definition_id
+            self.next_definition_id += 1
+            self.definition_buffer.append((definition_id,) + values)
+            return definition_id
         
+        cursor = self.conn.cursor()
         cursor.execute("""
             INSERT INTO definitions (lemma_id, pos, definition_text, definition_order, example_sentence, hypernyms)
             VALUES (?, ?, ?, ?, ?, ?)
-        """, (lemma_id, pos, self.clean_text(definition_text), order, 
-              self.clean_text(example) if example else None, hypernyms_json))
+        """, values)
         
         return cursor.lastrowid
     
+    @row_step
+    def write_word_references(self, reference_data: List[Tuple]):
+        """Write word reference rows"""
+        self.conn.cursor().executemany("""
+            INSERT INTO word_references 
+            (source_definition_id, referenced_lemma_id, word_position, word_text, reference_type)
+            VALUES (?, ?, ?, ?, ?)
+        """, reference_data)
+    
+    @row_step
+    def write_synonyms(self, synonym_data: List[Tuple]):
+        """Write synonym rows"""
+        self.conn.cursor().executemany("""
+            INSERT OR IGNORE INTO synonyms (lemma_id, synonym_lemma_id, pos_specific, similarity_score)
+            VALUES (?, ?, ?, ?)
+        """, synonym_data)
+    
+    @timed_step
+    def flush_buffers(self):
+        """Write all buffered definitions, word references and synonyms, timing each table"""
+        if self.definition_buffer:
+            with metrics.step("definitions"):
+                metrics.count(len(self.definition_buffer))
+                self.conn.cursor().executemany("""
+                    INSERT INTO definitions
+                    (id, lemma_id, pos, definition_text, definition_order, example_sentence, hypernyms)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, self.definition_buffer)
+            self.definition_buffer = []
+        
+        if self.reference_buffer:
+            with metrics.step("word_references"):
+                metrics.count(len(self.reference_buffer))
+                self.write_word_references(self.reference_buffer)
+            self.reference_buffer = []
+        
+        if self.synonym_buffer:
+            with metrics.step("synonyms"):
+                metrics.count(len(self.synonym_buffer))
+                self.write_synonyms(self.synonym_buffer)
+            self.synonym_buffer = []
+    
+    @row_step
     def insert_word_references(self, definition_id: int, text: str, reference_type: str = 'definition'):
         """Insert word references for clickable cross-references"""
         if not text:
@@ -89,11 +244,10 @@ class DefinitionsLoader:
         if not words_with_positions:
             return
         
-        cursor = self.conn.cursor()
         reference_data = []
         
         for position, word in words_with_positions:
-            lemma_id = self.lemma_id_cache.get(word.lower())
+            lemma_id = self.reference_matcher.lemma_id(word.lower())
             if lemma_id:
                 reference_data.append((
                     definition_id,
@@ -104,18 +258,17 @@ class DefinitionsLoader:
                 ))
         
         if reference_data:
-            cursor.executemany("""
-                INSERT INTO word_references 
-                (source_definition_id, referenced_lemma_id, word_position, word_text, reference_type)
-                VALUES (?, ?, ?, ?, ?)
-            """, reference_data)
+            if self.batched:
+                self.reference_buffer.extend(reference_data)
+            else:
+                self.write_word_references(reference_data)
     
+    @row_step
     def insert_synonyms(self, lemma_id: int, pos: str, synonyms: List[str]):
         """Insert synonyms for a lemma-POS combination"""
         if not synonyms:
             return
         
-        cursor = self.conn.cursor()
         synonym_data = []
         
         for synonym in synonyms:
@@ -130,10 +283,10 @@ class DefinitionsLoader:
                 ))
         
         if synonym_data:
-            cursor.executemany("""
-                INSERT OR IGNORE INTO synonyms (lemma_id, synonym_lemma_id, pos_specific, similarity_score)
-                VALUES (?, ?, ?, ?)
-            """, synonym_data)
+            if self.batched:
+                self.synonym_buffer.extend(synonym_data)
+            else:
+                self.write_synonyms(synonym_data)
     
     def process_lemma_entry(self, lemma: str, lemma_data: List[Dict]):
         """Process all POS entries for a single lemma"""
@@ -170,6 +323,7 @@ class DefinitionsLoader:
         
         return total_definitions
     
+    @timed_step
     def load_json_definitions(self, json_file_path: str):
         """Load definitions from JSON file"""
         logger.info(f"Loading definitions from: {json_file_path}")
@@ -178,6 +332,7 @@ class DefinitionsLoader:
             with open(json_file_path, 'r', encoding='utf-8') as f:
                 definitions_data = json.load(f)
             
+            metrics.count(len(definitions_data))
             logger.info(f"Loaded JSON data for {len(definitions_data)} lemmas")
             return definitions_data
             
@@ -185,10 +340,113 @@ class DefinitionsLoader:
             logger.error(f"Error loading JSON file: {e}")
             raise
     
+    def iter_ndjson_definitions(self, ndjson_file_path: str):
+        """Yield (lemma, lemma_data) pairs from a line-delimited JSON file"""
+        logger.info(f"Streaming definitions from: {ndjson_file_path}")
+        
+        with open(ndjson_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield record['lemma'], record['entries']
+    
+    def full_text_table_exists(self) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'definitions_fts'")
+        return cursor.fetchone() is not None
+    
+    def create_full_text_table(self) -> bool:
+        """Create the external-content FTS5 index over definitions and examples.
+        
+        The index stores only its inverted lists; column values are read back
+        from the definitions_search view, which adds the lemma. Returns True
+        when the table had to be created.
+        """
+        if self.full_text_table_exists():
+            return False
+        
+        self.conn.cursor().executescript("""
+        CREATE VIEW IF NOT EXISTS definitions_search AS
+            SELECT d.id, d.definition_text, d.example_sentence, l.lemma, d.pos
+            FROM definitions d JOIN lemmas l ON l.id = d.lemma_id;
+        
+        CREATE VIRTUAL TABLE definitions_fts USING fts5(
+            definition_text, example_sentence, lemma UNINDEXED, pos UNINDEXED,
+            content = 'definitions_search', content_rowid = 'id',
+            tokenize = 'porter unicode61'
+        );
+        """)
+        self.conn.commit()
+        logger.info("Created full-text index definitions_fts")
+        return True
+    
+    def create_full_text_triggers(self):
+        """Keep definitions_fts in sync with every insert, update and delete on definitions"""
+        self.conn.cursor().executescript("""
+        CREATE TRIGGER IF NOT EXISTS definitions_fts_insert AFTER INSERT ON definitions BEGIN
+            INSERT INTO definitions_fts (rowid, definition_text, example_sentence, lemma, pos)
+            VALUES (new.id, new.definition_text, new.example_sentence,
+                    (SELECT lemma FROM lemmas WHERE id = new.lemma_id), new.pos);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS definitions_fts_delete AFTER DELETE ON definitions BEGIN
+            INSERT INTO definitions_fts (definitions_fts, rowid, definition_text, example_sentence, lemma, pos)
+            VALUES ('delete', old.id, old.definition_text, old.example_sentence,
+                    (SELECT lemma FROM lemmas WHERE id = old.lemma_id), old.pos);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS definitions_fts_update AFTER UPDATE ON definitions BEGIN
+            INSERT INTO definitions_fts (definitions_fts, rowid, definition_text, example_sentence, lemma, pos)
+            VALUES ('delete', old.id, old.definition_text, old.example_sentence,
+                    (SELECT lemma FROM lemmas WHERE id = old.lemma_id), old.pos);
+            INSERT INTO definitions_fts (rowid, definition_text, example_sentence, lemma, pos)
+            VALUES (new.id, new.definition_text, new.example_sentence,
+                    (SELECT lemma FROM lemmas WHERE id = new.lemma_id), new.pos);
+        END;
+        """)
+        self.conn.commit()
+    
+    def drop_full_text_triggers(self):
+        """Stop syncing per row; the index is rebuilt in one pass after a bulk load"""
+        self.conn.cursor().executescript("""
+        DROP TRIGGER IF EXISTS definitions_fts_insert;
+        DROP TRIGGER IF EXISTS definitions_fts_delete;
+        DROP TRIGGER IF EXISTS definitions_fts_update;
+        """)
+        self.conn.commit()
+    
+    @timed_step
+    def rebuild_full_text_index(self):
+        """Re-index every definition from the content view"""
+        self.conn.execute("INSERT INTO definitions_fts (definitions_fts) VALUES ('rebuild')")
+        self.conn.commit()
+        logger.info("Rebuilt full-text index definitions_fts")
+    
+    @timed_step
     def clear_existing_definitions(self):
         """Clear existing definitions data"""
         cursor = self.conn.cursor()
         
+        if self.full_text_table_exists():
+            # Emptying the index at once is much cheaper than a delete trigger per row;
+            # with full-text search turned off the index is dropped instead of going stale
+            self.drop_full_text_triggers()
+            if self.full_text:
+                cursor.execute("INSERT INTO definitions_fts (definitions_fts) VALUES ('delete-all')")
+            else:
+                cursor.execute("DROP TABLE definitions_fts")
+                cursor.execute("DROP VIEW IF EXISTS definitions_search")
+        
+        # Materialized entries are rebuilt from these tables after phase 3; when
+        # that step is off they are dropped rather than left stale
+        if not self.keep_entries:
+            cursor.execute("DROP TABLE IF EXISTS entry_keys")
+            cursor.execute("DROP TABLE IF EXISTS entries")
+        
+        # A new dictionary is trained for the new rows when compression is on
+        cursor.execute("DROP TABLE IF EXISTS text_dictionaries")
+        
         cursor.execute("DELETE FROM word_references")
         cursor.execute("DELETE FROM synonyms") 
         cursor.execute("DELETE FROM definitions")
@@ -196,6 +454,7 @@ class DefinitionsLoader:
         self.conn.commit()
         logger.info("Cleared existing definitions data")
     
+    @timed_step
     def create_additional_indexes(self):
         """Create additional indexes for definition lookups"""
         indexes_sql = """
@@ -212,50 +471,114 @@ class DefinitionsLoader:
         self.conn.commit()
         logger.info("Created additional indexes for definitions")
     
-    def process_definitions_file(self, json_file_path: str = JSON_FILE, clear_existing: bool = False):
-        """Main method to process the definitions JSON file"""
+    def process_definitions_file(self, json_file_path: str = JSON_FILE, clear_existing: bool = False,
+                                 input_format: str = JSON_FORMAT):
+        """Main method to process the definitions JSON file
+        
+        input_format="ndjson" streams one lemma record per line instead of
+        loading the whole JSON document into memory.
+        """
         logger.info("Starting definitions loading process...")
         logger.info(f"JSON file: {json_file_path}")
         logger.info(f"Database: {self.db_path}")
         
+        # Bulk mode loads into a copy with the definition tables' indexes deferred
+        bulk = BulkBuild(self.db_path, copy_existing=True) if self.bulk_build else None
+        succeeded = False
+        
         try:
-            self.connect_database()
+            self.connect_database(bulk)
             self.load_lemma_cache()
             
+            if bulk:
+                deferred_indexes = bulk.drop_indexes(self.conn, ['definitions', 'word_references', 'synonyms'])
+            
+            if self.full_text and bulk:
+                self.drop_full_text_triggers()
+            
             if clear_existing:
                 self.clear_existing_definitions()
             
-            definitions_data = self.load_json_definitions(json_file_path)
+            # Outside bulk mode triggers index each definition as it is inserted
+            if self.full_text:
+                if self.create_full_text_table() and not bulk:
+                    self.rebuild_full_text_index()
+                if not bulk:
+                    self.create_full_text_triggers()
+            
+            if self.batched:
+                self.init_definition_ids()
+            
+            if input_format == "ndjson":
+                definitions_data = None
+                definitions_items = self.iter_ndjson_definitions(json_file_path)
+                progress_total = "?"
+            else:
+                definitions_data = self.load_json_definitions(json_file_path)
+                definitions_items = definitions_data.items()
+                progress_total = len(definitions_data)
+            
+            if self.compress_text:
+                self.prepare_text_codec(json_file_path, input_format, definitions_data)
             
             total_definitions = 0
-            total_lemmas = len(definitions_data)
+            total_lemmas = 0
             
-            for i, (lemma, lemma_data) in enumerate(definitions_data.items(), 1):
-                if i % 100 == 0:
-                    logger.info(f"Processing lemma {i}/{total_lemmas}: {lemma}")
-                
-                definitions_count = self.process_lemma_entry(lemma, lemma_data)
-                total_definitions += definitions_count
+            with bulk.step("load") if bulk else nullcontext(), metrics.step("load"):
+                for i, (lemma, lemma_data) in enumerate(definitions_items, 1):
+                    total_lemmas = i
+                    if i % 100 == 0:
+                        logger.info(f"Processing lemma {i}/{progress_total}: {lemma}")
+                    
+                    definitions_count = self.process_lemma_entry(lemma, lemma_data)
+                    total_definitions += definitions_count
+                    
+                    if self.batched and len(self.definition_buffer) >= PHASE3_BATCH_SIZE:
+                        self.flush_buffers()
+                    
+                    # A bulk build loads everything in a single transaction
+                    if not bulk and i % BATCH_SIZE == 0:
+                        self.conn.commit()
                 
-                if i % BATCH_SIZE == 0:
-                    self.conn.commit()
+                self.flush_buffers()
+                self.conn.commit()
+                metrics.count(total_definitions)
             
-            self.create_additional_indexes()
-            self.conn.commit()
+            with bulk.step("indexes") if bulk else nullcontext():
+                if bulk:
+                    bulk.restore_indexes(self.conn, deferred_indexes)
+                self.create_additional_indexes()
+                self.conn.commit()
+            
+            if self.full_text and bulk:
+                with bulk.step("full-text index"):
+                    self.rebuild_full_text_index()
+                    self.create_full_text_triggers()
+            
+            if bulk:
+                bulk.finalize(self.conn)
             
             self.generate_statistics()
             
             logger.info(f"Successfully loaded {total_definitions} definitions for {total_lemmas} lemmas")
+            succeeded = True
             
         except Exception as e:
             logger.error(f"Error processing definitions: {e}")
-            if self.conn:
+            if self.conn and not bulk:
                 self.conn.rollback()
             raise
         finally:
             if self.conn:
                 self.conn.close()
+            if bulk:
+                if succeeded:
+                    bulk.commit_file()
+                    bulk.log_timings()
+                else:
+                    bulk.discard_file()
     
+    @timed_step
     def generate_statistics(self):
         """Generate and display loading statistics"""
         cursor = self.conn.cursor()
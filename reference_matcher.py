@@ -0,0 +1,132 @@
+## reference_matcher.py
+
+import re
+import sys
+import os
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+TOKEN_PATTERN = re.compile(r'\b[a-zA-Z]+\b')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Trie key marking that a multi-word lemma ends at this node
+_LEMMA_END = None
+
+# Flags for a token: it is a lemma on its own / it starts a multi-word lemma
+_SINGLE_LEMMA = 1
+_PHRASE_START = 2
+
+class ReferenceMatcher:
+    """Finds lemma mentions in text for word references, in one pass over its tokens.
+
+    Single words are plain dictionary lookups. Lemmas made of several tokens
+    ("ice cream", "take off", "well-being") are stored in a token trie; at a
+    token that starts one, the longest multi-word lemma wins and the tokens it
+    covers are skipped. The exact text of a multi-word match (whitespace
+    collapsed) must itself be a lemma, so "well-being" does not match
+    "well being".
+
+    Inflected forms ("mice", "went") can be passed as a second form -> lemma id
+    map; they are matched like lemmas, but a lemma spelled the same way wins
+    when resolving the id.
+    """
+
+    def __init__(self, lemma_ids: Dict[str, int], form_ids: Optional[Dict[str, int]] = None,
+                 min_word_length: int = MIN_WORD_LENGTH):
+        self.lemma_ids = lemma_ids
+        self.form_ids = form_ids if form_ids is not None else {}
+        self.min_word_length = min_word_length
+        self.token_flags = {}
+        self.trie = {}
+
+        for lemma in chain(lemma_ids, self.form_ids):
+            tokens = TOKEN_PATTERN.findall(lemma)
+            if len(tokens) == 1 and tokens[0] == lemma:
+                if len(lemma) > min_word_length:
+                    self.token_flags[lemma] = self.token_flags.get(lemma, 0) | _SINGLE_LEMMA
+            elif len(tokens) > 1:
+                self.token_flags[tokens[0]] = self.token_flags.get(tokens[0], 0) | _PHRASE_START
+                node = self.trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node[_LEMMA_END] = True
+
+    def longest_phrase(self, text: str, first_token) -> Tuple[int, str]:
+        """Return (end position, lemma) of the longest multi-word lemma starting at a token"""
+        node = self.trie[first_token.group()]
+        start = first_token.start()
+        position = first_token.end()
+        longest = (None, None)
+
+        while True:
+            token = TOKEN_PATTERN.search(text, position)
+            if token is None:
+                break
+            node = node.get(token.group())
+            if node is None:
+                break
+            position = token.end()
+            if _LEMMA_END in node:
+                span = WHITESPACE_PATTERN.sub(' ', text[start:position])
+                if span in self.lemma_ids or span in self.form_ids:
+                    longest = (position, span)
+
+        return longest
+
+    def lemma_id(self, word: str) -> Optional[int]:
+        """Return the lemma id for a matched word, preferring lemmas over inflected forms"""
+        lemma_id = self.lemma_ids.get(word)
+        if lemma_id is None:
+            lemma_id = self.form_ids.get(word)
+        return lemma_id
+
+    def find_references(self, text: str) -> List[Tuple[int, str]]:
+        """Return (character position, lemma or form) for every lemma mentioned in text"""
+        if not text:
+            return []
+
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Lowercasing some non-ASCII characters changes the length, so positions
+            # would shift; scan the original text token by token instead
+            return self._find_single_words(text)
+
+        flags_for = self.token_flags.get
+        references = []
+        add_reference = references.append
+        covered_until = 0
+
+        for token in TOKEN_PATTERN.finditer(lowered):
+            word = token.group()
+            flags = flags_for(word)
+            if flags is None:
+                continue
+
+            start = token.start()
+            if flags == _SINGLE_LEMMA:
+                if start >= covered_until:
+                    add_reference((start, word))
+                continue
+            if start < covered_until:
+                continue
+
+            end, phrase = self.longest_phrase(lowered, token)
+            if phrase is not None:
+                references.append((start, phrase))
+                covered_until = end
+            elif flags & _SINGLE_LEMMA:
+                references.append((start, word))
+
+        return references
+
+    def _find_single_words(self, text: str) -> List[Tuple[int, str]]:
+        references = []
+        for token in TOKEN_PATTERN.finditer(text):
+            word = token.group().lower()
+            if self.token_flags.get(word, 0) & _SINGLE_LEMMA:
+                references.append((token.start(), word))
+        return references
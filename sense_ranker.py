@@ -0,0 +1,394 @@
+## sense_ranker.py
+
+import json
+import random
+import re
+import sqlite3
+import logging
+import time
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from text_compression import decode_text, load_codec
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+(?:['-]\w+)*")
+
+Context = Union[str, Sequence[str]]
+# (target, context) or (target, context, index of the target in the context tokens)
+Query = Union[Tuple[str, Context], Tuple[str, Context, Optional[int]]]
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens ("well-known" and "don't" stay whole)"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def context_window(tokens: Sequence[str], index: int, size: int = SENSE_CONTEXT_WINDOW,
+                   length: int = 1) -> List[str]:
+    """The size tokens around the length tokens of the target at tokens[index],
+    half on each side, without the target itself"""
+    half = size // 2
+    return list(tokens[max(0, index - half):index]) + list(tokens[index + length:index + length + half])
+
+def inverse_frequency_weights(frequencies: np.ndarray) -> np.ndarray:
+    """log(total / frequency) per lemma, so "the" is worth almost nothing and rare words a lot"""
+    frequencies = np.maximum(frequencies.astype(np.float64), 0)
+    return np.log((frequencies.sum() + 1) / (frequencies + 1)).astype(np.float32)
+
+class SenseRanker:
+    """Ranks the definitions of a word by how well they fit the surrounding text.
+
+    Each definition gets a sparse feature vector of lemmas: the words its
+    definition and example reference (word_references), the synonyms of its
+    lemma for that POS and its hypernyms, each weighted by inverse lemma
+    frequency. A query scores every candidate definition by the weight of the
+    features that occur in the context window, the context_size tokens around
+    the target, and a batch of queries is scored with a single set of NumPy
+    operations. Ties keep the dictionary's own sense order.
+    """
+
+    def __init__(self, db_path: str = DATABASE_FILE,
+                 reference_weight: float = SENSE_REFERENCE_WEIGHT,
+                 synonym_weight: float = SENSE_SYNONYM_WEIGHT,
+                 hypernym_weight: float = SENSE_HYPERNYM_WEIGHT,
+                 context_size: int = SENSE_CONTEXT_WINDOW):
+        start_time = time.time()
+        self.context_size = context_size
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"Database not found: {db_path}")
+
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            lemmas = pd.read_sql_query("SELECT id, lemma, lemma_frequency FROM lemmas ORDER BY id", conn)
+            forms = pd.read_sql_query("""
+                SELECT form, lemma_id, SUM(form_frequency) AS frequency
+                FROM inflected_forms
+                GROUP BY form, lemma_id
+                ORDER BY frequency DESC, lemma_id
+            """, conn)
+            definitions = pd.read_sql_query("""
+                SELECT id, lemma_id, pos, definition_text, example_sentence, hypernyms
+                FROM definitions
+                ORDER BY lemma_id, pos, definition_order, id
+            """, conn)
+            references = pd.read_sql_query("""
+                SELECT source_definition_id, referenced_lemma_id FROM word_references
+            """, conn)
+            synonyms = pd.read_sql_query("""
+                SELECT lemma_id, synonym_lemma_id, pos_specific FROM synonyms
+            """, conn)
+            codec = load_codec(conn)
+        finally:
+            conn.close()
+        
+        if codec is not None:
+            for column in ('definition_text', 'example_sentence', 'hypernyms'):
+                definitions[column] = [decode_text(value, codec) for value in definitions[column]]
+
+        # Lemmas are addressed by their position in id order from here on
+        self.lemma_ids = lemmas['id'].to_numpy(dtype=np.int64)
+        self.lemma_text = lemmas['lemma'].astype(str).tolist()
+        self.lemma_weights = inverse_frequency_weights(lemmas['lemma_frequency'].fillna(0).to_numpy())
+        self.word_lemmas = self.load_word_lemmas(forms)
+
+        self.definition_ids = definitions['id'].to_numpy(dtype=np.int64)
+        self.definition_lemmas = self.lemma_index(definitions['lemma_id'].to_numpy(dtype=np.int64))
+        self.definition_pos = definitions['pos'].astype(str).to_numpy()
+        self.definition_text = definitions['definition_text'].tolist()
+        self.lemma_starts = np.searchsorted(self.definition_lemmas, np.arange(len(self.lemma_ids) + 1))
+
+        features = pd.concat([
+            self.reference_features(references, reference_weight),
+            self.synonym_features(definitions, synonyms, synonym_weight),
+            self.hypernym_features(definitions, hypernym_weight),
+        ], ignore_index=True)
+        self.build_feature_matrix(features)
+
+        logger.info(f"Loaded sense ranker with {len(self.definition_ids)} definitions and "
+                    f"{len(self.feature_lemmas)} features in {time.time() - start_time:.2f}s")
+
+    def lemma_index(self, lemma_ids: np.ndarray) -> np.ndarray:
+        """Position of each lemma id, -1 for ids not in lemmas"""
+        positions = np.searchsorted(self.lemma_ids, lemma_ids)
+        positions = np.minimum(positions, max(len(self.lemma_ids) - 1, 0))
+        found = len(self.lemma_ids) > 0 and self.lemma_ids[positions] == lemma_ids
+        return np.where(found, positions, -1)
+
+    def load_word_lemmas(self, forms: pd.DataFrame) -> Dict[str, List[int]]:
+        """Every lemma and form with the lemmas it resolves to, the most likely first"""
+        word_lemmas: Dict[str, List[int]] = {}
+        for index, lemma in enumerate(self.lemma_text):
+            word_lemmas.setdefault(' '.join(lemma.lower().split()), []).append(index)
+
+        positions = self.lemma_index(forms['lemma_id'].to_numpy(dtype=np.int64))
+        for form, position in zip(forms['form'].astype(str), positions.tolist()):
+            if position < 0:
+                continue
+            lemma_list = word_lemmas.setdefault(' '.join(form.lower().split()), [])
+            if position not in lemma_list:
+                lemma_list.append(position)
+        return word_lemmas
+
+    def definition_rows(self, definition_ids: np.ndarray) -> np.ndarray:
+        """Row of each definition id, -1 for ids not loaded"""
+        order = np.argsort(self.definition_ids)
+        sorted_ids = self.definition_ids[order]
+        positions = np.minimum(np.searchsorted(sorted_ids, definition_ids), max(len(sorted_ids) - 1, 0))
+        found = len(sorted_ids) > 0 and sorted_ids[positions] == definition_ids
+        return np.where(found, order[positions] if len(order) else -1, -1)
+
+    def reference_features(self, references: pd.DataFrame, weight: float) -> pd.DataFrame:
+        return pd.DataFrame({
+            'row': self.definition_rows(references['source_definition_id'].to_numpy(dtype=np.int64)),
+            'lemma': self.lemma_index(references['referenced_lemma_id'].to_numpy(dtype=np.int64)),
+            'weight': weight,
+        })
+
+    def synonym_features(self, definitions: pd.DataFrame, synonyms: pd.DataFrame,
+                         weight: float) -> pd.DataFrame:
+        """Synonyms are stored per lemma and POS, so every definition of that POS gets them"""
+        rows = pd.DataFrame({'row': np.arange(len(definitions)),
+                             'lemma_id': definitions['lemma_id'], 'pos': definitions['pos']})
+        merged = rows.merge(synonyms, left_on=['lemma_id', 'pos'], right_on=['lemma_id', 'pos_specific'])
+        return pd.DataFrame({
+            'row': merged['row'].to_numpy(),
+            'lemma': self.lemma_index(merged['synonym_lemma_id'].to_numpy(dtype=np.int64)),
+            'weight': weight,
+        })
+
+    def hypernym_features(self, definitions: pd.DataFrame, weight: float) -> pd.DataFrame:
+        """Hypernyms are stored as words; each resolves as a whole or word by word"""
+        rows, lemma_positions = [], []
+        for row, hypernyms in enumerate(definitions['hypernyms'].tolist()):
+            if not isinstance(hypernyms, str) or not hypernyms:
+                continue
+            for hypernym in json.loads(hypernyms):
+                words = [' '.join(str(hypernym).lower().split())] + tokenize(str(hypernym))
+                for word in dict.fromkeys(words):
+                    if word in self.word_lemmas:
+                        rows.append(row)
+                        lemma_positions.append(self.word_lemmas[word][0])
+        return pd.DataFrame({'row': np.array(rows, dtype=np.int64),
+                             'lemma': np.array(lemma_positions, dtype=np.int64),
+                             'weight': weight})
+
+    def build_feature_matrix(self, features: pd.DataFrame):
+        """Pack the features into CSR arrays: definition row r owns feature_starts[r]:feature_starts[r + 1]"""
+        features = features[(features['row'] >= 0) & (features['lemma'] >= 0)]
+        features = features[features['lemma'].to_numpy() != self.definition_lemmas[features['row'].to_numpy()]]
+
+        # A lemma reached through several sources counts once, with its best source weight
+        features = features.groupby(['row', 'lemma'], sort=True, as_index=False)['weight'].max()
+        rows = features['row'].to_numpy(dtype=np.int64)
+        lemmas = features['lemma'].to_numpy(dtype=np.int64)
+
+        self.feature_lemmas = lemmas.astype(np.int32)
+        self.feature_weights = (features['weight'].to_numpy(dtype=np.float32) *
+                                self.lemma_weights[lemmas] if len(lemmas) else np.zeros(0, dtype=np.float32))
+        self.feature_starts = np.searchsorted(rows, np.arange(len(self.definition_ids) + 1))
+
+    def resolve(self, word: str) -> List[int]:
+        """Lemma positions a word belongs to, the most likely first"""
+        return self.word_lemmas.get(' '.join(word.lower().split()), [])
+
+    def target_length(self, tokens: Sequence[str], index: int, target_tokens: List[str],
+                      target_lemmas: List[int]) -> int:
+        """Tokens the target spans at tokens[index]: all of its own tokens, or one
+        token for a form of one of its lemmas ("mice" for "mouse"); 0 if the
+        target is not there"""
+        if target_tokens and list(tokens[index:index + len(target_tokens)]) == target_tokens:
+            return len(target_tokens)
+        if set(target_lemmas).intersection(self.word_lemmas.get(tokens[index], ())):
+            return 1
+        return 0
+
+    def find_target(self, tokens: Sequence[str], target: str,
+                    target_lemmas: List[int]) -> Optional[Tuple[int, int]]:
+        """Position and token length of the target in the context tokens: its
+        first occurrence as written or, failing that, the first form of one of
+        its lemmas"""
+        target_tokens = tokenize(target)
+        if target_tokens:
+            for index in range(len(tokens) - len(target_tokens) + 1):
+                if list(tokens[index:index + len(target_tokens)]) == target_tokens:
+                    return index, len(target_tokens)
+        lemmas = set(target_lemmas)
+        for index, token in enumerate(tokens):
+            if lemmas.intersection(self.word_lemmas.get(token, ())):
+                return index, 1
+        return None
+
+    def locate_target(self, tokens: Sequence[str], target: str, target_lemmas: List[int],
+                      index: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """Position and token length of the target, checking a caller's index"""
+        if index is None:
+            return self.find_target(tokens, target, target_lemmas)
+        if not 0 <= index < len(tokens):
+            raise IndexError(f"Target index {index} is outside the {len(tokens)} context tokens")
+        length = self.target_length(tokens, index, tokenize(target), target_lemmas)
+        if not length:
+            raise ValueError(f"Context token {index} is {tokens[index]!r}, not the target {target!r}")
+        return index, length
+
+    def rank(self, target: str, context: Context, pos: Optional[str] = None,
+             limit: Optional[int] = None, index: Optional[int] = None) -> List[Dict]:
+        """Return the definitions of target ranked by fit to the context words
+        around it; index is the position of the target's first token in the
+        context tokens"""
+        return self.rank_batch([(target, context, index)], pos, limit)[0]
+
+    def rank_batch(self, queries: Sequence[Query], pos: Optional[str] = None,
+                   limit: Optional[int] = None) -> List[List[Dict]]:
+        """Rank many (target, context) or (target, context, index) queries at once.
+
+        Context may be text or a list of tokens. Only the context_size tokens
+        around the target count: at index when it is given, otherwise where
+        find_target locates it. A target that is not in the context leaves the
+        whole context; an index outside the tokens raises IndexError and one
+        that does not point at the target ValueError. Every candidate definition of every query is scored in
+        one pass: the features of all candidates are gathered into one array,
+        keyed by (query, lemma), and looked up in the sorted (query, lemma)
+        keys of all context windows.
+        """
+        lemma_count = max(len(self.lemma_ids), 1)
+        candidate_rows, candidate_queries, context_keys = [], [], []
+        for query_index, query in enumerate(queries):
+            target, context = query[0], query[1]
+            target_index = query[2] if len(query) > 2 else None
+            target_lemmas = self.resolve(target)
+            for lemma in target_lemmas:
+                rows = np.arange(self.lemma_starts[lemma], self.lemma_starts[lemma + 1])
+                if pos is not None:
+                    rows = rows[self.definition_pos[rows] == pos]
+                candidate_rows.append(rows)
+                candidate_queries.append(np.full(len(rows), query_index, dtype=np.int64))
+
+            tokens = tokenize(context) if isinstance(context, str) else [token.lower() for token in context]
+            position = self.locate_target(tokens, target, target_lemmas, target_index)
+            if position is not None:
+                index, length = position
+                tokens = context_window(tokens, index, self.context_size, length)
+            context_lemmas = {self.word_lemmas[token][0] for token in tokens if token in self.word_lemmas}
+            context_lemmas.difference_update(target_lemmas)
+            context_keys.extend(query_index * lemma_count + lemma for lemma in context_lemmas)
+
+        results: List[List[Dict]] = [[] for _ in queries]
+        if not candidate_rows:
+            return results
+        rows = np.concatenate(candidate_rows)
+        row_queries = np.concatenate(candidate_queries)
+        if not len(rows):
+            return results
+
+        # Positions of every candidate's features, laid out candidate after candidate
+        starts = self.feature_starts[rows]
+        lengths = self.feature_starts[rows + 1] - starts
+        feature_candidates = np.repeat(np.arange(len(rows)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+
+        keys = row_queries[feature_candidates] * lemma_count + self.feature_lemmas[positions]
+        context_keys = np.unique(np.array(context_keys, dtype=np.int64))
+        if len(context_keys):
+            found = np.minimum(np.searchsorted(context_keys, keys), len(context_keys) - 1)
+            hits = context_keys[found] == keys
+        else:
+            hits = np.zeros(len(keys), dtype=bool)
+        scores = np.bincount(feature_candidates, weights=self.feature_weights[positions] * hits,
+                             minlength=len(rows))
+
+        hit_positions = positions[hits]
+        hit_bounds = np.searchsorted(feature_candidates[hits], np.arange(len(rows) + 1))
+
+        # Candidates are grouped by query in definition order, so a stable sort keeps sense order on ties
+        query_bounds = np.searchsorted(row_queries, np.arange(len(queries) + 1))
+        for query_index in range(len(queries)):
+            first, last = query_bounds[query_index], query_bounds[query_index + 1]
+            if first == last:
+                continue
+            ranked = first + np.argsort(-scores[first:last], kind='stable')
+            if limit is not None:
+                ranked = ranked[:limit]
+            results[query_index] = [{
+                'definition_id': int(self.definition_ids[rows[candidate]]),
+                'lemma': self.lemma_text[self.definition_lemmas[rows[candidate]]],
+                'pos': str(self.definition_pos[rows[candidate]]),
+                'definition': self.definition_text[rows[candidate]],
+                'score': float(scores[candidate]),
+                'matches': [self.lemma_text[lemma] for lemma in
+                            self.feature_lemmas[hit_positions[hit_bounds[candidate]:hit_bounds[candidate + 1]]]],
+            } for candidate in ranked.tolist()]
+        return results
+
+def benchmark_queries(db_path: str = DATABASE_FILE, count: int = SENSE_BENCHMARK_QUERIES,
+                      seed: int = 0) -> List[Tuple[str, str, int]]:
+    """(lemma, example sentence, definition id) for lemmas with several senses"""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT l.lemma, d.example_sentence, d.id
+            FROM definitions d JOIN lemmas l ON l.id = d.lemma_id
+            WHERE d.example_sentence IS NOT NULL
+              AND (SELECT COUNT(*) FROM definitions other WHERE other.lemma_id = d.lemma_id) > 1
+        """).fetchall()
+        codec = load_codec(conn)
+    finally:
+        conn.close()
+    # Compressed examples are BLOBs, so empty ones can only be told apart once decoded
+    rows = [(lemma, decode_text(example, codec), definition_id) for lemma, example, definition_id in rows]
+    rows = [row for row in rows if row[1]]
+    rng = random.Random(seed)
+    return rng.choices(rows, k=count) if rows else []
+
+def run_benchmark(ranker: SenseRanker, db_path: str = DATABASE_FILE):
+    """Time single and batched ranking with example sentences as the context"""
+    queries = benchmark_queries(db_path)
+    if not queries:
+        logger.error("No lemmas with several definitions and an example sentence")
+        return
+
+    timings = []
+    correct = 0
+    for lemma, example, definition_id in queries:
+        query_start = time.perf_counter()
+        ranked = ranker.rank(lemma, example, limit=1)
+        timings.append((time.perf_counter() - query_start) * 1000)
+        correct += bool(ranked) and ranked[0]['definition_id'] == definition_id
+    timings.sort()
+    logger.info(f"Single: {len(queries)} queries, mean {sum(timings) / len(timings):.3f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms, "
+                f"example's own sense ranked first for {correct / len(queries):.1%}")
+
+    batch_start = time.perf_counter()
+    ranker.rank_batch([(lemma, example) for lemma, example, _ in queries], limit=1)
+    batch_ms = (time.perf_counter() - batch_start) * 1000
+    logger.info(f"Batched: {len(queries)} queries in {batch_ms:.1f} ms "
+                f"({batch_ms / len(queries):.3f} ms per query)")
+
+def main():
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    ranker = SenseRanker()
+    if len(sys.argv) > 2:
+        for result in ranker.rank(sys.argv[1], ' '.join(sys.argv[2:])):
+            print(f"{result['score']:.3f}\t{result['pos']}\t{result['definition']}\t"
+                  f"{', '.join(result['matches'])}")
+        return
+
+    run_benchmark(ranker)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+## subset_export.py
+
+import sqlite3
+import logging
+import time
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+from dictionary_reader import DictionaryReader, measure_lookups
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Tables a subset carries, created from the source database's own DDL
+SUBSET_TABLES = ['languages', 'lemmas', 'inflected_forms', 'definitions', 'synonyms', 'word_references']
+# Copied whole when present: the dictionary of PHASE3_COMPRESS_TEXT definitions
+OPTIONAL_SUBSET_TABLES = ['text_dictionaries']
+
+# Lemmas and forms are found through their UNIQUE constraints' indexes; these
+# are the only other indexes DictionaryReader needs
+SUBSET_INDEXES_SQL = """
+    CREATE INDEX idx_inflected_forms_lemma_id ON inflected_forms(lemma_id);
+    CREATE INDEX idx_definitions_lemma_pos ON definitions(lemma_id, pos);
+    CREATE INDEX idx_synonyms_lemma_pos ON synonyms(lemma_id, pos_specific);
+    CREATE INDEX idx_word_references_source ON word_references(source_definition_id);
+"""
+
+def tier_file(top_n: int, output_dir: str = SUBSET_PATH) -> str:
+    return os.path.join(output_dir, f"dictionary_top{top_n}.db")
+
+def export_subset(top_n: int, db_path: str = DATABASE_FILE, output_path: Optional[str] = None) -> str:
+    """Write the top_n lemmas by lemma_rank, with their forms, definitions and the
+    synonyms and references that stay inside the tier, to a standalone database"""
+    start_time = time.time()
+    output_path = output_path or tier_file(top_n)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path + '.tmp'
+    if Path(temp_path).exists():
+        os.remove(temp_path)
+
+    conn = sqlite3.connect(Path(temp_path).resolve().as_uri(), uri=True)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("ATTACH DATABASE ? AS src", (f"{Path(db_path).resolve().as_uri()}?mode=ro",))
+
+        for table in SUBSET_TABLES + OPTIONAL_SUBSET_TABLES:
+            row = conn.execute("SELECT sql FROM src.sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()
+            if row is None:
+                if table in SUBSET_TABLES:
+                    raise ValueError(f"Source database has no {table} table: {db_path}")
+                continue
+            conn.execute(row[0])
+            if table in OPTIONAL_SUBSET_TABLES:
+                conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+
+        # Unranked lemmas (NULL or 0) come after every ranked one
+        conn.execute("""
+            CREATE TEMP TABLE tier AS
+            SELECT id FROM src.lemmas
+            ORDER BY lemma_rank IS NULL OR lemma_rank <= 0, lemma_rank, id
+            LIMIT ?
+        """, (top_n,))
+        conn.execute("CREATE UNIQUE INDEX temp.idx_tier ON tier(id)")
+
+        conn.executescript("""
+            INSERT INTO main.languages SELECT * FROM src.languages;
+            INSERT INTO main.lemmas SELECT * FROM src.lemmas WHERE id IN (SELECT id FROM temp.tier);
+            INSERT INTO main.inflected_forms
+                SELECT * FROM src.inflected_forms WHERE lemma_id IN (SELECT id FROM temp.tier);
+            INSERT INTO main.definitions
+                SELECT * FROM src.definitions WHERE lemma_id IN (SELECT id FROM temp.tier);
+            INSERT INTO main.synonyms
+                SELECT * FROM src.synonyms
+                WHERE lemma_id IN (SELECT id FROM temp.tier)
+                  AND synonym_lemma_id IN (SELECT id FROM temp.tier);
+            INSERT INTO main.word_references
+                SELECT * FROM src.word_references
+                WHERE source_definition_id IN (SELECT id FROM main.definitions)
+                  AND referenced_lemma_id IN (SELECT id FROM temp.tier);
+        """)
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+
+        conn.executescript(SUBSET_INDEXES_SQL)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(temp_path, output_path)
+    logger.info(f"Exported top {top_n} lemmas to {output_path} "
+                f"({Path(output_path).stat().st_size / 1024 / 1024:.1f} MB) in {time.time() - start_time:.2f}s")
+    return output_path
+
+def export_tiers(tiers: List[int] = SUBSET_TIERS, db_path: str = DATABASE_FILE) -> List[str]:
+    """Export every tier, smallest first"""
+    return [export_subset(top_n, db_path) for top_n in sorted(set(tiers))]
+
+def measure_tier(path: str) -> Dict[str, float]:
+    """Size of a tier file and uncached lookup latency of its lemmas and forms"""
+    with DictionaryReader(path, cache_size=0) as reader:
+        words = [row[0] for row in reader.conn.execute("""
+            SELECT lemma FROM lemmas ORDER BY lemma_frequency DESC LIMIT ?
+        """, (READER_BENCHMARK_WORDS,))]
+        words += [row[0] for row in reader.conn.execute("""
+            SELECT form FROM inflected_forms ORDER BY form_frequency DESC LIMIT ?
+        """, (READER_BENCHMARK_WORDS,))]
+        lemma_count = reader.conn.execute("SELECT COUNT(*) FROM lemmas").fetchone()[0]
+        stats = measure_lookups(reader, words) if words else {'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+
+    stats['lemmas'] = lemma_count
+    stats['size_mb'] = Path(path).stat().st_size / 1024 / 1024
+    return stats
+
+def main():
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    tiers = [int(argument) for argument in sys.argv[1:]] or SUBSET_TIERS
+    paths = export_tiers(tiers)
+
+    logger.info("Tier report:")
+    for path in [DATABASE_FILE] + paths:
+        stats = measure_tier(path)
+        logger.info(f"  {Path(path).name}: {stats['lemmas']} lemmas, {stats['size_mb']:.1f} MB, "
+                    f"lookup mean {stats['mean_ms']:.3f} ms, p95 {stats['p95_ms']:.3f} ms")
+
+if __name__ == "__main__":
+    main()
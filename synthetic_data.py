@@ -0,0 +1,309 @@
+## synthetic_data.py
+
+import random
+import logging
+import time
+import sys
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# The wordfrequency.info samples whose preambles and headers synthetic sources copy
+DATA_STRUCTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_structure')
+
+SYLLABLES = ['ba', 'be', 'ca', 'co', 'da', 'de', 'di', 'fa', 'fo', 'ga', 'gle', 'ha', 'ki', 'ko', 'la', 'li',
+             'lu', 'ma', 'man', 'mo', 'na', 'pe', 'pen', 'ra', 'ri', 'ro', 'sa', 'si', 'ta', 'tel', 'ti', 'tis',
+             'to', 'va', 'ver', 'vi', 'wa', 'dor', 'run', 'bel', 'sto', 'tra', 'pli', 'cor', 'mun', 'gar']
+# Words pandas or Excel would read as NaN or booleans
+RESERVED_WORDS = {'nan', 'null', 'none', 'na', 'true', 'false'}
+
+# Share of frequency list rows per COCA PoS
+FREQUENCY_POS = {'n': 0.48, 'j': 0.2, 'v': 0.15, 'r': 0.06, 'm': 0.03, 'i': 0.02, 'c': 0.01,
+                 'p': 0.01, 'd': 0.01, 'u': 0.01, 'x': 0.01, 'e': 0.01}
+# WordNet part of speech of the frequency list PoS that WordNet covers
+WORDNET_POS = {'n': 'n', 'v': 'v', 'j': 'a', 'r': 'r'}
+# Share of WordNet-only entries per part of speech
+EXTRA_WORDNET_POS = {'n': 0.7, 'v': 0.08, 'a': 0.1, 's': 0.07, 'r': 0.05}
+# Inflected forms per PoS as (suffix, share of the lemma frequency)
+FORM_SUFFIXES = {
+    'n': [('', 0.7), ('s', 0.3)],
+    'v': [('', 0.4), ('s', 0.15), ('ed', 0.25), ('ing', 0.2)],
+    'j': [('', 0.9), ('er', 0.06), ('est', 0.04)]
+}
+DOMAIN_COLUMNS = ['blog', 'web', 'TVM', 'spok', 'fic', 'mag', 'news', 'acad']
+
+def source_template(source: str) -> Tuple[List[str], List[str]]:
+    """Preamble lines and header columns of the wordfrequency.info file of a source"""
+    path = os.path.join(DATA_STRUCTURE_PATH, os.path.basename(TSV_FILES[source]))
+    with open(path, 'r', encoding=TSV_ENCODING) as f:
+        lines = f.read().splitlines()
+    header_line = next(number for number, line in enumerate(lines) if '\t' in line)
+    return lines[:header_line], [column for column in lines[header_line].split('\t') if column]
+
+def make_words(count: int, rng: random.Random, taken: set) -> List[str]:
+    """count new words of one to four syllables"""
+    words = []
+    while len(words) < count:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.choice((1, 2, 2, 3, 3, 4))))
+        if word not in taken and word not in RESERVED_WORDS:
+            taken.add(word)
+            words.append(word)
+    return words
+
+def choose(rng: np.random.Generator, shares: Dict[str, float], size: int) -> np.ndarray:
+    keys = list(shares)
+    weights = np.array([shares[key] for key in keys])
+    return np.array(keys)[rng.choice(len(keys), size=size, p=weights / weights.sum())]
+
+def frequency_rows(row_count: int, rng: np.random.Generator, word_rng: random.Random) -> pd.DataFrame:
+    """(rank, lemma, PoS, freq) rows of a Zipf-distributed frequency list; about
+    one lemma in ten appears a second time under another PoS"""
+    pos = choose(rng, FREQUENCY_POS, row_count)
+    words = make_words(row_count, word_rng, set())
+    lemmas = []
+    for index in range(row_count):
+        if index > 10 and rng.random() < 0.1:
+            earlier = int(rng.integers(index))
+            if pos[earlier] != pos[index]:
+                lemmas.append(lemmas[earlier])
+                continue
+        lemmas.append(words[index])
+    rank = np.arange(1, row_count + 1)
+    freq = (2.3e7 / rank ** 0.95 * rng.uniform(0.9, 1.1, row_count)).astype(np.int64)
+    freq = -np.sort(-freq)
+    return pd.DataFrame({'rank': rank, 'lemma': lemmas, 'PoS': pos, 'freq': freq})
+
+def lemmas_sheet(rows: pd.DataFrame, columns: List[str], rng: np.random.Generator) -> pd.DataFrame:
+    freq = rows['freq'].to_numpy()
+    domains = np.floor(freq[:, None] * rng.dirichlet(np.full(len(DOMAIN_COLUMNS), 2.0), len(rows))).astype(np.int64)
+    values = {
+        'rank': rows['rank'], 'lemma': rows['lemma'], 'PoS': rows['PoS'], 'freq': freq,
+        'perMil': np.round(freq / 1000, 2),
+        '%caps': np.round(rng.beta(1, 8, len(rows)), 2),
+        '%allC': np.round(rng.beta(1, 60, len(rows)), 2),
+        'range': np.minimum(freq, (485000 * (1 - np.exp(-freq / 20000))).astype(np.int64) + 1),
+        'disp': np.round(np.clip(0.55 + 0.08 * np.log10(freq) + rng.normal(0, 0.05, len(rows)), 0, 0.99), 2)
+    }
+    for index, column in enumerate(DOMAIN_COLUMNS):
+        values[column] = domains[:, index]
+        values[column + 'PM'] = np.round(domains[:, index] / 125.0, 2)
+    return pd.DataFrame({column: values[column] for column in columns})
+
+def subgenres_sheet(rows: pd.DataFrame, columns: List[str], rng: np.random.Generator) -> pd.DataFrame:
+    """Poisson counts per subgenre, so rare lemmas get mostly zeros like the real file"""
+    counts_columns = [column for column in columns if column.startswith('x')]
+    weights = rng.dirichlet(np.full(len(counts_columns), 0.5), len(rows))
+    counts = rng.poisson(rows['freq'].to_numpy()[:, None] * weights)
+    values = {'rank': rows['rank'], 'lemma': rows['lemma'], 'PoS': rows['PoS']}
+    for index, column in enumerate(counts_columns):
+        values[column] = counts[:, index]
+        values['p' + column[1:]] = np.round(counts[:, index] / 10.4, 2)
+    return pd.DataFrame({column: values[column] for column in columns})
+
+def wordforms_sheet(rows: pd.DataFrame, columns: List[str], rng: np.random.Generator) -> pd.DataFrame:
+    records = []
+    for rank, lemma, pos, freq in rows[['rank', 'lemma', 'PoS', 'freq']].itertuples(index=False):
+        suffixes = FORM_SUFFIXES.get(pos, [('', 1.0)])
+        if pos == 'j' and rng.random() < 0.7:
+            suffixes = suffixes[:1]
+        for suffix, share in suffixes:
+            records.append((rank, lemma, pos, freq, int(freq * share * rng.uniform(0.8, 1.0)), lemma + suffix))
+    return pd.DataFrame(records, columns=['lemRank', 'lemma', 'PoS', 'lemFreq', 'wordFreq', 'word'])[columns]
+
+def write_frequency_sources(rows: pd.DataFrame, output_dir: str, source_format: str,
+                            rng: np.random.Generator) -> Dict[str, int]:
+    """Write the three sheets as EXCEL_FILE's workbook or TSV_FILES' text files"""
+    sheets = {}
+    preambles = {}
+    for source, builder in (('lemmas', lemmas_sheet), ('subgenres', subgenres_sheet),
+                            ('wordforms', wordforms_sheet)):
+        preambles[source], columns = source_template(source)
+        sheets[source] = builder(rows, columns, rng)
+
+    if source_format == 'tsv':
+        for source, sheet in sheets.items():
+            with open(os.path.join(output_dir, os.path.basename(TSV_FILES[source])), 'w',
+                      encoding=TSV_ENCODING, newline='') as f:
+                f.write('\n'.join(preambles[source]) + '\n')
+                sheet.to_csv(f, sep='\t', index=False, lineterminator='\n')
+    else:
+        with pd.ExcelWriter(os.path.join(output_dir, os.path.basename(EXCEL_FILE))) as writer:
+            for source, sheet in sheets.items():
+                sheet.to_excel(writer, sheet_name=SHEETS[source], index=False)
+    return {f"{source}_rows": len(sheet) for source, sheet in sheets.items()}
+
+def assign_hypernyms(synset_count: int, mean_depth: float, rng: np.random.Generator) -> Tuple[List[List[int]], int]:
+    """Hypernym targets of each synset of one part of speech: synsets get a depth
+    around mean_depth and a random parent one level up; about 2% get a second"""
+    depths = np.clip(np.rint(rng.normal(mean_depth, mean_depth / 3, synset_count)), 0,
+                     SYNTHETIC_MAX_HYPERNYM_DEPTH).astype(int)
+    order = np.argsort(depths, kind='stable')
+    parents: List[List[int]] = [[] for _ in range(synset_count)]
+    levels: Dict[int, List[int]] = {}
+    max_depth = 0
+    for synset in order:
+        depth = int(depths[synset])
+        # Shallowest synsets are the roots, and so is any synset a level is missing above
+        while depth > 0 and not levels.get(depth - 1):
+            depth -= 1
+        if depth > 0:
+            above = levels[depth - 1]
+            parents[synset].append(above[int(rng.integers(len(above)))])
+            if rng.random() < 0.02:
+                second = above[int(rng.integers(len(above)))]
+                if second not in parents[synset]:
+                    parents[synset].append(second)
+        levels.setdefault(depth, []).append(int(synset))
+        max_depth = max(max_depth, depth)
+    return parents, max_depth
+
+def definition_text(vocabulary: List[str], indices: np.ndarray) -> str:
+    return ' '.join(vocabulary[index] for index in indices)
+
+def write_wordnet(rows: pd.DataFrame, output_path: str, rng: np.random.Generator,
+                  word_rng: random.Random) -> Dict[str, int]:
+    """Write a WordNet-LMF file over the frequency list's vocabulary.
+
+    Most frequency list lemmas of a WordNet part of speech get an entry, plus
+    SYNTHETIC_WORDNET_EXTRA times as many WordNet-only words, a third of them
+    multiword. Polysemy is Zipf-distributed and skewed towards frequent words,
+    synset sizes (synonym fan-out) are Zipf-distributed, and noun and verb
+    synsets form hypernym trees of realistic depth. Definitions and examples
+    are drawn from the vocabulary by frequency, so phase 3 finds references.
+    """
+    vocabulary = rows['lemma'].drop_duplicates().tolist()
+    entries = [(lemma, WORDNET_POS[pos] if pos != 'j' or rng.random() < 0.5 else 's')
+               for lemma, pos in rows[['lemma', 'PoS']].itertuples(index=False)
+               if pos in WORDNET_POS and rng.random() < 0.85]
+
+    extra_count = int(len(rows) * SYNTHETIC_WORDNET_EXTRA)
+    extra_words = make_words(extra_count, word_rng, set(vocabulary))
+    for index, pos in enumerate(choose(rng, EXTRA_WORDNET_POS, extra_count)):
+        word = extra_words[index]
+        if rng.random() < 0.33:
+            word = f"{word} {vocabulary[int(rng.integers(len(vocabulary)))]}"
+        entries.append((word, str(pos)))
+    entries = list(dict.fromkeys(entries))
+
+    # Entries are in frequency order, so the largest sense counts go to frequent words
+    senses_per_entry = np.minimum(rng.zipf(SYNTHETIC_POLYSEMY_EXPONENT, len(entries)), 75)
+    noisy_order = np.argsort(np.arange(len(entries)) * np.exp(rng.normal(0, 1, len(entries))))
+    senses_per_entry[noisy_order] = -np.sort(-senses_per_entry)
+
+    # Senses of each part of speech are dealt to synsets of Zipf-distributed size
+    synset_ids: List[str] = []
+    synset_pos: List[str] = []
+    synset_parents: List[List[int]] = []
+    entry_synsets: List[List[int]] = [[] for _ in entries]
+    max_depth = 0
+    for pos in ('n', 'v', 'a', 's', 'r'):
+        entry_indices = [index for index, (_, entry_pos) in enumerate(entries) if entry_pos == pos]
+        sense_count = int(senses_per_entry[entry_indices].sum()) if entry_indices else 0
+        if not sense_count:
+            continue
+        sizes = []
+        while sum(sizes) < sense_count:
+            sizes.extend(np.minimum(rng.zipf(SYNTHETIC_FANOUT_EXPONENT, max(16, sense_count // 2)), 30).tolist())
+        sizes = np.array(sizes)[:np.searchsorted(np.cumsum(sizes), sense_count) + 1]
+        sizes[-1] -= sizes.sum() - sense_count
+        first = len(synset_ids)
+        slots = rng.permutation(np.repeat(np.arange(first, first + len(sizes)), sizes))
+        position = 0
+        for index in entry_indices:
+            count = int(senses_per_entry[index])
+            entry_synsets[index] = list(dict.fromkeys(slots[position:position + count].tolist()))
+            position += count
+
+        synset_ids.extend(f"oewn-{number:08d}-{pos}" for number in range(first, first + len(sizes)))
+        synset_pos.extend([pos] * len(sizes))
+        if pos in ('n', 'v'):
+            parents, depth = assign_hypernyms(len(sizes), 7.0 if pos == 'n' else 2.0, rng)
+            synset_parents.extend([[first + parent for parent in targets] for targets in parents])
+            max_depth = max(max_depth, depth)
+        else:
+            synset_parents.extend([[] for _ in sizes])
+
+    members: List[List[int]] = [[] for _ in synset_ids]
+    for index, synsets in enumerate(entry_synsets):
+        for synset in synsets:
+            members[synset].append(index)
+
+    # Word indices for every definition and example, drawn by frequency at once
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    lengths = np.clip(rng.poisson(9, len(synset_ids)), 3, 30)
+    words = rng.choice(len(vocabulary), size=int(lengths.sum()), p=weights / weights.sum())
+    starts = np.concatenate(([0], np.cumsum(lengths)))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<LexicalResource xmlns:dc="https://globalwordnet.github.io/schemas/dc/">\n'
+                '<Lexicon id="oewn" label="Synthetic WordNet" language="en" email="" '
+                'license="https://creativecommons.org/licenses/by/4.0/" version="synthetic">\n')
+        sense_total = 0
+        for index, (lemma, pos) in enumerate(entries):
+            f.write(f'<LexicalEntry id="e{index}"><Lemma writtenForm={quoteattr(lemma)} partOfSpeech="{pos}"/>\n')
+            for number, synset in enumerate(entry_synsets[index]):
+                relation = (f'<SenseRelation relType="derivation" target="e{int(rng.integers(len(entries)))}-0"/>'
+                            if rng.random() < 0.2 else '')
+                example = (f'<Example>{escape(lemma)} {definition_text(vocabulary, words[starts[synset]:starts[synset] + 3])}'
+                           f'</Example>' if rng.random() < 0.02 else '')
+                f.write(f'<Sense id="e{index}-{number}" synset="{synset_ids[synset]}">{relation}{example}</Sense>\n')
+            sense_total += len(entry_synsets[index])
+            f.write('</LexicalEntry>\n')
+
+        for synset, synset_id in enumerate(synset_ids):
+            member_ids = ' '.join(f"e{index}" for index in members[synset])
+            f.write(f'<Synset id="{synset_id}" ili="" members="{member_ids}" partOfSpeech="{synset_pos[synset]}">\n')
+            text = definition_text(vocabulary, words[starts[synset]:starts[synset + 1]])
+            f.write(f'<Definition>{escape(text)}</Definition>\n')
+            if rng.random() < 0.35 and members[synset]:
+                lemma = entries[members[synset][0]][0]
+                example = definition_text(vocabulary, words[starts[synset]:starts[synset] + 6][::-1])
+                f.write(f'<Example>"the {escape(lemma)} {escape(example)}"</Example>\n')
+            for target in synset_parents[synset]:
+                f.write(f'<SynsetRelation relType="hypernym" target="{synset_ids[target]}"/>\n')
+            f.write('</Synset>\n')
+        f.write('</Lexicon>\n</LexicalResource>\n')
+
+    return {'lexical_entries': len(entries), 'senses': sense_total, 'synsets': len(synset_ids),
+            'max_hypernym_depth': max_depth}
+
+def generate_sources(output_dir: str, scale: float = 1.0, source_format: str = SOURCE_FORMAT,
+                     seed: int = SYNTHETIC_SEED) -> Dict[str, int]:
+    """Write phase 1 and phase 2 inputs for SYNTHETIC_LEMMAS * scale frequency list
+    rows to output_dir, under the file names config.py expects; returns their row counts"""
+    start_time = time.time()
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    word_rng = random.Random(seed)
+
+    rows = frequency_rows(max(100, int(SYNTHETIC_LEMMAS * scale)), rng, word_rng)
+    stats = write_frequency_sources(rows, output_dir, source_format, rng)
+    stats.update(write_wordnet(rows, os.path.join(output_dir, os.path.basename(XML_FILE)), rng, word_rng))
+
+    logger.info(f"Generated scale {scale} sources in {output_dir} in {time.time() - start_time:.2f}s: "
+                f"{stats['lemmas_rows']} lemma rows, {stats['wordforms_rows']} word forms, "
+                f"{stats['lexical_entries']} lexical entries, {stats['synsets']} synsets "
+                f"(hypernym depth up to {stats['max_hypernym_depth']})")
+    return stats
+
+def main():
+    scales = [float(argument) for argument in sys.argv[1:] if argument != '--tsv'] or SYNTHETIC_SCALES
+    source_format = 'tsv' if '--tsv' in sys.argv else SOURCE_FORMAT
+    for scale in scales:
+        generate_sources(os.path.join(SYNTHETIC_PATH, f"scale_{scale:g}"), scale, source_format)
+
+if __name__ == "__main__":
+    main()
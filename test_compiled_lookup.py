@@ -0,0 +1,58 @@
+## test_compiled_lookup.py
+
+import sqlite3
+
+import pytest
+
+from compiled_lookup import HEADER, LENGTH, OFFSET, CompiledLookup, compile_lookup
+from dictionary_reader import DictionaryReader, resolve_all
+from entry_store import EntryStore, materialize_entries
+from test_entry_store import without_definition_ids
+
+@pytest.fixture
+def lookup_file(dictionary_db, tmp_path) -> str:
+    return compile_lookup(dictionary_db, str(tmp_path / 'dictionary.lookup'))
+
+def test_lookup_matches_reader_and_entry_store(dictionary_db, lookup_file, lookup_words):
+    materialize_entries(dictionary_db)
+    with DictionaryReader(dictionary_db) as reader, EntryStore(dictionary_db) as store, \
+            CompiledLookup(lookup_file) as lookup:
+        for word in lookup_words:
+            expected = reader.lookup(word)
+            assert lookup.lookup(word) == expected, word
+            assert store.lookup(word) == without_definition_ids(expected), word
+
+def test_entries_round_trip(dictionary_db, lookup_file):
+    with DictionaryReader(dictionary_db) as reader, CompiledLookup(lookup_file) as lookup:
+        lemma_ids = [row['id'] for row in reader.conn.execute("SELECT id FROM lemmas ORDER BY id")]
+        assert lookup.entry_count == len(lemma_ids)
+        for number, lemma_id in enumerate(lemma_ids):
+            assert lookup.entry(number) == reader.get_entry(lemma_id)
+
+def test_key_index_is_sorted_and_complete(dictionary_db, lookup_file):
+    conn = sqlite3.connect(dictionary_db)
+    try:
+        texts = sorted(text.encode('utf-8') for text in resolve_all(conn))
+    finally:
+        conn.close()
+
+    with CompiledLookup(lookup_file) as lookup:
+        keys = []
+        for index in range(lookup.key_count):
+            record_offset = OFFSET.unpack_from(lookup.mm, lookup.key_index_offset + index * OFFSET.size)[0]
+            key_length = LENGTH.unpack_from(lookup.mm, record_offset)[0]
+            keys.append(lookup.mm[record_offset + LENGTH.size:record_offset + LENGTH.size + key_length])
+        assert keys == texts
+        assert all(lookup.find_key(key) is not None for key in keys)
+        assert lookup.find_key(b'unknown') is None
+
+def test_rejects_other_files(lookup_file):
+    with open(lookup_file, 'r+b') as f:
+        f.write(b'NOTALKP\x00')
+    with pytest.raises(ValueError):
+        CompiledLookup(lookup_file)
+
+    with open(lookup_file, 'r+b') as f:
+        f.write(b'\0' * HEADER.size)
+    with pytest.raises(ValueError):
+        CompiledLookup(lookup_file)
@@ -0,0 +1,17 @@
+## test_dictionary_reader.py
+
+import pytest
+
+from dictionary_reader import DictionaryReader
+
+def test_resolve_many_matches_resolve(dictionary_db, lookup_words):
+    with DictionaryReader(dictionary_db) as reader:
+        resolved = reader.resolve_many(lookup_words)
+        for word in lookup_words:
+            assert resolved[reader.normalize(word)] == reader.resolve(word), word
+
+def test_search_needs_full_text_index(dictionary_db):
+    with DictionaryReader(dictionary_db) as reader:
+        assert not reader.full_text
+        with pytest.raises(ValueError, match="PHASE3_FULL_TEXT"):
+            reader.search("small rodent")
@@ -0,0 +1,33 @@
+## test_entry_store.py
+
+from dictionary_reader import DictionaryReader
+from entry_store import EntryStore, materialize_entries
+
+def without_definition_ids(entries):
+    """Reader entries in the shape EntryStore stores them"""
+    return [{**entry, 'definitions': {pos: [{key: value for key, value in definition.items() if key != 'id'}
+                                            for definition in definitions]
+                                      for pos, definitions in entry['definitions'].items()}}
+            for entry in entries]
+
+def test_lookup_matches_reader(dictionary_db, lookup_words):
+    materialize_entries(dictionary_db)
+    with DictionaryReader(dictionary_db) as reader, EntryStore(dictionary_db) as store:
+        for word in lookup_words:
+            assert store.lookup(word) == without_definition_ids(reader.lookup(word)), word
+
+def test_mixed_case_lemmas_resolve_like_reader(dictionary_db):
+    materialize_entries(dictionary_db)
+    with EntryStore(dictionary_db) as store:
+        assert [entry['lemma'] for entry in store.lookup('zorbo')] == ['zorbo']
+        assert [entry['lemma'] for entry in store.lookup('Zorbo')] == ['Zorbo', 'zorbo']
+        assert [entry['lemma'] for entry in store.lookup('ZORBO')] == ['zorbo']
+        assert store.lookup('quux') == []
+        assert [entry['lemma'] for entry in store.lookup('left')] == ['left', 'leave']
+
+def test_rebuild_writes_only_changes(dictionary_db):
+    first = materialize_entries(dictionary_db)
+    assert first['written'] == first['entries'] and first['keys_written'] == first['keys']
+
+    second = materialize_entries(dictionary_db)
+    assert (second['written'], second['deleted'], second['keys_written'], second['keys_deleted']) == (0, 0, 0, 0)
@@ -0,0 +1,74 @@
+## test_fuzzy_index.py
+
+import random
+
+import pytest
+
+from fuzzy_index import FuzzyIndex, build_fuzzy_index, deletion_variants, distance_from, misspell, normalize_word
+
+def osa_distance(source: str, target: str) -> int:
+    """Optimal string alignment distance by the textbook dynamic programming table"""
+    rows = [[0] * (len(target) + 1) for _ in range(len(source) + 1)]
+    for i in range(len(source) + 1):
+        rows[i][0] = i
+    for j in range(len(target) + 1):
+        rows[0][j] = j
+    for i in range(1, len(source) + 1):
+        for j in range(1, len(target) + 1):
+            cost = source[i - 1] != target[j - 1]
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+@pytest.fixture
+def fuzzy_index(dictionary_db, tmp_path) -> FuzzyIndex:
+    return FuzzyIndex(build_fuzzy_index(dictionary_db, str(tmp_path / 'fuzzy.idx')))
+
+def test_distance_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(5000):
+        alphabet = rng.choice(('ab', 'abc', 'abcdefgh', 'aé-ñ '))
+        source = ''.join(rng.choices(alphabet, k=rng.randint(0, 12)))
+        target = ''.join(rng.choices(alphabet, k=rng.randint(0, 12)))
+        assert distance_from(source)(target) == osa_distance(source, target), (source, target)
+
+def test_distance_of_long_words():
+    # Longer than a machine word, which the bit vectors must not depend on
+    rng = random.Random(1)
+    for _ in range(50):
+        source = ''.join(rng.choices('abcd', k=rng.randint(60, 90)))
+        target = misspell(source, rng.randint(0, 5), rng)
+        assert distance_from(source)(target) == osa_distance(source, target)
+
+def test_distance_counts_a_swap_once():
+    distance_to = distance_from('mouse')
+    assert distance_to('mouse') == 0
+    assert distance_to('mosue') == 1
+    assert distance_to('mous') == 1
+    assert distance_to('') == 5
+    assert distance_from('')('abc') == 3
+
+def test_deletion_variants():
+    assert deletion_variants('abc', 1, 10) == {'abc', 'bc', 'ac', 'ab'}
+    assert deletion_variants('abcdef', 2, 3) == {'abc', 'bc', 'ac', 'ab', 'a', 'b', 'c'}
+
+def test_suggest_finds_every_word_within_distance(fuzzy_index):
+    rng = random.Random(2)
+    for word in list(fuzzy_index.words):
+        typo = misspell(word, rng.randint(1, 2), rng)
+        expected = sorted(candidate for candidate in fuzzy_index.words
+                          if osa_distance(normalize_word(typo), candidate) <= fuzzy_index.max_distance)
+        assert sorted(s['word'] for s in fuzzy_index.suggest(typo, limit=len(fuzzy_index))) == expected, typo
+
+def test_suggestions_rank_by_distance_then_frequency(fuzzy_index):
+    suggestions = fuzzy_index.suggest('mosue')
+    assert suggestions[0] == {'word': 'mouse', 'lemma': 'mouse', 'distance': 1, 'frequency': 500}
+    assert [s['distance'] for s in suggestions] == sorted(s['distance'] for s in suggestions)
+    assert fuzzy_index.suggest('mcie')[0]['lemma'] == 'mouse'
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.idx'
+    path.write_bytes(b'\0' * 128)
+    with pytest.raises(ValueError):
+        FuzzyIndex(str(path))
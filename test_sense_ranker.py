@@ -0,0 +1,37 @@
+## test_sense_ranker.py
+
+import pytest
+
+from sense_ranker import SenseRanker, context_window, tokenize
+
+@pytest.fixture
+def ranker(dictionary_db) -> SenseRanker:
+    return SenseRanker(dictionary_db, context_size=4)
+
+def test_context_window_leaves_out_the_target():
+    tokens = tokenize("a b c d ice cream e f g")
+    assert context_window(tokens, 4, 4, 2) == ['c', 'd', 'e', 'f']
+    assert context_window(tokens, 0, 4) == ['b', 'c']
+
+def test_locates_target_as_written_or_as_a_form(ranker):
+    tokens = tokenize("we ate ice cream and the mice ran")
+    assert ranker.locate_target(tokens, 'ice cream', ranker.resolve('ice cream')) == (2, 2)
+    assert ranker.locate_target(tokens, 'mouse', ranker.resolve('mouse')) == (6, 1)
+    assert ranker.locate_target(tokens, 'ice cream', ranker.resolve('ice cream'), index=2) == (2, 2)
+    assert ranker.locate_target(tokens, 'rodent', ranker.resolve('rodent')) is None
+
+def test_rejects_an_index_that_is_not_the_target(ranker):
+    context = "the zorbo saw a rodent"
+    with pytest.raises(IndexError):
+        ranker.rank('zorbo', context, index=999)
+    with pytest.raises(IndexError):
+        ranker.rank('zorbo', context, index=-5)
+    with pytest.raises(ValueError):
+        ranker.rank('zorbo', context, index=4)
+    assert ranker.rank('zorbo', context, index=1) == ranker.rank('zorbo', context)
+
+def test_only_the_window_around_the_target_counts(ranker):
+    near = ranker.rank('zorbo', "a mouse zorbo", pos='v')[0]
+    far = ranker.rank('zorbo', "a mouse x x x x zorbo", pos='v')[0]
+    assert near['matches'] == ['mouse'] and near['score'] > 0
+    assert far['matches'] == [] and far['score'] == 0
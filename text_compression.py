@@ -0,0 +1,214 @@
+## text_compression.py
+
+import shutil
+import sqlite3
+import logging
+import tempfile
+import time
+import zlib
+import sys
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Add parent directory to path for config import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import *
+
+# Set up logging
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+TEXT_DICTIONARIES_SQL = """
+    CREATE TABLE IF NOT EXISTS text_dictionaries (
+        name TEXT PRIMARY KEY,
+        dictionary BLOB NOT NULL
+    )
+"""
+DEFINITIONS_DICTIONARY = 'definitions'
+COMPRESSED_COLUMNS = ['definition_text', 'example_sentence', 'hypernyms']
+
+# Raw deflate: no zlib header or checksum, which would cost 6 bytes per value
+WINDOW_BITS = -15
+
+def train_dictionary(samples: Iterable[str], size: int = ZDICT_SIZE) -> bytes:
+    """Build a zlib preset dictionary from the text that recurs most in samples.
+
+    zlib has no trainer of its own, so the dictionary is assembled from whole
+    values that repeat verbatim (hypernym lists shared by every sense of a
+    lemma) and frequent word n-grams, scored by the bytes they would save.
+    The best segments go last, where deflate reaches them with the shortest
+    distances.
+    """
+    counts = Counter()
+    for text in samples:
+        if not text:
+            continue
+        counts[text] += 1
+        words = text.split(' ')
+        for length in (1, 2, 3):
+            for start in range(len(words) - length + 1):
+                counts[' '.join(words[start:start + length]) + ' '] += 1
+
+    ranked = sorted(((count - 1) * len(segment.encode('utf-8')), segment)
+                    for segment, count in counts.items() if count > 1)
+    dictionary = b''
+    for _, segment in reversed(ranked):
+        encoded = segment.encode('utf-8')
+        if len(dictionary) + len(encoded) > size or encoded in dictionary:
+            continue
+        dictionary = encoded + dictionary
+    return dictionary
+
+class TextCodec:
+    """Compresses short texts against a shared preset dictionary.
+
+    encode() returns a BLOB only when it is smaller than the UTF-8 text, so a
+    column can mix both and decode() tells them apart by type.
+    """
+
+    def __init__(self, dictionary: bytes, level: int = ZDICT_LEVEL):
+        self.dictionary = dictionary
+        self.level = level
+
+    def compress(self, text: str) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, WINDOW_BITS, zdict=self.dictionary)
+        return compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+    def encode(self, text: Optional[str]):
+        if not text:
+            return text
+        blob = self.compress(text)
+        return blob if len(blob) < len(text.encode('utf-8')) else text
+
+    def decode(self, value):
+        if not isinstance(value, bytes):
+            return value
+        decompressor = zlib.decompressobj(WINDOW_BITS, zdict=self.dictionary)
+        return (decompressor.decompress(value) + decompressor.flush()).decode('utf-8')
+
+def decode_text(value, codec: Optional[TextCodec]):
+    """A column value as text, whether or not it was stored compressed"""
+    return codec.decode(value) if codec is not None else value
+
+def store_dictionary(conn: sqlite3.Connection, dictionary: bytes, name: str = DEFINITIONS_DICTIONARY):
+    conn.execute(TEXT_DICTIONARIES_SQL)
+    conn.execute("INSERT OR REPLACE INTO text_dictionaries (name, dictionary) VALUES (?, ?)", (name, dictionary))
+
+def load_codec(conn: sqlite3.Connection, name: str = DEFINITIONS_DICTIONARY) -> Optional[TextCodec]:
+    """The codec of a database built with PHASE3_COMPRESS_TEXT, or None"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'text_dictionaries'").fetchone() is None:
+        return None
+    row = conn.execute("SELECT dictionary FROM text_dictionaries WHERE name = ?", (name,)).fetchone()
+    return TextCodec(bytes(row[0])) if row else None
+
+def compress_definitions(conn: sqlite3.Connection, codec: TextCodec):
+    """Rewrite every definition's text columns compressed and store the dictionary"""
+    rows = conn.execute(f"SELECT id, {', '.join(COMPRESSED_COLUMNS)} FROM definitions").fetchall()
+    conn.executemany(f"UPDATE definitions SET {', '.join(f'{column} = ?' for column in COMPRESSED_COLUMNS)} "
+                     f"WHERE id = ?", [tuple(codec.encode(value) for value in row[1:]) + (row[0],)
+                                       for row in rows])
+    store_dictionary(conn, codec.dictionary)
+    conn.commit()
+
+def database_size(path: str) -> int:
+    """File size after VACUUM"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return Path(path).stat().st_size
+
+def run_benchmark(db_path: str = DATABASE_FILE):
+    """Compare plain and compressed storage of the definitions text: column
+    bytes, database size and DictionaryReader lookup latency"""
+    from dictionary_reader import DictionaryReader, measure_lookups
+
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        stored_codec = load_codec(conn)
+        texts_by_lemma: Dict[int, List[str]] = {}
+        for lemma_id, *values in conn.execute(f"SELECT lemma_id, {', '.join(COMPRESSED_COLUMNS)} "
+                                              f"FROM definitions ORDER BY lemma_id, id"):
+            texts_by_lemma.setdefault(lemma_id, []).extend(decode_text(value, stored_codec)
+                                                           for value in values if value)
+        words = [row[0] for row in conn.execute("""
+            SELECT lemma FROM lemmas ORDER BY lemma_frequency DESC LIMIT ?
+        """, (READER_BENCHMARK_WORDS,))]
+    finally:
+        conn.close()
+    if not texts_by_lemma:
+        logger.error("Database has no definitions")
+        return
+    texts = [text for lemma_texts in texts_by_lemma.values() for text in lemma_texts]
+
+    # Trained like phase 3 does, on every value of a sample of lemmas
+    train_start = time.time()
+    sample = list(texts_by_lemma.values())[::max(1, len(texts_by_lemma) // ZDICT_SAMPLE_LEMMAS)]
+    codec = TextCodec(train_dictionary(text for lemma_texts in sample for text in lemma_texts))
+    logger.info(f"Trained a {len(codec.dictionary)} byte dictionary on {len(sample)} lemmas "
+                f"in {time.time() - train_start:.2f}s")
+
+    raw = sum(len(text.encode('utf-8')) for text in texts)
+    plain = sum(min(len(zlib.compress(text.encode('utf-8'), ZDICT_LEVEL)) - 6, len(text.encode('utf-8')))
+                for text in texts)
+    shared = sum(len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+                 for value in map(codec.encode, texts))
+    logger.info(f"Text columns: {raw / 1024 / 1024:.2f} MB raw, {plain / 1024 / 1024:.2f} MB zlib per value, "
+                f"{shared / 1024 / 1024:.2f} MB with the shared dictionary ({shared / raw:.1%} of raw)")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        plain_path = os.path.join(temp_dir, 'plain.db')
+        compressed_path = os.path.join(temp_dir, 'compressed.db')
+        shutil.copyfile(db_path, plain_path)
+
+        conn = sqlite3.connect(plain_path)
+        try:
+            # Full-text triggers would index the compressed values
+            conn.executescript("""
+                DROP TRIGGER IF EXISTS definitions_fts_insert;
+                DROP TRIGGER IF EXISTS definitions_fts_delete;
+                DROP TRIGGER IF EXISTS definitions_fts_update;
+                DROP TABLE IF EXISTS definitions_fts;
+                DROP VIEW IF EXISTS definitions_search;
+                DROP TABLE IF EXISTS text_dictionaries;
+            """)
+            rows = conn.execute(f"SELECT id, {', '.join(COMPRESSED_COLUMNS)} FROM definitions").fetchall()
+            conn.executemany(f"UPDATE definitions SET {', '.join(f'{column} = ?' for column in COMPRESSED_COLUMNS)} "
+                             f"WHERE id = ?", [tuple(decode_text(value, stored_codec) for value in row[1:]) +
+                                               (row[0],) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        shutil.copyfile(plain_path, compressed_path)
+
+        conn = sqlite3.connect(compressed_path)
+        try:
+            compress_definitions(conn, codec)
+        finally:
+            conn.close()
+
+        sizes = {label: database_size(path) for label, path in
+                 (('plain', plain_path), ('compressed', compressed_path))}
+        logger.info(f"Database: {sizes['plain'] / 1024 / 1024:.1f} MB plain, "
+                    f"{sizes['compressed'] / 1024 / 1024:.1f} MB compressed "
+                    f"({1 - sizes['compressed'] / sizes['plain']:.1%} smaller)")
+
+        for label, path in (('plain', plain_path), ('compressed', compressed_path)):
+            with DictionaryReader(path, cache_size=0) as reader:
+                measure_lookups(reader, words)
+                stats = measure_lookups(reader, words)
+            logger.info(f"Lookups ({label}): mean {stats['mean_ms']:.3f} ms, p95 {stats['p95_ms']:.3f} ms")
+
+def main():
+    if not Path(DATABASE_FILE).exists():
+        logger.error(f"Database not found: {DATABASE_FILE}")
+        logger.info("Please run build_complete.py first")
+        return
+
+    run_benchmark()
+
+if __name__ == "__main__":
+    main()